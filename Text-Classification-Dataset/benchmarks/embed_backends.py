@@ -0,0 +1,73 @@
+"""
+Embedding throughput and parity by inference backend: PyTorch
+(sentence-transformers), ONNX Runtime fp32 and ONNX Runtime int8 (dynamic
+quantization), on a synthetic (or real) corpus.
+
+For each backend: load seconds (including the one-off ONNX export), rows/s
+of embed_array() on the corpus and on single-text queries (the searchers'
+case), and the min / mean cosine similarity of its vectors to PyTorch's.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.embed_backends --rows 5000
+python3 -m benchmarks.embed_backends --files precleaned-chunks/precleaned_chunk_1.csv --limit 20000 --threads 4
+"""
+
+import argparse
+import time
+from typing import Dict, List
+from src.data_ingestion import config
+from src.data_ingestion.embedder import Embedder
+from src.data_ingestion.onnx_backend import cosine_parity
+from benchmarks.embed_batching import WORK_DIR, load_texts, time_encode
+
+VARIANTS = {"torch": ("torch", False), "onnx": ("onnx", False), "onnx-int8": ("onnx", True)}
+QUERIES = 200   # Single-text embed calls timed per backend
+
+def run(args) -> List[Dict]:
+    texts = load_texts(args)
+    print(f"{len(texts)} texts")
+    results, reference = [], None
+    for name in args.backends:
+        backend, quantize = VARIANTS[name]
+        start = time.perf_counter()
+        embedder = Embedder(args.model, torch_threads=args.threads, backend=backend, quantize=quantize)
+        load_seconds = time.perf_counter() - start
+        vectors, seconds = time_encode(lambda batch: embedder.embed_array(batch), texts)
+        start = time.perf_counter()
+        for text in texts[:QUERIES]:
+            embedder.embed_array([text])
+        query_seconds = (time.perf_counter() - start) / min(QUERIES, len(texts))
+        if reference is None:
+            reference = vectors
+        results.append({"backend": name, "load_seconds": round(load_seconds, 2), "seconds": round(seconds, 3),
+                        "rows_per_s": round(len(texts) / seconds, 1),
+                        "query_ms": round(query_seconds * 1000, 3),
+                        **cosine_parity(reference, vectors)})
+        embedder.close()
+
+    print(f"| backend | load s | rows/s | query ms | min cosine vs {args.backends[0]} | mean cosine |")
+    print("|---|---|---|---|---|---|")
+    for r in results:
+        print(f"| {r['backend']} | {r['load_seconds']:.1f} | {r['rows_per_s']:,.0f} | {r['query_ms']:.2f} | "
+              f"{r['min_cosine']:.4f} | {r['mean_cosine']:.4f} |")
+    return results
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Embedding throughput and parity by inference backend")
+    p.add_argument("--files", nargs="+", default=None, help="CSV files (default: a synthetic corpus)")
+    p.add_argument("--rows", type=int, default=5000, help="Synthetic corpus rows")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--limit", type=int, default=None, help="Embed at most this many texts")
+    p.add_argument("--model", type=str, default=config.EMBED_MODEL_NAME)
+    p.add_argument("--backends", nargs="+", choices=list(VARIANTS), default=list(VARIANTS),
+                   help="Backends to compare; parity is measured against the first")
+    p.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: the backend's)")
+    p.add_argument("--work", type=str, default=WORK_DIR, help="Synthetic corpora")
+    return p
+
+def main():
+    run(parser().parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Embedding throughput by batching strategy on a synthetic (or real) corpus.
+
+Strategies:
+
+unsorted        texts in file order, batch_size texts per forward pass (each
+                pass padded to its longest text), as a plain batched loop
+                over model(texts[i:i + batch_size]) would run them
+fixed           one encode() call per batch: the model sorts by length
+                internally and runs batch_size texts per pass
+tokens[<n>]     Embedder batching="tokens": length-sorted passes of at most
+                <n> padded tokens (one entry per --budgets value)
+
+For each strategy: rows/s, real tokens/s and padding efficiency (real /
+padded tokens, from embedder.token_lengths(), i.e. estimated unless the model
+has a fast tokenizer), plus the max cosine distance of its vectors from
+"fixed" as a parity check.
+
+"tokens" measures every text's length before encoding, and the model then
+tokenizes the texts again inside encode(). The time of that length pass
+on the corpus is reported on its own and as a share of each tokens[<n>]
+run, so the padding saved can be weighed against it. With --model stub the
+lengths are word-count estimates; pass a real model to measure its
+tokenizer.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.embed_batching --rows 5000
+python3 -m benchmarks.embed_batching --rows 20000 --model all-MiniLM-L6-v2 --budgets 8192 16384 32768
+python3 -m benchmarks.embed_batching --files precleaned-chunks/precleaned_chunk_1.csv --limit 20000
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from typing import Dict, List
+from src.data_ingestion import config
+from src.data_ingestion.embedder import (Embedder, MAX_CHARS_PER_TOKEN, normalize_rows,
+                                         plan_token_batches, token_lengths)
+from benchmarks.synthetic import STUB_MODEL_NAME, model_factory
+
+WORK_DIR = "exports/bench"
+BATCH_SIZE = 32   # sentence-transformers' default encode() batch size
+
+def load_texts(args) -> List[str]:
+    from src.data_ingestion.loader import stream_text_batches
+    from src.data_ingestion.preprocessor import normalize_texts
+
+    files = args.files
+    if not files:
+        from benchmarks.synthetic import generate
+        corpus_dir = os.path.join(args.work, f"corpus_{args.rows}_1_{args.seed}")
+        files = generate(corpus_dir, args.rows, files=1, seed=args.seed)["paths"]
+    texts = []
+    for batch in stream_text_batches(files, config.TEXT_COLUMN, config.BATCH_SIZE):
+        texts.extend(t for t in normalize_texts(batch) if t)
+        if args.limit and len(texts) >= args.limit:
+            return texts[:args.limit]
+    return texts
+
+def padding(lengths: np.ndarray, passes: List[np.ndarray]) -> Dict:
+    padded = sum(len(p) * int(lengths[p].max()) for p in passes)
+    return {"passes": len(passes), "tokens": int(lengths.sum()), "padded_tokens": padded,
+            "padding_efficiency": round(int(lengths.sum()) / padded, 4) if padded else None}
+
+def time_encode(encode, texts: List[str], warmup: int = 64):
+    encode(texts[:warmup])
+    start = time.perf_counter()
+    vectors = encode(texts)
+    return vectors, time.perf_counter() - start
+
+def run(args) -> List[Dict]:
+    texts = load_texts(args)
+    factory = model_factory(args.model, config.VECTOR_DIM)
+    embedder = Embedder(args.model, batching="fixed", max_seq_length=args.max_seq_length,
+                        model_factory=factory)
+    max_chars = embedder.max_seq_length * MAX_CHARS_PER_TOKEN
+    start = time.perf_counter()
+    lengths = token_lengths([t[:max_chars] for t in texts], embedder.max_seq_length, embedder._tokenizer)
+    length_seconds = time.perf_counter() - start
+    print(f"{len(texts)} texts, {int(lengths.sum())} tokens, median {int(np.median(lengths))}, "
+          f"max {int(lengths.max())} (max_seq_length {embedder.max_seq_length})")
+    print(f"Length pass ({'tokenizer' if embedder._tokenizer is not None else 'word-count estimate'}): "
+          f"{length_seconds:.3f}s")
+
+    def unsorted(batch):
+        return np.concatenate([embedder.embed_array(batch[i:i + args.batch_size], normalize=False)
+                               for i in range(0, len(batch), args.batch_size)])
+
+    in_order = [np.arange(i, min(i + args.batch_size, len(texts))) for i in range(0, len(texts), args.batch_size)]
+    by_length = np.argsort(lengths, kind="stable")
+    sorted_passes = [by_length[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+    strategies = [("unsorted", unsorted, padding(lengths, in_order)),
+                  ("fixed", lambda batch: embedder.embed_array(batch, normalize=False),
+                   padding(lengths, sorted_passes))]
+    for budget in args.budgets:
+        tokens = Embedder(args.model, batching="tokens", token_budget=budget,
+                          max_seq_length=args.max_seq_length, model_factory=factory)
+        strategies.append((f"tokens[{budget}]", lambda batch, e=tokens: e.embed_array(batch, normalize=False),
+                           padding(lengths, plan_token_batches(lengths, budget))))
+
+    results, outputs = [], {}
+    for name, encode, pads in strategies:
+        vectors, seconds = time_encode(encode, texts)
+        outputs[name] = normalize_rows(vectors)
+        results.append({"strategy": name, "seconds": round(seconds, 3),
+                        "rows_per_s": round(len(texts) / seconds, 1),
+                        "tokens_per_s": round(pads["tokens"] / seconds, 1),
+                        # Share of the run spent measuring lengths (tokens[<n>] only)
+                        "length_pass_share": (round(length_seconds / seconds, 4)
+                                              if name.startswith("tokens") else None),
+                        **pads})
+    for r in results:
+        similarity = np.sum(outputs[r["strategy"]] * outputs["fixed"], axis=1)
+        r["max_cosine_distance"] = float(1 - similarity.min())
+
+    print("| strategy | passes | padding efficiency | rows/s | tokens/s | length pass | max cos distance vs fixed |")
+    print("|---|---|---|---|---|---|---|")
+    for r in results:
+        share = "-" if r["length_pass_share"] is None else f"{r['length_pass_share']:.1%}"
+        print(f"| {r['strategy']} | {r['passes']} | {r['padding_efficiency']:.1%} | {r['rows_per_s']:,.0f} | "
+              f"{r['tokens_per_s']:,.0f} | {share} | {r['max_cosine_distance']:.2e} |")
+    return results
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Embedding throughput by batching strategy")
+    p.add_argument("--files", nargs="+", default=None, help="CSV files (default: a synthetic corpus)")
+    p.add_argument("--rows", type=int, default=5000, help="Synthetic corpus rows")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--limit", type=int, default=None, help="Embed at most this many texts")
+    p.add_argument("--model", type=str, default=STUB_MODEL_NAME,
+                   help=f"Embedding model: '{STUB_MODEL_NAME}' (no torch needed) or a SentenceTransformer name")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Texts per pass (unsorted, fixed)")
+    p.add_argument("--budgets", type=int, nargs="+", default=[4096, config.EMBED_TOKEN_BUDGET, 65536],
+                   help="Token budgets to try")
+    p.add_argument("--max-seq-length", type=int, default=config.EMBED_MAX_SEQ_LENGTH)
+    p.add_argument("--work", type=str, default=WORK_DIR, help="Synthetic corpora")
+    return p
+
+def main():
+    run(parser().parse_args())
+
+if __name__ == "__main__":
+    main()
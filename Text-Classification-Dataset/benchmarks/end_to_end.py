@@ -0,0 +1,235 @@
+"""
+End-to-end pipeline benchmark on a synthetic corpus, runnable anywhere:
+no Reddit dumps, no Milvus server and no downloaded model needed.
+
+Stages (rows/s each, timed with src/data_ingestion/metrics.StageMetrics
+under the same names run_ingestion reports):
+
+read[<engine>]  CSV loader throughput, one full pass per --engines entry
+read, normalize, dedup, embed, insert, flush
+                one serial ingestion pass through the pipeline's own
+                reader and serial loop, embedding with --model (default:
+                the dependency-free stub model) into an in-memory
+                collection (benchmarks/synthetic.py)
+export          collection -> Parquet (load_and_save_polars_vectors)
+store           Parquet -> memory-mapped vector store
+kmeans          scaler + PCA + MiniBatchKMeans training from the store
+
+Every run appends one JSON record (parameters, environment, git commit and
+per-stage results) to --results, and compares it with the last record
+with the same parameters, flagging stages slower by more than --threshold.
+
+Corpora are generated once per (rows, files, seed) under --work and
+reused. The stand-in collection keeps every vector in memory
+(rows * dim * 4 bytes): use --dim 64 for the 2M-row corpus on small hosts.
+Settings and module flags changed for the run are restored afterwards.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.end_to_end --rows 10000
+python3 -m benchmarks.end_to_end --rows 2000000 --dim 64 --engines pyarrow
+python3 -m benchmarks.end_to_end --rows 100000 --model all-MiniLM-L6-v2 --embed-workers 2
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from src.data_ingestion import config
+from src.data_ingestion.metrics import StageMetrics
+from benchmarks.synthetic import MemoryCollection, STUB_MODEL_NAME, generate, model_factory
+
+WORK_DIR = "exports/bench"
+RESULTS_FILE = "exports/bench/end_to_end.jsonl"
+THRESHOLD = 0.10          # Relative rows/s change reported as a regression / improvement
+N_CLUSTERS = 20
+PCA_COMPONENTS = 32
+
+@contextmanager
+def overridden(module, **values):
+    """Set attributes of a module (e.g. config settings) for the block, then restore them."""
+    saved = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+def bench_loader(files: List[str], engines: List[str], metrics: StageMetrics, batch_size: int):
+    from src.data_ingestion.loader import stream_text_batches
+
+    for engine in engines:
+        # Untimed first batch: pays the engine's import and setup costs
+        next(iter(stream_text_batches(files[:1], config.TEXT_COLUMN, batch_size, engine=engine)), None)
+        batches = stream_text_batches(files, config.TEXT_COLUMN, batch_size, engine=engine)
+        for _ in metrics.timed_iter(f"read[{engine}]", batches):
+            pass
+
+def bench_ingest(files: List[str], collection, metrics: StageMetrics, model: str,
+                 embed_workers: int, dedup_mode: str, batch_size: int) -> int:
+    """
+    One serial ingestion pass into `collection` with the pipeline's reader
+    and serial loop (run_ingestion() itself needs a Milvus server); returns
+    rows inserted.
+    """
+    from src.data_ingestion import pipeline
+    from src.data_ingestion.dedup import make_deduplicator
+    from src.data_ingestion.embedder import Embedder
+    from src.data_ingestion.milvus_client import BufferedInserter, FlushPolicy
+
+    deduper = make_deduplicator(dedup_mode, config.DEDUP_CAPACITY, config.DEDUP_FP_RATE)
+    inserter = BufferedInserter(collection, FlushPolicy("end"), config.INSERT_BUFFER_BYTES, metrics=metrics)
+    with overridden(config, CSV_FILES=list(files), BATCH_SIZE=batch_size), \
+            Embedder(model, embed_workers, model_factory=model_factory(model, config.VECTOR_DIM)) as embedder:
+        batches = pipeline._read_batches(deduper, "pyarrow", metrics=metrics)
+        pipeline._ingest_serial(batches, inserter, embedder, metrics)
+    inserter.close()
+    return inserter.rows_inserted
+
+def bench_export(collection, parquet_dir: str, metrics: StageMetrics, workers: int):
+    from src.polars_ops.load_and_save_polars_vectors import export_collection
+    import src.polars_ops.load_and_save_polars_vectors as exporter
+
+    with overridden(exporter, VERBOSE=False), metrics.stage("export") as timing:
+        timing.rows = export_collection(collection, parquet_dir, workers=workers)
+
+def bench_kmeans(parquet_dir: str, store_dir: str, metrics: StageMetrics, n_clusters: int):
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.decomposition import IncrementalPCA
+    from sklearn.preprocessing import StandardScaler
+    from src.polars_ops.parquet_vectors import VectorStore, build_vector_store
+    import src.operations.minibatch_kmeans as mk
+
+    with metrics.stage("store") as timing:
+        timing.rows = build_vector_store(parquet_dir, store_dir)["num_rows"]
+    vectors = VectorStore(store_dir).vectors
+    pca = IncrementalPCA(n_components=min(PCA_COMPONENTS, vectors.shape[1])) if mk.USE_PCA else None
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=mk.BATCH_SIZE, random_state=42, n_init=3)
+    with overridden(mk, VERBOSE=False), metrics.stage("kmeans", len(vectors)):
+        mk.train(lambda: mk.array_batches(vectors), StandardScaler(), pca, kmeans)
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def load_results(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(current: Dict, previous: Optional[Dict], threshold: float = THRESHOLD) -> List[Dict]:
+    """Per-stage rows/s of `current` against `previous` (a record with the same params)."""
+    rows = []
+    for stage, result in current["stages"].items():
+        before = (previous or {}).get("stages", {}).get(stage, {}).get("rows_per_s")
+        now = result["rows_per_s"]
+        change = (now / before - 1) if before and now else None
+        verdict = ("" if change is None else "regression" if change < -threshold
+                   else "improvement" if change > threshold else "same")
+        rows.append({"stage": stage, "rows": result["rows"], "seconds": result["seconds"],
+                     "rows_per_s": now, "previous_rows_per_s": before, "change": change, "verdict": verdict})
+    return rows
+
+def _rate(value) -> str:
+    return "-" if value is None else f"{value:,.0f}"
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = ["| stage | rows | seconds | rows/s | previous rows/s | change | |", "|---|---|---|---|---|---|---|"]
+    for r in rows:
+        change = "-" if r["change"] is None else f"{r['change']:+.1%}"
+        lines.append(f"| {r['stage']} | {r['rows']} | {r['seconds']:.2f} | {_rate(r['rows_per_s'])} | "
+                     f"{_rate(r['previous_rows_per_s'])} | {change} | {r['verdict']} |")
+    return "\n".join(lines)
+
+def run(args) -> Dict:
+    """Run every stage; returns the result record (also appended to args.results)."""
+    with overridden(config, VECTOR_DIM=args.dim):
+        return _run(args)
+
+def _run(args) -> Dict:
+    corpus_dir = os.path.join(args.work, f"corpus_{args.rows}_{args.files}_{args.seed}")
+    manifest = generate(corpus_dir, args.rows, args.files, args.seed)
+    print(f"Corpus: {manifest['params']['rows']} rows, {manifest['bytes'] / 1024 ** 2:.1f} MiB in {corpus_dir}")
+
+    run_dir = os.path.join(args.work, "run")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    metrics = StageMetrics()
+    bench_loader(manifest["paths"], args.engines, metrics, args.batch_size)
+    collection = MemoryCollection()
+    bench_ingest(manifest["paths"], collection, metrics, args.model, args.embed_workers,
+                 args.dedup, args.batch_size)
+    bench_export(collection, os.path.join(run_dir, "parquet"), metrics, args.export_workers)
+    del collection
+    bench_kmeans(os.path.join(run_dir, "parquet"), os.path.join(run_dir, "store"), metrics, args.clusters)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    params = {"rows": args.rows, "files": args.files, "seed": args.seed, "dim": args.dim,
+              "model": args.model, "embed_workers": args.embed_workers, "dedup": args.dedup,
+              "batch_size": args.batch_size, "engines": list(args.engines),
+              "export_workers": args.export_workers, "clusters": args.clusters}
+    record = {
+        "params": params,
+        "environment": environment(),
+        # In the order the stages ran
+        "stages": {r["stage"]: {"rows": r["rows"], "seconds": r["seconds"], "rows_per_s": r["rows_per_s"]}
+                   for r in sorted(metrics.summary(), key=lambda r: list(metrics.totals).index(r["stage"]))},
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    previous = [r for r in load_results(args.results) if r["params"] == params]
+    comparison = compare(record, previous[-1] if previous else None, args.threshold)
+    print()
+    print(format_comparison(comparison))
+    if previous:
+        print(f"\nCompared with the run of {previous[-1]['timestamp']} "
+              f"(commit {previous[-1]['environment']['git_commit']})")
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {args.results}")
+    return record
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="End-to-end pipeline benchmark on a synthetic corpus")
+    p.add_argument("--rows", type=int, default=10000, help="Corpus rows (e.g. 10000 .. 2000000)")
+    p.add_argument("--files", type=int, default=5, help="CSV files the corpus is split into")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--dim", type=int, default=config.VECTOR_DIM, help="Embedding dimension")
+    p.add_argument("--model", type=str, default=STUB_MODEL_NAME,
+                   help=f"Embedding model: '{STUB_MODEL_NAME}' (no torch needed) or a SentenceTransformer name")
+    p.add_argument("--embed-workers", type=int, default=0)
+    p.add_argument("--dedup", choices=("none", "hashset", "bloom"), default=config.DEDUP_MODE)
+    p.add_argument("--batch-size", type=int, default=config.BATCH_SIZE)
+    p.add_argument("--engines", nargs="+", choices=("pyarrow", "pandas"), default=["pyarrow", "pandas"])
+    p.add_argument("--export-workers", type=int, default=4)
+    p.add_argument("--clusters", type=int, default=N_CLUSTERS)
+    p.add_argument("--work", type=str, default=WORK_DIR, help="Corpora and scratch files")
+    p.add_argument("--results", type=str, default=RESULTS_FILE, help="JSON lines history of runs")
+    p.add_argument("--threshold", type=float, default=THRESHOLD,
+                   help="Relative rows/s change flagged as a regression or improvement")
+    return p
+
+def main():
+    run(parser().parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Sweep Milvus index types and parameters: build time, memory, QPS and recall.
+
+A sample of the exported vectors (the vector store built by
+src/polars_ops/parquet_vectors.py) is inserted into a separate bench
+collection, and held-out rows of the store are used as queries. Ground
+truth is the exact top-k over the sample, computed in-process with the
+same scoring as src/operations/local_searcher.py. For every index config
+the index is rebuilt, loaded, and searched at each search parameter
+(nprobe for IVF indexes, ef for HNSW; Milvus rejects ef below --top-k, so
+smaller ef values are skipped), recording:
+
+- build_s:   create_index() until the index reports fully built
+- mem_mb:    loaded segment memory, summed over query segments
+- qps:       batched search throughput (--batch queries per request)
+- p50/p99:   single-query latency, ms
+- recall:    |returned top-k ∩ exact top-k| / k, averaged over queries
+
+Results are printed as a recall-vs-latency table per index, and written
+to --output as CSV. Run against the Milvus of docker-compose.yml (or any
+local standalone Milvus); the bench collection is dropped afterwards
+unless --keep.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.index_sweep --rows 200000 --queries 1000 --top-k 10
+python3 -m benchmarks.index_sweep --index-types IVF_FLAT HNSW --output logs/index_sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+from src.data_ingestion import config
+from src.data_ingestion.milvus_client import SEARCH_PARAM_KEYS, search_params
+from src.operations.local_searcher import TopK, score_block
+from src.polars_ops.parquet_vectors import STORE_DIR
+
+OUTPUT_FILE = "logs/index_sweep.csv"
+ROWS = 200000
+QUERIES = 1000
+TOP_K = 10
+SEARCH_BATCH = 100      # Queries per request for the QPS measurement
+LATENCY_QUERIES = 200   # Single-query requests timed for p50/p99
+INSERT_BATCH = 10000
+
+# (index type, build params grid, search values) -- every combination of the
+# build params is built once and searched at every search value
+INDEX_GRID = {
+    "IVF_FLAT": ({"nlist": [1024, 4096]}, [8, 16, 32, 64]),
+    "IVF_SQ8": ({"nlist": [1024, 4096]}, [8, 16, 32, 64]),
+    "IVF_PQ": ({"nlist": [1024], "m": [16, 32, 48], "nbits": [8]}, [16, 32, 64]),
+    "HNSW": ({"M": [8, 16, 32], "efConstruction": [100, 200]}, [16, 32, 64, 128]),
+}
+RESULT_FIELDS = ["index_type", "build_params", "search_param", "build_s", "mem_mb",
+                 "qps", "p50_ms", "p99_ms", "recall"]
+
+def expand_grid(index_types: List[str], top_k: int = 0) -> Iterator[Tuple[str, Dict, List[int]]]:
+    """
+    Yield (index_type, build_params, search_values) for every build config.
+    HNSW ef values below top_k are left out (ef = top_k if none is left).
+    """
+    for index_type in index_types:
+        build_grid, search_values = INDEX_GRID[index_type]
+        if SEARCH_PARAM_KEYS[index_type] == "ef":
+            search_values = [v for v in search_values if v >= top_k] or [top_k]
+        names = list(build_grid)
+        for values in itertools.product(*(build_grid[n] for n in names)):
+            yield index_type, dict(zip(names, values)), search_values
+
+def exact_knn(base: np.ndarray, queries: np.ndarray, k: int, metric_type: str,
+              block_rows: int = 65536) -> np.ndarray:
+    """Row numbers in `base` of each query's exact top-k, best first."""
+    top = TopK(len(queries), k)
+    for start in range(0, len(base), block_rows):
+        block = base[start:start + block_rows]
+        top.push(score_block(block, queries, metric_type), np.arange(start, start + len(block)))
+    return top.result()[1]
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of each query's true top-k found among its returned ids."""
+    k = truth.shape[1]
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / (k * len(truth)) if len(truth) else 0.0
+
+def sample_rows(num_rows: int, rows: int, queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Disjoint sorted row samples of the store: (base rows, query rows)."""
+    rows = min(rows, num_rows - queries)
+    picked = np.random.default_rng(seed).choice(num_rows, rows + queries, replace=False)
+    return np.sort(picked[:rows]), np.sort(picked[rows:])
+
+def format_table(results: List[Dict]) -> str:
+    """Markdown recall-vs-latency table, one row per (index config, search param)."""
+    header = "| index | build params | search | build s | mem MB | QPS | p50 ms | p99 ms | recall |"
+    lines = [header, "|" + "---|" * (header.count("|") - 1)]
+    for r in results:
+        params = ", ".join(f"{k}={v}" for k, v in r["build_params"].items())
+        lines.append(f"| {r['index_type']} | {params} | {r['search_param']} | {r['build_s']:.1f} | "
+                     f"{r['mem_mb']:.0f} | {r['qps']:,.0f} | {r['p50_ms']:.2f} | {r['p99_ms']:.2f} | "
+                     f"{r['recall']:.4f} |")
+    return "\n".join(lines)
+
+def create_bench_collection(name: str, dim: int):
+    from pymilvus import Collection, CollectionSchema, FieldSchema, DataType, utility
+
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="emb", dtype=DataType.FLOAT_VECTOR, dim=dim),
+    ]
+    return Collection(name=name, schema=CollectionSchema(fields, description="Index sweep"))
+
+def build_index(collection, index_type: str, params: Dict, metric_type: str) -> float:
+    """(Re)build the index and load the collection; returns build seconds."""
+    from pymilvus import utility
+    from src.data_ingestion.milvus_client import create_index
+
+    collection.release()
+    if collection.has_index():
+        collection.drop_index()
+    start = time.perf_counter()
+    create_index(collection, index_type=index_type, metric_type=metric_type, params=params)
+    utility.wait_for_index_building_complete(collection.name)
+    build_s = time.perf_counter() - start
+    collection.load()
+    return build_s
+
+def loaded_memory_mb(collection) -> float:
+    from pymilvus import utility
+
+    segments = utility.get_query_segment_info(collection.name)
+    return sum(getattr(s, "mem_size", 0) for s in segments) / 1024 ** 2
+
+def run_searches(collection, ids: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                 top_k: int, param: Dict, batch: int, latency_queries: int) -> Dict:
+    """Batched throughput, single-query latency and recall at one search param."""
+    found = np.full((len(queries), top_k), -1, dtype=np.int64)
+    start = time.perf_counter()
+    for s in range(0, len(queries), batch):
+        results = collection.search(data=queries[s:s + batch], anns_field="emb", param=param, limit=top_k)
+        for i, hits in enumerate(results):
+            found[s + i, :len(hits.ids)] = hits.ids
+    qps = len(queries) / (time.perf_counter() - start)
+
+    latencies = []
+    for q in queries[:latency_queries]:
+        t = time.perf_counter()
+        collection.search(data=[q], anns_field="emb", param=param, limit=top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+    return {"qps": qps, "p50_ms": float(p50), "p99_ms": float(p99),
+            "recall": recall_at_k(found, ids[truth])}
+
+def write_results(results: List[Dict], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for r in results:
+            writer.writerow({**r, "build_params": ";".join(f"{k}={v}" for k, v in r["build_params"].items())})
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Milvus index type / parameter sweep", parents=[settings])
+    parser.add_argument("--store", type=str, default=STORE_DIR, help="Vector store directory")
+    parser.add_argument("--rows", type=int, default=ROWS, help="Vectors inserted into the bench collection")
+    parser.add_argument("--queries", type=int, default=QUERIES, help="Held-out query vectors")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--metric", choices=("IP", "L2", "COSINE"), default=config.METRIC_TYPE)
+    parser.add_argument("--index-types", nargs="+", choices=list(INDEX_GRID), default=list(INDEX_GRID))
+    parser.add_argument("--batch", type=int, default=SEARCH_BATCH, help="Queries per request for QPS")
+    parser.add_argument("--latency-queries", type=int, default=LATENCY_QUERIES)
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE)
+    parser.add_argument("--keep", action="store_true", help="Keep the bench collection afterwards")
+    args = parser.parse_args()
+
+    from pymilvus import connections, utility
+    from src.polars_ops.parquet_vectors import VectorStore
+
+    store = VectorStore(args.store)
+    base_rows, query_rows = sample_rows(len(store), args.rows, args.queries)
+    base = np.asarray(store.vectors[base_rows])
+    ids = np.asarray(store.ids[base_rows])
+    queries = np.asarray(store.vectors[query_rows])
+    print(f"Sampled {len(base)} vectors and {len(queries)} queries from {args.store}")
+
+    start = time.perf_counter()
+    truth = exact_knn(base, queries, args.top_k, args.metric)
+    print(f"Exact top-{args.top_k} ground truth in {time.perf_counter() - start:.1f}s")
+
+    connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    name = f"{config.COLLECTION_NAME}_index_bench"
+    collection = create_bench_collection(name, store.dim)
+    for s in range(0, len(base), INSERT_BATCH):
+        collection.insert([ids[s:s + INSERT_BATCH].tolist(), base[s:s + INSERT_BATCH]])
+    collection.flush()
+    print(f"Inserted {collection.num_entities} vectors into '{name}'")
+
+    results = []
+    try:
+        for index_type, build_params, search_values in expand_grid(args.index_types, args.top_k):
+            build_s = build_index(collection, index_type, build_params, args.metric)
+            mem_mb = loaded_memory_mb(collection)
+            print(f"{index_type} {build_params}: built in {build_s:.1f}s, {mem_mb:.0f} MB loaded")
+            for value in search_values:
+                param = search_params(index_type, args.metric, value, args.top_k)
+                row = run_searches(collection, ids, queries, truth, args.top_k, param,
+                                   args.batch, args.latency_queries)
+                row.update(index_type=index_type, build_params=build_params,
+                           search_param=f"{SEARCH_PARAM_KEYS[index_type]}={value}",
+                           build_s=build_s, mem_mb=mem_mb)
+                print(f"  {row['search_param']}: recall {row['recall']:.4f}, "
+                      f"{row['qps']:,.0f} QPS, p99 {row['p99_ms']:.2f} ms")
+                results.append(row)
+    finally:
+        if results:
+            write_results(results, args.output)
+            print(f"Results written to {args.output}")
+        if not args.keep:
+            utility.drop_collection(name)
+
+    print()
+    print(format_table(results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare CSV loader throughput: pandas chunk loop vs pyarrow block reader.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.loader_benchmark
+python3 -m benchmarks.loader_benchmark --files precleaned-chunks/precleaned_chunk_1.csv --repeat 3
+"""
+
+import argparse
+import time
+from src.data_ingestion import config
+from src.data_ingestion.loader import stream_text_batches, LOADER_ENGINES
+
+def time_engine(files, engine, batch_size):
+    """Consume every batch once; return (rows, seconds)."""
+    start = time.perf_counter()
+    rows = 0
+    for batch in stream_text_batches(files, batch_size=batch_size, engine=engine):
+        rows += len(batch)
+    return rows, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV loader benchmark")
+    parser.add_argument("--files", nargs="+", default=config.CSV_FILES,
+                        help="CSV files to read (default: config.CSV_FILES)")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Runs per engine; the best run is reported")
+    args = parser.parse_args()
+
+    results = {}
+    for engine in LOADER_ENGINES:
+        runs = [time_engine(args.files, engine, args.batch_size) for _ in range(args.repeat)]
+        rows = runs[0][0]
+        best = min(seconds for _, seconds in runs)
+        results[engine] = (rows, best)
+        print(f"{engine:>8}: {rows} rows in {best:.2f}s -> {rows / best:,.0f} rows/s")
+
+    (rows_a, t_a), (rows_p, t_p) = results["pyarrow"], results["pandas"]
+    if rows_a != rows_p:
+        print(f"WARNING: engines returned different row counts ({rows_a} vs {rows_p})")
+    print(f"Speedup pyarrow vs pandas: {t_p / t_a:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Recall / latency / memory trade-offs of the approximate search modes,
+each measured against its exact or unpruned baseline.
+
+pruning:       cluster-pruned search (only the N nearest k-means clusters)
+               vs searching everything.
+               --backend milvus: AdvancedKNNSearcher(clusters=N) against the
+               labelled collection (cluster_assigner label --target milvus),
+               --layout filter | partition.
+               --backend local: LocalKNNSearcher ivf (nprobe=N) vs flat.
+quantization:  LocalKNNSearcher coarse scan on int8 / float16 vectors with
+               float32 rerank of top_k * rerank candidates vs float32 flat.
+
+Queries are rows sampled from the vector store. For every mode this prints
+recall@k against the baseline's results, batched QPS, single-query
+p50 / p99 latency, and (quantization) the size of the vectors scanned.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.search_tradeoffs pruning --backend local --clusters 1 2 3 5
+python3 -m benchmarks.search_tradeoffs pruning --backend milvus --collection texts_clustered --layout partition
+python3 -m benchmarks.search_tradeoffs quantization --dtypes int8 float16 --rerank 1 2 4 8
+"""
+
+import argparse
+import csv
+import os
+import time
+import numpy as np
+from typing import Callable, Dict, List
+from src.data_ingestion import config
+from benchmarks.index_sweep import recall_at_k, sample_rows
+
+QUERIES = 500
+TOP_K = 10
+SEARCH_BATCH = 50       # Queries per call for the QPS measurement
+LATENCY_QUERIES = 100   # Single-query calls timed for p50/p99
+
+def measure(search: Callable[[np.ndarray], np.ndarray], queries: np.ndarray, top_k: int,
+            batch: int = SEARCH_BATCH, latency_queries: int = LATENCY_QUERIES) -> Dict:
+    """
+    Run `search(vectors) -> ids (n, top_k)` over the queries in batches
+    (throughput), then one query at a time (latency).
+    """
+    found = np.full((len(queries), top_k), -1, dtype=np.int64)
+    start = time.perf_counter()
+    for s in range(0, len(queries), batch):
+        ids = search(queries[s:s + batch])
+        found[s:s + len(ids), :ids.shape[1]] = ids
+    qps = len(queries) / (time.perf_counter() - start)
+
+    latencies = []
+    for q in queries[:latency_queries]:
+        t = time.perf_counter()
+        search(q[None, :])
+        latencies.append((time.perf_counter() - t) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+    return {"found": found, "qps": qps, "p50_ms": float(p50), "p99_ms": float(p99)}
+
+def hits_to_ids(results, top_k: int) -> np.ndarray:
+    """Milvus-style hits (per query, objects with .id) -> ids (n, top_k), -1 padded."""
+    ids = np.full((len(results), top_k), -1, dtype=np.int64)
+    for i, hits in enumerate(results):
+        hit_ids = [hit.id for hit in hits][:top_k]
+        ids[i, :len(hit_ids)] = hit_ids
+    return ids
+
+def local_ids(searcher, top_k: int, **kwargs) -> Callable[[np.ndarray], np.ndarray]:
+    """search() for measure() over a LocalKNNSearcher's search_rows()."""
+    ids = np.asarray(searcher.store.ids)
+
+    def search(vectors):
+        _, rows = searcher.search_rows(vectors, top_k, **kwargs)
+        return np.where(rows >= 0, ids[np.maximum(rows, 0)], -1)
+    return search
+
+def format_table(rows: List[Dict], columns: List[str]) -> str:
+    """Markdown table of the given result columns."""
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for r in rows:
+        cells = []
+        for c in columns:
+            v = r[c]
+            cells.append(f"{v:.4f}" if c == "recall" else f"{v:,.2f}" if isinstance(v, float) else str(v))
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+def add_result(results: List[Dict], baseline: Dict, mode: str, run: Dict, **extra):
+    row = {"mode": mode, "recall": recall_at_k(run["found"], baseline["found"]),
+           "qps": run["qps"], "p50_ms": run["p50_ms"], "p99_ms": run["p99_ms"], **extra}
+    print(f"{mode}: recall {row['recall']:.4f}, {row['qps']:,.0f} QPS, p50 {row['p50_ms']:.2f} ms")
+    results.append(row)
+
+def run_pruning(args, queries: np.ndarray) -> List[Dict]:
+    results = []
+    if args.backend == "local":
+        from src.operations.local_searcher import LocalKNNSearcher
+
+        flat = LocalKNNSearcher(args.store, metric_type=args.metric)
+        ivf = LocalKNNSearcher(args.store, metric_type=args.metric, index="ivf", model_dir=args.model_dir)
+        baseline = measure(local_ids(flat, args.top_k), queries, args.top_k)
+        add_result(results, baseline, "unpruned", baseline)
+        for n in args.clusters:
+            add_result(results, baseline, f"clusters={n}",
+                       measure(local_ids(ivf, args.top_k, nprobe=n), queries, args.top_k))
+        return results
+
+    import importlib
+    searcher_module = importlib.import_module("src.operations.KNN-searcher-adv")
+    searcher = searcher_module.AdvancedKNNSearcher(
+        collection_name=args.collection or f"{config.COLLECTION_NAME}_clustered",
+        metric_type=args.metric, cluster_model_dir=args.model_dir, cluster_layout=args.layout,
+        query_cache_size=0, result_cache_size=0, entity_check_seconds=None)
+
+    def milvus_search(clusters):
+        return lambda vectors: hits_to_ids(searcher.search_vectors(vectors, args.top_k, clusters=clusters),
+                                           args.top_k)
+
+    baseline = measure(milvus_search(0), queries, args.top_k)
+    add_result(results, baseline, "unpruned", baseline)
+    for n in args.clusters:
+        add_result(results, baseline, f"clusters={n} ({args.layout})",
+                   measure(milvus_search(n), queries, args.top_k))
+    searcher.close()
+    return results
+
+def run_quantization(args, queries: np.ndarray) -> List[Dict]:
+    from src.operations.local_searcher import LocalKNNSearcher
+
+    results = []
+    exact = LocalKNNSearcher(args.store, metric_type=args.metric)
+    baseline = measure(local_ids(exact, args.top_k), queries, args.top_k)
+    add_result(results, baseline, "float32", baseline, vectors_mb=exact.store.vectors.nbytes / 1024 ** 2)
+    for dtype in args.dtypes:
+        searcher = LocalKNNSearcher(args.store, metric_type=args.metric, quantized=dtype)
+        for rerank in args.rerank:
+            searcher.rerank = rerank
+            add_result(results, baseline, f"{dtype} rerank={rerank}",
+                       measure(local_ids(searcher, args.top_k), queries, args.top_k),
+                       vectors_mb=searcher.quantized.nbytes / 1024 ** 2)
+    return results
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Approximate search trade-offs", parents=[settings])
+    parser.add_argument("--store", type=str, default="exports/vector_store", help="Vector store directory")
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--metric", choices=("IP", "L2", "COSINE"), default=config.METRIC_TYPE)
+    parser.add_argument("--output", type=str, default=None, help="Also write the results as CSV")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pruning = sub.add_parser("pruning", help="Cluster-pruned vs unpruned search")
+    pruning.add_argument("--backend", choices=("milvus", "local"), default="milvus")
+    pruning.add_argument("--clusters", type=int, nargs="+", default=[1, 2, 3, 5])
+    pruning.add_argument("--model-dir", type=str, default="src/sklearn_models/minibatch_kmeans")
+    pruning.add_argument("--layout", choices=("filter", "partition"), default="filter")
+
+    quantization = sub.add_parser("quantization", help="Quantized + rerank vs float32 search")
+    quantization.add_argument("--dtypes", nargs="+", choices=("int8", "float16"), default=["int8", "float16"])
+    quantization.add_argument("--rerank", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    from src.polars_ops.parquet_vectors import VectorStore
+
+    store = VectorStore(args.store)
+    _, query_rows = sample_rows(len(store), 0, args.queries)
+    queries = np.asarray(store.vectors[query_rows])
+    print(f"{len(queries)} queries sampled from {args.store} ({len(store)} vectors)")
+
+    if args.command == "pruning":
+        results = run_pruning(args, queries)
+        columns = ["mode", "recall", "qps", "p50_ms", "p99_ms"]
+    else:
+        results = run_quantization(args, queries)
+        columns = ["mode", "vectors_mb", "recall", "qps", "p50_ms", "p99_ms"]
+
+    print()
+    print(format_table(results, columns))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows({c: r[c] for c in columns} for r in results)
+
+if __name__ == "__main__":
+    main()
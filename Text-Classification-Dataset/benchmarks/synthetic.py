@@ -0,0 +1,282 @@
+"""
+Synthetic Reddit-like corpora, an in-memory Milvus collection stand-in and
+a stub embedding model, for benchmarking the pipeline without the real
+dumps, a Milvus server or a downloaded model.
+
+Corpora are written in the format of precleaned-chunks/precleaned_chunk_*.csv:
+'~'-separated, every field quoted with '"' (doubled inside fields), one
+header line, columns id ~ body_cleaned ~ subreddit ~ score. Comment bodies
+mimic Reddit's shape:
+
+- word counts are log-normal (median ~25 words, long tail to 2000), so a
+  few long posts dominate the embedding cost, as in the real dumps;
+- words are drawn Zipf-distributed from a fixed vocabulary;
+- some rows are reposts of earlier rows (differing only in case and
+  surrounding whitespace), empty, or "[deleted]" / "nan";
+- some bodies contain URLs, quotes and '~'.
+
+The same (rows, files, seed) always gives byte-identical files; generate()
+reuses a corpus already on disk with the same parameters.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m benchmarks.synthetic --rows 100000 --out exports/bench/corpus_100k
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+import numpy as np
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Optional
+
+MANIFEST_FILE = "corpus.json"
+VOCAB_SIZE = 30000
+ZIPF_EXPONENT = 1.1
+MEDIAN_WORDS = 25
+MAX_WORDS = 2000
+DUPLICATE_RATE = 0.03     # Rows reposting an earlier row
+MISSING_RATE = 0.005      # Empty, "[deleted]" or "nan" rows
+WRITE_ROWS = 20000        # Rows generated and written at a time
+
+_COMMON_WORDS = (
+    "the i to a and you it of that is in this for was on my but not have be with just they "
+    "so are like if what can do at all your me one people he would about get or no it's there "
+    "don't lol yeah think i'm more an good from know how really time when out some will up "
+    "because also as them even much would've edit: deleted thanks op"
+).split()
+_SUBREDDITS = ("AskReddit", "worldnews", "gaming", "funny", "todayilearned", "science",
+               "movies", "politics", "technology", "personalfinance")
+_SYLLABLES = ("ka", "lo", "mi", "ren", "tor", "sa", "vel", "qu", "dan", "ix", "po", "er",
+              "ul", "zen", "tha", "ri", "mo", "bex", "ny", "cor")
+_MISSING = ("", "[deleted]", "nan")
+
+@lru_cache(maxsize=4)
+def make_vocabulary(size: int = VOCAB_SIZE) -> np.ndarray:
+    """Common English words followed by pronounceable pseudo-words, most frequent first."""
+    rng = np.random.default_rng(0)
+    words, seen = list(_COMMON_WORDS), set(_COMMON_WORDS)
+    while len(words) < size:
+        counts = rng.integers(1, 5, size)
+        syllables = rng.integers(0, len(_SYLLABLES), (size, 4))
+        for count, picks in zip(counts, syllables):
+            word = "".join(_SYLLABLES[s] for s in picks[:count])
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+    return np.array(words[:size], dtype=object)
+
+def _quote(field: str) -> str:
+    return '"' + field.replace('"', '""') + '"'
+
+def generate_rows(rows: int, seed: int = 0, start_id: int = 1):
+    """Yield lists of CSV lines (no trailing newline), WRITE_ROWS at a time."""
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary()
+    ranks = np.arange(1, len(vocab) + 1, dtype=np.float64)
+    p = ranks ** -ZIPF_EXPONENT
+    p /= p.sum()
+    history: List[str] = []
+
+    for first in range(0, rows, WRITE_ROWS):
+        n = min(WRITE_ROWS, rows - first)
+        lengths = np.clip(rng.lognormal(np.log(MEDIAN_WORDS), 1.0, n), 1, MAX_WORDS).astype(np.int64)
+        words = vocab[rng.choice(len(vocab), size=int(lengths.sum()), p=p)]
+        ends = np.cumsum(lengths)
+        kind = rng.random((n, 4))
+        subreddits = rng.integers(0, len(_SUBREDDITS), n)
+        scores = rng.geometric(0.2, n) - 2
+
+        lines = []
+        for i in range(n):
+            r = kind[i]
+            if r[0] < MISSING_RATE:
+                body = _MISSING[int(r[1] * len(_MISSING))]
+            elif r[0] < MISSING_RATE + DUPLICATE_RATE and history:
+                body = history[int(r[1] * len(history))]
+                body = body.upper() if r[2] < 0.5 else f"  {body} "
+            else:
+                body = " ".join(words[ends[i] - lengths[i]:ends[i]])
+                if r[1] < 0.3:
+                    body = body[0].upper() + body[1:]
+                if r[2] < 0.05:
+                    body += f" https://www.reddit.com/r/{_SUBREDDITS[subreddits[i]]}/comments/{first + i:x}"
+                if r[3] < 0.03:
+                    body = f'"{body}" ~ this'
+                if len(history) < 1000:
+                    history.append(body)
+                elif r[3] < 0.01:
+                    history[int(r[2] * len(history))] = body
+            lines.append("~".join((_quote(str(start_id + first + i)), _quote(body),
+                                   _quote(_SUBREDDITS[subreddits[i]]), _quote(str(scores[i])))))
+        yield lines
+
+def generate(out_dir: str, rows: int, files: int = 5, seed: int = 0) -> Dict:
+    """
+    Write a corpus of `rows` rows split over `files` precleaned_chunk_<n>.csv
+    files (unless the same corpus is already in out_dir).
+
+    Returns:
+        dict: The manifest (parameters, file paths, bytes, generation time).
+    """
+    params = {"rows": rows, "files": files, "seed": seed, "vocab_size": VOCAB_SIZE,
+              "duplicate_rate": DUPLICATE_RATE, "missing_rate": MISSING_RATE}
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["params"] == params and all(os.path.exists(p) for p in manifest["paths"]):
+            return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.time()
+    per_file = -(-rows // files)
+    paths, total_bytes = [], 0
+    for n in range(files):
+        first = n * per_file
+        count = max(0, min(per_file, rows - first))
+        path = os.path.join(out_dir, f"precleaned_chunk_{n + 1}.csv")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write('"id"~"body_cleaned"~"subreddit"~"score"\n')
+            for lines in generate_rows(count, seed=seed * 1000 + n, start_id=first + 1):
+                f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+        paths.append(path)
+        total_bytes += os.path.getsize(path)
+
+    manifest = {"params": params, "paths": paths, "bytes": total_bytes,
+                "generate_seconds": round(time.time() - start, 2),
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+_RANGE_EXPR = re.compile(r"id\s*(>=|>|<=|<)\s*(-?\d+)")
+
+class MemoryCollection:
+    """
+    In-memory stand-in for a pymilvus Collection with (id, text, emb) rows:
+    insert, flush, num_entities and id-range query() (the calls made by
+    BufferedInserter, the Parquet exporter and k-means training).
+
+    Inserts copy the columns the way a client must before sending them, so
+    timings cover the pipeline's own buffering and conversion work, not
+    Milvus' network, WAL or indexing costs.
+    """
+
+    def __init__(self, name: str = "bench"):
+        self.name = name
+        self._ids, self._texts, self._vectors = [], [], []
+        self._pending = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = None
+        self.texts: List[str] = []
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.ids)
+
+    def insert(self, columns):
+        ids, texts, vectors = columns
+        self._ids.append(np.array(ids, dtype=np.int64))
+        self._texts.extend(texts)
+        self._vectors.append(np.array(vectors, dtype=np.float32))
+        self._pending += len(ids)
+
+    def flush(self):
+        """Make inserted rows visible to num_entities and query(), sorted by id."""
+        if not self._pending:
+            return
+        ids = np.concatenate([self.ids] + self._ids)
+        vectors = np.concatenate(([self.vectors] if self.vectors is not None else []) + self._vectors)
+        texts = self.texts + self._texts
+        order = np.argsort(ids, kind="stable")
+        self.ids, self.vectors = ids[order], vectors[order]
+        self.texts = [texts[i] for i in order]
+        self._ids, self._texts, self._vectors, self._pending = [], [], [], 0
+
+    def create_index(self, field_name, index_params):
+        pass
+
+    def load(self):
+        pass
+
+    def query(self, expr: str, output_fields: List[str], limit: Optional[int] = None) -> List[Dict]:
+        """Rows matching an id range expression such as "id >= 1 and id <= 100", in id order."""
+        lo, hi = 0, len(self.ids)
+        for op, value in _RANGE_EXPR.findall(expr):
+            value = int(value)
+            if op in (">=", ">"):
+                lo = max(lo, int(np.searchsorted(self.ids, value, side="left" if op == ">=" else "right")))
+            else:
+                hi = min(hi, int(np.searchsorted(self.ids, value, side="right" if op == "<=" else "left")))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        rows = []
+        for i in range(lo, hi):
+            row = {}
+            for field in output_fields:
+                row[field] = (int(self.ids[i]) if field == "id" else self.texts[i] if field == "text"
+                              else self.vectors[i])
+            rows.append(row)
+        return rows
+
+# --model value selecting StubModel instead of a SentenceTransformer
+STUB_MODEL_NAME = "stub"
+
+class StubModel:
+    """
+    Deterministic stand-in for a SentenceTransformer, for benchmarks and
+    tests that must run without torch or a downloaded model.
+
+    Each whitespace token of the first `max_seq_length` is hashed to a
+    signed dimension (feature hashing), so texts sharing words get similar
+    vectors and the cost grows with text length like a real encoder's.
+    """
+
+    def __init__(self, dim: int, max_seq_length: int = 256):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self._features = {}  # token -> (dimension, sign)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _feature(self, token: str):
+        feature = self._features.get(token)
+        if feature is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            feature = self._features[token] = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+        return feature
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, show_progress_bar: bool = False,
+               **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.split()[:self.max_seq_length]:
+                dim, sign = self._feature(token)
+                vectors[row, dim] += sign
+        return vectors
+
+def model_factory(model_name: str, dim: int) -> Optional[Callable]:
+    """
+    Embedder(model_factory=...) for a benchmark's --model: a StubModel of
+    `dim` dimensions for STUB_MODEL_NAME, None (load the named model) otherwise.
+    """
+    return partial(StubModel, dim) if model_name == STUB_MODEL_NAME else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Reddit-like corpus")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default="exports/bench/corpus")
+    args = parser.parse_args()
+    manifest = generate(args.out, args.rows, args.files, args.seed)
+    print(json.dumps(manifest, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,22 @@ Data Ingestion Package for Milvus:
 - Preprocess and embed with sentence-transformers
 - Insert into Milvus
 - Cluster embeddings with KMeans and HDBSCAN
+
+Importing the package is cheap: settings are resolved and heavy
+dependencies (pandas, pymilvus, sentence-transformers) imported on first use.
 """
 
 __version__ = "0.1.0"
 
-from .config import COLLECTION_NAME, CSV_FILES, EMBED_MODEL_NAME
-from .pipeline import run_ingestion
+from .config import configure
+
+_CONFIG_EXPORTS = ("COLLECTION_NAME", "CSV_FILES", "EMBED_MODEL_NAME")
+
+def __getattr__(name):
+    if name in _CONFIG_EXPORTS:
+        from . import config
+        return getattr(config, name)
+    if name == "run_ingestion":
+        from .pipeline import run_ingestion
+        return run_ingestion
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+import numpy as np
+from typing import List
+from . import config
+from .loader import SourcePosition
+
+def checkpoint_path(collection_name: str) -> str:
+    """Default checkpoint file of a collection."""
+    return os.path.join(config.checkpoint_dir(), f"ingest_{collection_name}.checkpoint.json")
+
+class IngestCheckpoint:
+    """
+    Records ingestion progress so an interrupted run can be resumed.
+
+    Two files:
+        <path>          JSON state: where to resume reading (file, byte
+                        offset, rows to skip), the next id to assign and
+                        how many rows were inserted.
+        <path>.hashes   uint64 dedup hashes of every inserted row, in insert
+                        order (append-only), used to rebuild the
+                        deduplicator on resume.
+
+    Hashes are appended before the JSON is atomically replaced, and the JSON
+    records how many hashes belong to it, so a crash between the two writes
+    leaves a consistent checkpoint.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes_path = path + ".hashes"
+        self.state = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        with open(self.path) as f:
+            self.state = json.load(f)
+        return self.state
+
+    def load_hashes(self) -> np.ndarray:
+        """Hashes of the rows inserted up to the loaded checkpoint."""
+        count = self.state["num_hashes"]
+        if not count:
+            return np.empty(0, dtype=np.uint64)
+        hashes = np.fromfile(self.hashes_path, dtype=np.uint64, count=count)
+        # Drop hashes appended after the last JSON write (crash in between)
+        with open(self.hashes_path, "r+b") as f:
+            f.truncate(count * 8)
+        return hashes
+
+    def position(self) -> SourcePosition:
+        return SourcePosition(self.state["file_index"], self.state["offset"], self.state["skip_rows"])
+
+    def start(self, collection_name: str, files: List[str], first_id: int = 1):
+        """Begin a fresh checkpoint for a new ingestion run."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        open(self.hashes_path, "wb").close()
+        self.state = {
+            "collection": collection_name,
+            "files": list(files),
+            "file_index": 0,
+            "file": files[0] if files else None,
+            "offset": 0,
+            "skip_rows": 0,
+            "next_id": first_id,
+            "rows_inserted": 0,
+            "num_hashes": 0,
+            "complete": False,
+        }
+        self._write()
+
+    def update(self, position: SourcePosition, next_id: int, hashes: np.ndarray):
+        """Record rows durably inserted up to `position`."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        with open(self.hashes_path, "ab") as f:
+            hashes.tofile(f)
+        self.state.update(
+            file_index=position.file_index,
+            file=self.state["files"][position.file_index],
+            offset=position.offset,
+            skip_rows=position.skip_rows,
+            next_id=next_id,
+            rows_inserted=self.state["rows_inserted"] + len(hashes),
+            num_hashes=self.state["num_hashes"] + len(hashes)
+        )
+        self._write()
+
+    def mark_complete(self):
+        self.state["complete"] = True
+        self._write()
+
+    def _write(self):
+        self.state["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -1,3 +1,23 @@
+"""
+Ingestion settings.
+
+Every setting below is a default that can be overridden, in increasing
+order of precedence, by:
+
+    a JSON config file   {"collection_name": "texts", "batch_size": 1024}
+                         named by the INGEST_CONFIG environment variable
+    environment vars     INGEST_<SETTING>, e.g. INGEST_BATCH_SIZE=1024
+                         (COLLECTION_NAME is also read without the prefix)
+    configure()          configure(collection_name="texts"), used by the CLIs
+
+Importing this module never prompts and imports nothing heavy.
+COLLECTION_NAME is resolved when first read and raises if it was not set.
+Function defaults taken from settings are bound when the using module is
+imported, so call configure() early or pass values explicitly.
+"""
+import argparse
+import json
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent
@@ -13,20 +33,211 @@ TEXT_COLUMN = "body_cleaned"
 # Embedding model
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
 
+# Embedding worker processes (0 = encode in the calling process) and
+# torch threads per worker (None = split the CPU cores evenly)
+EMBED_WORKERS = 0
+EMBED_TORCH_THREADS = None
+
+# Persistent embedding cache (None = disabled). Each entry takes
+# VECTOR_DIM * 4 bytes on disk; least recently used entries are evicted
+# beyond EMBED_CACHE_CAPACITY.
+EMBED_CACHE_DIR = None
+EMBED_CACHE_CAPACITY = 1000000
+
+# How each embed call is split into forward passes: "tokens" sorts the
+# texts by token length and fills each pass up to EMBED_TOKEN_BUDGET padded
+# tokens (at most EMBED_MAX_BATCH texts); "fixed" leaves it to the model
+# (SentenceTransformer: 32 texts per pass). Texts are truncated at
+# EMBED_MAX_SEQ_LENGTH tokens (None = the model's own limit).
+# "tokens" runs the tokenizer once more to measure lengths (the model
+# tokenizes again in encode()), so keep "fixed" unless
+# benchmarks/embed_batching.py on the real model and corpus shows the
+# padding saved outweighs that extra pass.
+EMBED_BATCHING = "fixed"
+EMBED_TOKEN_BUDGET = 16384
+EMBED_MAX_BATCH = 512
+EMBED_MAX_SEQ_LENGTH = None
+
+# Inference backend: "torch" (sentence-transformers) or "onnx" (ONNX
+# Runtime on the model exported once into EMBED_ONNX_DIR, see
+# onnx_backend.py), optionally with int8 dynamically quantized weights
+# (EMBED_ONNX_DIR None = EXPORT_DIR/onnx, as currently configured; see onnx_dir())
+EMBED_BACKEND = "torch"
+EMBED_ONNX_QUANTIZE = False
+EMBED_ONNX_DIR = None
+
 # Milvus connection
 MILVUS_HOST = "localhost"
 MILVUS_PORT = 19530
 
 # Collection settings
-print("\n-------From config.py-------")
-COLLECTION_NAME = input("Enter collection name: ")
+# COLLECTION_NAME has no default: it comes from a config file, the
+# environment or configure() and is only required when first read
 VECTOR_DIM = 384
 INDEX_FILE_SIZE = 1024
 METRIC_TYPE = "IP"
 
+# Vector index built after ingestion (see benchmarks/index_sweep.py for
+# choosing these) and the default search-time parameter of that index:
+# nprobe for IVF indexes, ef for HNSW, unused by FLAT (None = the
+# per-index default in milvus_client.SEARCH_PARAM_DEFAULTS)
+INDEX_TYPE = "IVF_FLAT"
+INDEX_PARAMS = {"nlist": 1024}
+SEARCH_PARAM = None
+
 # Batch sizes
 BATCH_SIZE = 2048
 CHUNK_SIZE = 8000
 
+# CSV reader: "pyarrow" (parses READ_BLOCK_SIZE-byte blocks with
+# pyarrow's multithreaded reader) or "pandas" (read_csv in CHUNK_SIZE rows)
+LOADER_ENGINE = "pyarrow"
+READ_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Cross-batch deduplication: "hashset" (exact 64-bit hashes, memory grows
+# with distinct texts), "bloom" (fixed memory sized for DEDUP_CAPACITY
+# texts at DEDUP_FP_RATE false positives) or "none"
+DEDUP_MODE = "hashset"
+DEDUP_CAPACITY = 3000000
+DEDUP_FP_RATE = 0.001
+
+# Pipelined ingestion: max number of batches buffered between stages
+# (reader -> embedder -> inserter). Full queues block the upstream stage.
+READ_QUEUE_SIZE = 4
+INSERT_QUEUE_SIZE = 4
+
+# Files ingested concurrently, each with a fixed id range (0 = one after
+# another; see id_ranges.py)
+FILE_WORKERS = 0
+
+# Milvus flushing: "never" (let Milvus seal segments itself), "rows"
+# (every FLUSH_EVERY_ROWS rows), "seconds" (every FLUSH_EVERY_SECONDS)
+# or "end" (once, after the last insert)
+FLUSH_POLICY = "end"
+FLUSH_EVERY_ROWS = 200000
+FLUSH_EVERY_SECONDS = 60.0
+
+# Rows are buffered and sent to Milvus in inserts of about this many bytes
+INSERT_BUFFER_BYTES = 32 * 1024 * 1024
+
 # Export directory
 EXPORT_DIR = str(BASE_DIR.parent / "exports")
+
+# Ingestion checkpoints (see checkpoint.py), one per collection
+# (None = EXPORT_DIR, as currently configured; see checkpoint_dir())
+CHECKPOINT_DIR = None
+
+# Per-stage timings of each ingestion run, appended as JSON lines
+# (see metrics.py; None = only print the summary table)
+METRICS_FILE = None
+
+ENV_PREFIX = "INGEST_"
+CONFIG_FILE_ENV = "INGEST_CONFIG"
+
+# Types of settings whose default is None, for parsing environment values
+_OPTIONAL_TYPES = {
+    "COLLECTION_NAME": str,
+    "CHECKPOINT_DIR": str,
+    "EMBED_ONNX_DIR": str,
+    "SEARCH_PARAM": int,
+    "EMBED_TORCH_THREADS": int,
+    "EMBED_CACHE_DIR": str,
+    "EMBED_MAX_SEQ_LENGTH": int,
+    "METRICS_FILE": str,
+}
+
+_NOT_SETTINGS = {"BASE_DIR", "ENV_PREFIX", "CONFIG_FILE_ENV"}
+
+def _settings() -> list:
+    names = [n for n in globals() if n.isupper() and n not in _NOT_SETTINGS]
+    return names + [n for n in _OPTIONAL_TYPES if n not in names]
+
+def _parse_env(name: str, raw: str):
+    """Convert an environment string to the type of the setting's default."""
+    default = globals().get(name)
+    if default is None:
+        if raw.lower() in ("", "none"):
+            return None
+        return _OPTIONAL_TYPES.get(name, str)(raw)
+    if isinstance(default, bool):
+        return raw.lower() in ("1", "true", "yes", "on")
+    if isinstance(default, list):
+        return raw.split(os.pathsep)
+    if isinstance(default, dict):
+        return json.loads(raw)
+    return type(default)(raw)
+
+def configure(**settings):
+    """
+    Override settings by name (case-insensitive), e.g.
+    configure(collection_name="texts", batch_size=1024).
+    """
+    known = set(_settings())
+    for key, value in settings.items():
+        name = key.upper()
+        if name not in known:
+            raise ValueError(f"Unknown setting '{key}'")
+        if name == "COLLECTION_NAME" and not value:
+            globals().pop(name, None)
+        else:
+            globals()[name] = value
+
+def checkpoint_dir() -> str:
+    """CHECKPOINT_DIR, defaulting to the current EXPORT_DIR."""
+    return CHECKPOINT_DIR or EXPORT_DIR
+
+def onnx_dir() -> str:
+    """EMBED_ONNX_DIR, defaulting to onnx/ in the current EXPORT_DIR."""
+    return EMBED_ONNX_DIR or os.path.join(EXPORT_DIR, "onnx")
+
+def load_file(path: str):
+    """Apply the settings of a JSON config file."""
+    with open(path) as f:
+        configure(**json.load(f))
+
+def settings_parser(argv=None) -> argparse.ArgumentParser:
+    """
+    Apply the --config and --collection flags of a CLI and return a parser
+    holding them, to pass as a parent to the CLI's own parser. Call this
+    before building the other flags so their defaults reflect the settings.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--config",
+        type=str,
+        help=f"JSON file of settings (default: ${CONFIG_FILE_ENV})"
+    )
+    parser.add_argument(
+        "--collection",
+        type=str,
+        help="Milvus collection name (default: $COLLECTION_NAME)"
+    )
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        load_file(args.config)
+    if args.collection:
+        configure(collection_name=args.collection)
+    return parser
+
+def _load_environment():
+    if os.environ.get(CONFIG_FILE_ENV):
+        load_file(os.environ[CONFIG_FILE_ENV])
+    overrides = {}
+    if os.environ.get("COLLECTION_NAME"):
+        overrides["COLLECTION_NAME"] = os.environ["COLLECTION_NAME"]
+    for name in _settings():
+        raw = os.environ.get(ENV_PREFIX + name)
+        if raw is not None:
+            overrides[name] = _parse_env(name, raw)
+    configure(**overrides)
+
+def __getattr__(name: str):
+    # Only reached while COLLECTION_NAME is unset
+    if name == "COLLECTION_NAME":
+        raise RuntimeError(
+            "No collection name configured: pass --collection, set the "
+            "COLLECTION_NAME environment variable or call config.configure(collection_name=...)"
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_load_environment()
@@ -0,0 +1,132 @@
+import math
+import sys
+import numpy as np
+from typing import List, Tuple
+from . import config
+from .utils import text_hash64
+
+DEDUP_MODES = ("none", "hashset", "bloom")
+
+def hash_texts(texts: List[str]) -> np.ndarray:
+    """64-bit hashes of texts as a uint64 array."""
+    return np.fromiter((text_hash64(t) for t in texts), dtype=np.uint64, count=len(texts))
+
+class HashSetDeduplicator:
+    """
+    Drops texts already seen in any earlier batch.
+
+    Keeps one 64-bit hash per distinct text, so memory grows with the number
+    of distinct texts (~70 bytes each in a Python set). Two different texts
+    collide with probability ~n^2 / 2^65, i.e. effectively never.
+    Expects texts already normalized and deduplicated within the batch
+    (see preprocessor.normalize_texts).
+    """
+
+    def __init__(self):
+        self._seen = set()
+        self.dropped = 0
+
+    def filter(self, texts: List[str]) -> List[str]:
+        return self.filter_with_hashes(texts)[0]
+
+    def filter_with_hashes(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Like filter(), also returning the hashes of the kept texts."""
+        hashes = hash_texts(texts)
+        new = self.new_mask(hashes)
+        return [t for t, keep in zip(texts, new) if keep], hashes[new]
+
+    def new_mask(self, hashes: np.ndarray) -> np.ndarray:
+        """Mark hashes as seen; return True where a hash had not been seen before."""
+        new = np.zeros(len(hashes), dtype=bool)
+        for i, h in enumerate(hashes.tolist()):
+            if h not in self._seen:
+                self._seen.add(h)
+                new[i] = True
+        self.dropped += len(hashes) - int(new.sum())
+        return new
+
+    def add_hashes(self, hashes: np.ndarray):
+        """Mark texts as seen by their hash_texts() hashes (e.g. when resuming)."""
+        self._seen.update(hashes.tolist())
+
+    def memory_bytes(self) -> int:
+        # Set table plus one int object per hash
+        return sys.getsizeof(self._seen) + len(self._seen) * sys.getsizeof(2 ** 63)
+
+class BloomDeduplicator:
+    """
+    Drops texts already seen in any earlier batch, using a Bloom filter.
+
+    Memory is fixed up front from the expected number of distinct texts
+    (`capacity`) and the target false-positive rate; a false positive drops
+    a text that was not actually a duplicate. Expects texts already
+    normalized and deduplicated within the batch.
+    """
+
+    def __init__(self, capacity: int = config.DEDUP_CAPACITY,
+                 fp_rate: float = config.DEDUP_FP_RATE):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.dropped = 0
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        """Bit positions of each hash, shape (len(hashes), num_hashes)."""
+        # Double hashing h1 + i * h2, with h2 derived from h1 by a splitmix64
+        # round (wrapping uint64 arithmetic)
+        h1 = hashes[:, None]
+        h2 = hashes ^ (hashes >> np.uint64(31))
+        h2 = h2 * np.uint64(0xBF58476D1CE4E5B9)
+        h2 = (h2 ^ (h2 >> np.uint64(27))) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1 + steps * h2[:, None]) % np.uint64(self.num_bits)
+
+    def _split(self, positions: np.ndarray):
+        return positions // np.uint64(8), (positions % np.uint64(8)).astype(np.uint8)
+
+    def filter(self, texts: List[str]) -> List[str]:
+        return self.filter_with_hashes(texts)[0]
+
+    def filter_with_hashes(self, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Like filter(), also returning the hashes of the kept texts."""
+        hashes = hash_texts(texts)
+        new = self.new_mask(hashes)
+        return [t for t, keep in zip(texts, new) if keep], hashes[new]
+
+    def new_mask(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Mark hashes as seen; return True where a hash had (probably) not been
+        seen before. Hashes must be distinct within one call.
+        """
+        if not len(hashes):
+            return np.zeros(0, dtype=bool)
+        byte_idx, bit = self._split(self._positions(hashes))
+        present = ((self.bits[byte_idx] >> bit) & 1).all(axis=1)
+
+        new = ~present
+        np.bitwise_or.at(self.bits, byte_idx[new].ravel(), (np.uint8(1) << bit[new]).ravel())
+        self.dropped += int(present.sum())
+        return new
+
+    def add_hashes(self, hashes: np.ndarray):
+        """Mark texts as seen by their hash_texts() hashes (e.g. when resuming)."""
+        if len(hashes):
+            byte_idx, bit = self._split(self._positions(hashes))
+            np.bitwise_or.at(self.bits, byte_idx.ravel(), (np.uint8(1) << bit).ravel())
+
+    def memory_bytes(self) -> int:
+        return self.bits.nbytes
+
+def make_deduplicator(mode: str = config.DEDUP_MODE,
+                      capacity: int = config.DEDUP_CAPACITY,
+                      fp_rate: float = config.DEDUP_FP_RATE):
+    """Build the cross-batch deduplicator for `mode` ("none" returns None)."""
+    if mode == "none":
+        return None
+    if mode == "hashset":
+        return HashSetDeduplicator()
+    if mode == "bloom":
+        return BloomDeduplicator(capacity, fp_rate)
+    raise ValueError(f"Unknown dedup mode '{mode}', expected one of {DEDUP_MODES}")
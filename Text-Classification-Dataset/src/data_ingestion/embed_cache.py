@@ -0,0 +1,151 @@
+import os
+import re
+import numpy as np
+from typing import List, Tuple
+from . import config
+from .preprocessor import normalize_text
+from .utils import text_hash64
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Maps hash(model name, normalized text) -> float32 vector. Entries live in
+    fixed-size memory-mapped files under `cache_dir/<model>/`:
+
+        keys.npy     uint64 key per slot (0 = empty)
+        ticks.npy    uint64 last-use tick per slot
+        vectors.npy  float32 (capacity, dim)
+
+    When the cache is full, the least recently used slots are evicted.
+    Every write goes straight to the memory-mapped files, so nothing extra
+    needs saving; close() just flushes them. Not safe for concurrent use
+    by several processes.
+    """
+
+    # Fraction of the capacity freed at once when the cache is full
+    EVICT_FRACTION = 0.05
+
+    def __init__(self, cache_dir: str, model_name: str,
+                 dim: int = config.VECTOR_DIM,
+                 capacity: int = config.EMBED_CACHE_CAPACITY):
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = capacity
+        self.path = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+
+        layout = {"keys.npy": ((capacity,), np.uint64),
+                  "ticks.npy": ((capacity,), np.uint64),
+                  "vectors.npy": ((capacity, dim), np.float32)}
+        # The files only make sense together: if capacity or dim changed,
+        # start all of them over, or old keys would point at zeroed vectors
+        reset = not all(self._matches(name, shape, dtype) for name, (shape, dtype) in layout.items())
+        self.keys, self.ticks, self.vectors = (
+            self._open(name, shape, dtype, reset) for name, (shape, dtype) in layout.items())
+
+        used = np.flatnonzero(self.keys)
+        self._slots = dict(zip(self.keys[used].tolist(), used.tolist()))
+        self._free = np.flatnonzero(self.keys == 0)[::-1].tolist()
+        self._tick = int(self.ticks.max()) if capacity else 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _matches(self, name: str, shape: Tuple[int, ...], dtype) -> bool:
+        fp = os.path.join(self.path, name)
+        if not os.path.exists(fp):
+            return False
+        arr = np.lib.format.open_memmap(fp, mode="r")
+        return arr.shape == shape and arr.dtype == dtype
+
+    def _open(self, name: str, shape: Tuple[int, ...], dtype, reset: bool) -> np.ndarray:
+        fp = os.path.join(self.path, name)
+        if reset:
+            return np.lib.format.open_memmap(fp, mode="w+", dtype=dtype, shape=shape)
+        return np.lib.format.open_memmap(fp, mode="r+")
+
+    def __len__(self):
+        return len(self._slots)
+
+    def key(self, text: str) -> int:
+        # 0 marks an empty slot, so never hand it out as a key
+        return text_hash64(normalize_text(text), salt=self.model_name) or 1
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int], List[int]]:
+        """
+        Look up a batch of texts.
+
+        Returns:
+            (vectors, keys, missing): a float32 (len(texts), dim) array with
+            cached vectors filled in, the key of every text, and the
+            positions of the texts that were not cached.
+        """
+        keys = [self.key(t) for t in texts]
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        positions, slots, missing = [], [], []
+        for i, k in enumerate(keys):
+            slot = self._slots.get(k)
+            if slot is None:
+                missing.append(i)
+            else:
+                positions.append(i)
+                slots.append(slot)
+
+        if slots:
+            vectors[positions] = self.vectors[slots]
+            self._tick += 1
+            self.ticks[slots] = self._tick
+        self.hits += len(slots)
+        self.misses += len(missing)
+        return vectors, keys, missing
+
+    def put_many(self, keys: List[int], vectors: np.ndarray):
+        """Store vectors under the given keys, evicting old entries if needed."""
+        new = {k: row for row, k in enumerate(keys) if k not in self._slots}
+        if not new:
+            return
+        if len(new) > self.capacity:
+            new = dict(list(new.items())[:self.capacity])
+        if len(new) > len(self._free):
+            self._evict(len(new) - len(self._free))
+
+        self._tick += 1
+        for k, row in new.items():
+            slot = self._free.pop()
+            self.keys[slot] = 0  # invalidate the slot while its vector is rewritten
+            self.vectors[slot] = vectors[row]
+            self.keys[slot] = k
+            self.ticks[slot] = self._tick
+            self._slots[k] = slot
+
+    def _evict(self, n: int):
+        n = min(len(self._slots), max(n, int(self.capacity * self.EVICT_FRACTION)))
+        used = np.flatnonzero(self.keys)
+        oldest = used[np.argpartition(self.ticks[used], n - 1)[:n]]
+        for slot in oldest.tolist():
+            del self._slots[int(self.keys[slot])]
+            self.keys[slot] = 0
+            self._free.append(slot)
+        self.evictions += n
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        """Flush the memory-mapped files to disk."""
+        for arr in (self.keys, self.ticks, self.vectors):
+            arr.flush()
@@ -1,10 +1,279 @@
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+import os
+import threading
 import numpy as np
-from typing import List, Union
+from typing import Callable, List, Optional
+from . import config
+from .embed_cache import EmbeddingCache
+
+# Model held by each pool worker process (set by _init_worker)
+_worker_model = None
+
+BATCHING_MODES = ("tokens", "fixed")
+BACKENDS = ("torch", "onnx")
+DEFAULT_MAX_SEQ_LENGTH = 256   # all-MiniLM-L6-v2's limit, used when the model doesn't say
+TOKENS_PER_WORD = 1.3          # WordPiece tokens per whitespace word in English text
+MAX_CHARS_PER_TOKEN = 20       # Texts are cut at max_seq_length * this many characters
+
+def _set_torch_threads(num_threads: Optional[int]):
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+
+def _load_model(model_name: str, onnx_path: Optional[str] = None, quantized: bool = False,
+                threads: Optional[int] = None, model_factory: Optional[Callable] = None):
+    if model_factory is not None:
+        return model_factory()
+    if onnx_path:
+        from .onnx_backend import OnnxModel
+        return OnnxModel(onnx_path, quantized, threads)
+    # Imported here: sentence_transformers (and torch) take seconds to import
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def _init_worker(model_name: str, torch_threads: Optional[int], max_seq_length: Optional[int] = None,
+                 onnx_path: Optional[str] = None, quantized: bool = False,
+                 model_factory: Optional[Callable] = None):
+    global _worker_model
+    if model_factory is None and not onnx_path:
+        _set_torch_threads(torch_threads)
+    _worker_model = _load_model(model_name, onnx_path, quantized, torch_threads, model_factory)
+    if max_seq_length:
+        _worker_model.max_seq_length = max_seq_length
+
+def _encode_with(model, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    kwargs = {"batch_size": batch_size} if batch_size else {}
+    vectors = model.encode(texts, convert_to_numpy=True, show_progress_bar=False, **kwargs)
+    return vectors.astype(np.float32, copy=False)
+
+def _encode_shard(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    return _encode_with(_worker_model, texts, batch_size)
+
+def token_lengths(texts: List[str], max_seq_length: int, tokenizer=None) -> np.ndarray:
+    """
+    Tokens per text, capped at max_seq_length: exact with a (fast) Hugging
+    Face tokenizer or a tokenizers.Tokenizer (OnnxModel's, which truncates
+    itself), otherwise estimated from the word count.
+    """
+    if hasattr(tokenizer, "encode_batch"):
+        lengths = np.fromiter((len(e.ids) for e in tokenizer.encode_batch(texts)), dtype=np.int64,
+                              count=len(texts))
+        return np.minimum(lengths, max_seq_length)
+    if tokenizer is not None:
+        input_ids = tokenizer(texts, truncation=True, max_length=max_seq_length,
+                              return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+        return np.fromiter(map(len, input_ids), dtype=np.int64, count=len(texts))
+    words = np.fromiter((len(t.split()) for t in texts), dtype=np.float64, count=len(texts))
+    return np.minimum(np.ceil(words * TOKENS_PER_WORD).astype(np.int64) + 2, max_seq_length)
+
+def plan_token_batches(lengths: np.ndarray, token_budget: int,
+                       max_batch: int = config.EMBED_MAX_BATCH) -> List[np.ndarray]:
+    """
+    Group texts into forward passes by token length.
+
+    Texts are sorted by length, so each pass pads to a length close to all
+    of its texts', and cut so that a pass holds at most `max_batch` texts
+    and texts * longest length <= `token_budget` padded tokens (a text
+    longer than the budget gets a pass of its own).
+
+    Returns:
+        List[np.ndarray]: Indices into `lengths`, one array per pass.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches, start = [], 0
+    for end in range(1, len(order) + 1):
+        size = end - start
+        if end < len(order) and size < max_batch and (size + 1) * lengths[order[end]] <= token_budget:
+            continue
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the rows of a float array in place.
+
+    Zero rows are left unchanged. Returns the same array for chaining.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
 
 class Embedder:
-    def __init__(self, model_name: str):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str, num_workers: int = 0,
+                 torch_threads: Optional[int] = None,
+                 cache_dir: Optional[str] = None,
+                 cache_capacity: int = config.EMBED_CACHE_CAPACITY,
+                 batching: Optional[str] = None,
+                 token_budget: Optional[int] = None,
+                 max_seq_length: Optional[int] = None,
+                 backend: Optional[str] = None,
+                 quantize: Optional[bool] = None,
+                 model_factory: Optional[Callable] = None):
+        """
+        Args:
+            model_name (str): SentenceTransformer model to load.
+            num_workers (int): If > 0, encode in this many worker processes,
+                each holding its own copy of the model. 0 encodes in-process.
+            torch_threads (Optional[int]): Torch (or ONNX Runtime) intra-op
+                threads per worker. Defaults to an even split of the CPU
+                cores across workers so the pool doesn't oversubscribe them.
+            cache_dir (Optional[str]): Directory of a persistent EmbeddingCache
+                consulted before encoding. None disables caching.
+            cache_capacity (int): Max number of cached vectors.
+            batching (Optional[str]): "tokens" or "fixed" (default:
+                config.EMBED_BATCHING); see _encode().
+            token_budget (Optional[int]): Padded tokens per forward pass
+                with "tokens" batching (default: config.EMBED_TOKEN_BUDGET).
+            max_seq_length (Optional[int]): Truncate texts at this many
+                tokens (default: config.EMBED_MAX_SEQ_LENGTH, else the
+                model's limit).
+            backend (Optional[str]): "torch" (sentence-transformers) or
+                "onnx" (ONNX Runtime, see onnx_backend.py; the model is
+                exported on first use). Default: config.EMBED_BACKEND.
+            quantize (Optional[bool]): With "onnx", run the int8 quantized
+                model (default: config.EMBED_ONNX_QUANTIZE).
+            model_factory (Optional[Callable]): Called with no arguments to
+                create the model instead of loading model_name (which then
+                only names the cache), e.g. a stub for benchmarks. Must be
+                picklable when num_workers > 0.
+        """
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.batching = batching or config.EMBED_BATCHING
+        if self.batching not in BATCHING_MODES:
+            raise ValueError(f"Unknown batching '{self.batching}', expected one of {BATCHING_MODES}")
+        self.token_budget = token_budget or config.EMBED_TOKEN_BUDGET
+        max_seq_length = max_seq_length or config.EMBED_MAX_SEQ_LENGTH
+        self.backend = backend or config.EMBED_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}', expected one of {BACKENDS}")
+        self.quantize = config.EMBED_ONNX_QUANTIZE if quantize is None else quantize
+        self.model = None
+        self._pool = None
+
+        onnx_path, cache_name = None, model_name
+        if self.backend == "onnx" and model_factory is None:
+            from .onnx_backend import ensure_model
+            # Exported here, once, rather than by each pool worker
+            onnx_path = ensure_model(model_name, self.quantize)
+            # ONNX vectors differ slightly from torch's: cache them apart
+            cache_name = f"{model_name}.onnx" + ("-int8" if self.quantize else "")
+        self.cache = EmbeddingCache(cache_dir, cache_name, config.VECTOR_DIM, cache_capacity) if cache_dir else None
+        self._cache_lock = threading.Lock()
+
+        if num_workers > 0:
+            if torch_threads is None:
+                torch_threads = max(1, (os.cpu_count() or 1) // num_workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=mp.get_context("spawn"),  # fork is unsafe once torch has started threads
+                initializer=_init_worker,
+                initargs=(model_name, torch_threads, max_seq_length, onnx_path, self.quantize, model_factory)
+            )
+        else:
+            if model_factory is None and not onnx_path:
+                _set_torch_threads(torch_threads)
+            self.model = _load_model(model_name, onnx_path, self.quantize, torch_threads, model_factory)
+            if max_seq_length:
+                self.model.max_seq_length = max_seq_length
+        self.max_seq_length = (max_seq_length or getattr(self.model, "max_seq_length", None)
+                               or DEFAULT_MAX_SEQ_LENGTH)
+        # Exact token counts need the tokenizer, which only the in-process model has
+        tokenizer = getattr(self.model, "tokenizer", None)
+        fast = getattr(tokenizer, "is_fast", False) or hasattr(tokenizer, "encode_batch")
+        self._tokenizer = tokenizer if fast else None
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into a float32 array, sharding across the pool if any.
+
+        With "tokens" batching, texts are first cut to max_seq_length *
+        MAX_CHARS_PER_TOKEN characters, so giant posts are not tokenized in
+        full (the model truncates at max_seq_length tokens either way), then
+        grouped into passes by plan_token_batches(); the vectors are put
+        back in input order. With an in-process model that has a fast
+        tokenizer, the lengths come from a tokenizer pass of their own,
+        on top of the one inside model.encode().
+        """
+        if self.batching == "tokens":
+            return self._encode_token_batches(texts)
+        if self._pool is None:
+            return _encode_with(self.model, texts)
+
+        if not texts:
+            return np.empty((0, config.VECTOR_DIM), dtype=np.float32)
+        shard_size = -(-len(texts) // self.num_workers)
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        # map() returns shard results in submission order
+        return np.concatenate(list(self._pool.map(_encode_shard, shards)))
+
+    def _encode_token_batches(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, config.VECTOR_DIM), dtype=np.float32)
+        max_chars = self.max_seq_length * MAX_CHARS_PER_TOKEN
+        texts = [t[:max_chars] for t in texts]
+        lengths = token_lengths(texts, self.max_seq_length, self._tokenizer)
+        batches = plan_token_batches(lengths, self.token_budget, config.EMBED_MAX_BATCH)
+        shards = [[texts[i] for i in batch] for batch in batches]
+        sizes = [len(batch) for batch in batches]
+        if self._pool is None:
+            results = (_encode_with(self.model, shard, size) for shard, size in zip(shards, sizes))
+        else:
+            results = self._pool.map(_encode_shard, shards, sizes)
+
+        vectors = None
+        for batch, result in zip(batches, results):
+            if vectors is None:
+                vectors = np.empty((len(texts), result.shape[1]), dtype=np.float32)
+            vectors[batch] = result
+        return vectors
+
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Encode only the texts missing from the cache, then cache them."""
+        with self._cache_lock:
+            vectors, keys, missing = self.cache.get_many(texts)
+        if missing:
+            new_vectors = self._encode([texts[i] for i in missing])
+            vectors[missing] = new_vectors
+            with self._cache_lock:
+                self.cache.put_many([keys[i] for i in missing], new_vectors)
+        return vectors
+
+    def close(self):
+        """Shut down the worker pool and flush the cache, if any."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def embed_array(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """
+        Embed a batch of texts into a float32 array.
+
+        Args:
+            texts (List[str]): List of texts.
+            normalize (bool): Whether to L2-normalize the vectors (in place).
+
+        Returns:
+            np.ndarray: C-contiguous float32 array of shape (len(texts), dim).
+        """
+        if self.cache is not None:
+            vectors = self._encode_cached(texts)
+        else:
+            vectors = np.ascontiguousarray(self._encode(texts), dtype=np.float32)
+        if normalize:
+            normalize_rows(vectors)
+        return vectors
 
     def embed(self, text: str, normalize: bool = True) -> List[float]:
         """
@@ -17,18 +286,14 @@ class Embedder:
         Returns:
             List[float]: Embedding vector.
         """
-        vector = self.model.encode([text], convert_to_numpy=True, show_progress_bar=False)[0]
-        if normalize:
-            norm = np.linalg.norm(vector)
-            if norm == 0:
-                norm = 1.0
-            vector = vector / norm
-        return vector.tolist()
+        return self.embed_array([text], normalize=normalize)[0].tolist()
 
     def embed_batch(self, texts: List[str], normalize: bool = True) -> List[List[float]]:
         """
         Embed a batch of texts into vectors.
 
+        List-returning wrapper around embed_array(), kept for compatibility.
+
         Args:
             texts (List[str]): List of texts.
             normalize (bool): Whether to normalize the embedding vectors.
@@ -36,9 +301,4 @@ class Embedder:
         Returns:
             List[List[float]]: List of embedding vectors.
         """
-        vectors = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        if normalize:
-            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-            norms[norms == 0] = 1.0
-            vectors = vectors / norms
-        return vectors.tolist()
+        return self.embed_array(texts, normalize=normalize).tolist()
@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import numpy as np
+from typing import Iterable, List, NamedTuple
+from . import config
+from .loader import stream_text_blocks
+from .preprocessor import normalize_text
+from .dedup import hash_texts
+from .utils import batch_iterator
+
+class FileIdRange(NamedTuple):
+    """
+    The ids given to one input file: rows kept from it get
+    first_id .. first_id + num_rows - 1, in file order. `keep` marks, for
+    every text read from the file, whether it is ingested.
+    """
+    file_index: int
+    path: str
+    first_id: int
+    num_rows: int
+    keep: np.ndarray
+
+    @property
+    def last_id(self) -> int:
+        return self.first_id + self.num_rows - 1
+
+def _batch_keep_mask(texts: List[str], deduper=None) -> np.ndarray:
+    """Mask of the texts normalize_texts() and the deduplicator would keep."""
+    norms = [normalize_text(t) for t in texts]
+    hashes = hash_texts(norms)
+    keep = np.zeros(len(norms), dtype=bool)
+    _, first = np.unique(hashes, return_index=True)
+    keep[first] = True
+    keep &= np.fromiter((bool(n) for n in norms), dtype=bool, count=len(norms))
+    if deduper is not None:
+        keep[keep] = deduper.new_mask(hashes[keep])
+    return keep
+
+def plan_id_ranges(filepaths: List[str], deduper=None, first_id: int = 1,
+                   batch_size: int = config.BATCH_SIZE) -> List[FileIdRange]:
+    """
+    Decide up front which rows of each file are ingested and which ids they get.
+
+    One quick pass reads every file in order (no embedding) and applies the
+    same normalization and deduplication as the sequential pipeline, batch
+    by batch. Files then get consecutive, non-overlapping id ranges, so they
+    can be ingested concurrently in any order while every row gets the same
+    id as in a sequential run: ids stay dense (1..N), stable across runs
+    and usable for id-range batching downstream.
+
+    Args:
+        filepaths (List[str]): Input CSVs, in id order.
+        deduper: Cross-batch deduplicator (dedup.make_deduplicator), or None.
+        first_id (int): Id of the first row of the first file.
+        batch_size (int): Batch size of the sequential pipeline to mirror.
+    """
+    if not filepaths:
+        return []
+    masks, texts_per_file, pending = [], [], []
+    for fp in filepaths:
+        read = 0
+        for texts in stream_text_blocks([fp], config.TEXT_COLUMN, config.READ_BLOCK_SIZE):
+            read += len(texts)
+            pending.extend(texts)
+            start = 0
+            while len(pending) - start >= batch_size:
+                masks.append(_batch_keep_mask(pending[start:start + batch_size], deduper))
+                start += batch_size
+            pending = pending[start:]
+        texts_per_file.append(read)
+    if pending:
+        masks.append(_batch_keep_mask(pending, deduper))
+
+    keep_all = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    ranges = []
+    for file_index, keep in enumerate(np.split(keep_all, np.cumsum(texts_per_file)[:-1])):
+        num_rows = int(keep.sum())
+        ranges.append(FileIdRange(file_index, filepaths[file_index], first_id, num_rows, keep))
+        first_id += num_rows
+    return ranges
+
+def iter_file_batches(id_range: FileIdRange, batch_size: int = config.BATCH_SIZE) -> Iterable:
+    """Yield (ids, texts) batches of the normalized rows kept from one file."""
+    def kept_rows():
+        read = 0
+        for texts in stream_text_blocks([id_range.path], config.TEXT_COLUMN, config.READ_BLOCK_SIZE):
+            keep = id_range.keep[read:read + len(texts)]
+            read += len(texts)
+            for text, k in zip(texts, keep):
+                if k:
+                    yield normalize_text(text)
+
+    next_id = id_range.first_id
+    for texts in batch_iterator(kept_rows(), batch_size):
+        yield list(range(next_id, next_id + len(texts))), texts
+        next_id += len(texts)
+
+def id_ranges_path(collection_name: str) -> str:
+    """Default id range manifest of a collection."""
+    return os.path.join(config.EXPORT_DIR, f"id_ranges_{collection_name}.json")
+
+def write_id_ranges(ranges: List[FileIdRange], path: str):
+    """Save the file -> id range mapping as JSON."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    manifest = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": [
+            {
+                "file": r.path,
+                "first_id": r.first_id,
+                "last_id": r.last_id,
+                "rows": r.num_rows,
+                "rows_read": len(r.keep),
+            }
+            for r in ranges
+        ],
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=4)
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import numpy as np
+from typing import Optional
+from . import config
+from .dedup import hash_texts
+
+SCAN_QUERY_ROWS = 10000   # Rows per Milvus query when rebuilding a log from a collection
+
+def ingest_log_path(collection_name: str) -> str:
+    """Default ingest log of a collection."""
+    return os.path.join(config.checkpoint_dir(), f"ingested_{collection_name}.json")
+
+class IngestLog:
+    """
+    Content hashes of every row in a collection, kept across ingestion runs
+    so an incremental run only embeds rows that are not in it yet.
+
+    Two files, written like IngestCheckpoint's:
+        <path>          JSON state: number of hashes, the highest id
+                        inserted and one entry per run.
+        <path>.hashes   uint64 hash_texts() hashes of the normalized texts,
+                        in insert order (append-only).
+
+    Unlike the checkpoint, which lives for one run, the log lives as long as
+    the collection; a run into an empty collection starts it over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes_path = path + ".hashes"
+        self.state = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        with open(self.path) as f:
+            self.state = json.load(f)
+        return self.state
+
+    def load_hashes(self) -> np.ndarray:
+        """Hashes of every row recorded, dropping any appended after the last JSON write."""
+        count = self.state["num_hashes"]
+        if not count:
+            return np.empty(0, dtype=np.uint64)
+        hashes = np.fromfile(self.hashes_path, dtype=np.uint64, count=count)
+        with open(self.hashes_path, "r+b") as f:
+            f.truncate(count * 8)
+        return hashes
+
+    @property
+    def next_id(self) -> int:
+        return self.state["max_id"] + 1
+
+    def create(self, collection_name: str, hashes: Optional[np.ndarray] = None, max_id: int = 0):
+        """Start a log, optionally seeded with the rows already in the collection."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        hashes = np.empty(0, dtype=np.uint64) if hashes is None else np.asarray(hashes, dtype=np.uint64)
+        with open(self.hashes_path, "wb") as f:
+            hashes.tofile(f)
+        self.state = {
+            "collection": collection_name,
+            "num_hashes": len(hashes),
+            "max_id": int(max_id),
+            "runs": [],
+        }
+        self._write()
+
+    def begin_run(self, files, incremental: bool):
+        self.state["runs"].append({
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "files": list(files),
+            "incremental": incremental,
+            "first_id": self.next_id,
+            "rows_inserted": 0,
+        })
+        self._write()
+
+    def append(self, hashes: np.ndarray, max_id: int):
+        """Record rows durably inserted with ids up to `max_id`."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        with open(self.hashes_path, "ab") as f:
+            hashes.tofile(f)
+        self.state["num_hashes"] += len(hashes)
+        self.state["max_id"] = max(self.state["max_id"], int(max_id))
+        if self.state["runs"]:
+            self.state["runs"][-1]["rows_inserted"] += len(hashes)
+        self._write()
+
+    def _write(self):
+        self.state["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+def scan_collection(collection, query_rows: int = SCAN_QUERY_ROWS):
+    """
+    Hash the texts already in a collection, for a log that was never kept
+    (collections ingested before incremental mode existed).
+
+    Rows are paged by id ("id > <last id seen>", at most `query_rows` per
+    query) until a query comes back short, so gaps of any size in the id
+    range are skipped and the highest id is always reached.
+
+    Returns:
+        (np.ndarray, int): Hashes in id order and the highest id found.
+    """
+    pages, max_id = [], 0
+    while True:
+        rows = collection.query(expr=f"id > {max_id}", output_fields=["id", "text"], limit=query_rows)
+        if not rows:
+            break
+        rows.sort(key=lambda r: r["id"])
+        pages.append(hash_texts([r["text"] for r in rows]))
+        max_id = rows[-1]["id"]
+        if len(rows) < query_rows:
+            break
+    hashes = np.concatenate(pages) if pages else np.empty(0, dtype=np.uint64)
+    return hashes, max_id
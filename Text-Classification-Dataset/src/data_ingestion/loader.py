@@ -1,7 +1,18 @@
+import io
 import os
-import pandas as pd
-from typing import Iterable, List
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional
 from . import config
+from .utils import batch_iterator
+
+LOADER_ENGINES = ("pyarrow", "pandas")
+
+# Strings pandas reads as NaN by default; treated as missing by both engines
+_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+]
 
 def stream_texts(
     filepaths: List[str],
@@ -16,6 +27,8 @@ def stream_texts(
     - custom separator '~'
     - quote character '"'
     """
+    import pandas as pd
+
     for fp in filepaths:
         if not os.path.exists(fp):
             raise FileNotFoundError(f"CSV file not found: {fp}")
@@ -29,3 +42,198 @@ def stream_texts(
         ):
             for val in chunk[text_col].dropna().astype(str).tolist():
                 yield val
+
+class SourcePosition(NamedTuple):
+    """
+    A point in the input to resume reading from: file number `file_index`
+    of the file list, at byte `offset` (the start of a record), after
+    skipping the first `skip_rows` texts read from there.
+    """
+    file_index: int
+    offset: int
+    skip_rows: int = 0
+
+def _iter_record_blocks(fp: str, block_size: int, start_offset: int = 0) -> Iterator:
+    """
+    Yield the CSV header, then (offset, block) pairs of about `block_size`
+    bytes that each end on a record boundary, starting at `start_offset`
+    (0 = right after the header).
+
+    The precleaned CSVs have newlines replaced inside values, so every
+    newline ends a record.
+    """
+    with open(fp, "rb") as f:
+        yield f.readline()
+        if start_offset:
+            f.seek(start_offset)
+        offset = f.tell()
+        carry = b""
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                carry = data
+                continue
+            carry = data[cut:]
+            yield offset, data[:cut]
+            offset += cut
+        if carry:
+            yield offset, carry
+
+def _iter_text_blocks(
+    filepaths: List[str],
+    text_col: str,
+    block_size: int,
+    start: Optional[SourcePosition] = None
+) -> Iterator:
+    """Yield (file_index, offset, texts) for each block of each file."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    invalid_rows = []
+
+    def on_invalid_row(row):
+        invalid_rows.append(row)
+        return "skip"
+
+    parse_options = pacsv.ParseOptions(
+        delimiter="~",
+        quote_char='"',
+        newlines_in_values=False,
+        invalid_row_handler=on_invalid_row
+    )
+    convert_options = pacsv.ConvertOptions(
+        include_columns=[text_col],
+        column_types={text_col: pa.string()},
+        null_values=_NA_VALUES,
+        strings_can_be_null=True
+    )
+
+    first_file = start.file_index if start else 0
+    for file_index in range(first_file, len(filepaths)):
+        fp = filepaths[file_index]
+        if not os.path.exists(fp):
+            raise FileNotFoundError(f"CSV file not found: {fp}")
+        start_offset = start.offset if start and file_index == first_file else 0
+        blocks = _iter_record_blocks(fp, block_size, start_offset)
+        header = next(blocks)
+        column_names = pacsv.read_csv(pa.py_buffer(header), parse_options=parse_options).column_names
+        read_options = pacsv.ReadOptions(column_names=column_names, use_threads=True)
+
+        for offset, block in blocks:
+            table = pacsv.read_csv(
+                pa.py_buffer(block),
+                read_options=read_options,
+                parse_options=parse_options,
+                convert_options=convert_options
+            )
+            if invalid_rows:
+                invalid_rows.clear()
+                texts = _parse_block_pandas(header + block, text_col)
+            else:
+                texts = table.column(text_col).drop_null().to_pylist()
+            yield file_index, offset, texts
+
+def stream_text_blocks(
+    filepaths: List[str],
+    text_col: str = config.TEXT_COLUMN,
+    block_size: int = config.READ_BLOCK_SIZE
+) -> Iterable[List[str]]:
+    """
+    Yield the texts of multiple CSVs as one list per block of the file.
+
+    Blocks are parsed with pyarrow's multithreaded CSV reader, with the same
+    results as stream_texts: separator '~', quote character '"', missing
+    values (pandas' default NA strings) dropped. pandas reads rows with
+    too many or too few fields instead of failing on them; the rare block
+    containing such rows is re-parsed with pandas to keep that behaviour.
+    """
+    for _, _, texts in _iter_text_blocks(filepaths, text_col, block_size):
+        if texts:
+            yield texts
+
+def _parse_block_pandas(data: bytes, text_col: str) -> List[str]:
+    """Parse one CSV block (with header) exactly like stream_texts does."""
+    import pandas as pd
+
+    df = pd.read_csv(
+        io.BytesIO(data),
+        usecols=[text_col],
+        index_col=False,  # a long first row must not turn into an index mid-file
+        on_bad_lines='skip',
+        sep='~',
+        quotechar='"'
+    )
+    return df[text_col].dropna().astype(str).tolist()
+
+def _rebatch(blocks: Iterable, batch_size: int, skip_rows: int = 0) -> Iterable:
+    """
+    Re-slice (file_index, offset, texts) blocks into batches of exactly
+    batch_size texts (the last may be short).
+
+    Yields (texts, position) where position is the SourcePosition just past
+    the batch. The first `skip_rows` texts read are dropped.
+    """
+    pending = []
+    # Blocks with texts still in `pending`: [file_index, offset, consumed, total]
+    spans = deque()
+    for file_index, offset, texts in blocks:
+        skipped = min(skip_rows, len(texts))
+        skip_rows -= skipped
+        spans.append([file_index, offset, skipped, len(texts)])
+        pending.extend(texts[skipped:] if skipped else texts)
+
+        start = 0
+        while len(pending) - start >= batch_size:
+            batch = pending[start:start + batch_size]
+            start += batch_size
+            yield batch, _advance(spans, batch_size)
+        pending = pending[start:]
+    if pending:
+        yield pending, _advance(spans, len(pending))
+
+def _advance(spans: deque, n: int) -> SourcePosition:
+    """Mark n pending texts as consumed and return the position after them."""
+    while True:
+        span = spans[0]
+        available = span[3] - span[2]
+        if n < available or (n == available and len(spans) == 1):
+            span[2] += n
+            return SourcePosition(span[0], span[1], span[2])
+        n -= available
+        spans.popleft()
+
+def stream_text_batches(
+    filepaths: List[str],
+    text_col: str = config.TEXT_COLUMN,
+    batch_size: int = config.BATCH_SIZE,
+    engine: str = config.LOADER_ENGINE,
+    start: Optional[SourcePosition] = None,
+    with_positions: bool = False
+) -> Iterable:
+    """
+    Yield texts from multiple CSVs in lists of batch_size.
+
+    Args:
+        engine (str): "pyarrow" (block-wise multithreaded parsing) or
+            "pandas" (stream_texts). Both yield the same batches.
+        start (Optional[SourcePosition]): Resume reading from this position
+            (pyarrow engine only).
+        with_positions (bool): Yield (texts, SourcePosition) pairs, the
+            position being where reading resumes after that batch
+            (pyarrow engine only).
+    """
+    if engine == "pyarrow":
+        blocks = _iter_text_blocks(filepaths, text_col, config.READ_BLOCK_SIZE, start)
+        batches = _rebatch(blocks, batch_size, start.skip_rows if start else 0)
+        if with_positions:
+            return batches
+        return (texts for texts, _ in batches)
+    if engine == "pandas":
+        if start is not None or with_positions:
+            raise ValueError("Resuming and positions require the pyarrow loader engine")
+        return batch_iterator(stream_texts(filepaths, text_col), batch_size)
+    raise ValueError(f"Unknown loader engine '{engine}', expected one of {LOADER_ENGINES}")
@@ -0,0 +1,237 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Optional
+
+STAGES = ("plan", "read", "normalize", "dedup", "embed", "insert", "flush", "index", "load")
+PROFILERS = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005   # Seconds between stack samples (sample profiler)
+
+class _Timing:
+    """Yielded by StageMetrics.stage(); set `rows` once the count is known."""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+class StageProfiler:
+    """
+    Profiles the code running inside one stage only.
+
+    Modes:
+        cprofile: deterministic cProfile of the stage's calls, saved as a
+                  .prof file (snakeviz, pstats). Only one thread is profiled
+                  at a time; calls overlapping it in other threads (parallel
+                  file workers) are skipped.
+        sample:   a background thread samples the stacks of every thread
+                  inside the stage every `interval` seconds; low overhead,
+                  saved as collapsed stacks (flamegraph.pl, speedscope).
+    """
+
+    def __init__(self, stage: str, mode: str = "cprofile", output: Optional[str] = None,
+                 interval: float = SAMPLE_INTERVAL):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}', expected one of {STAGES}")
+        if mode not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{mode}', expected one of {PROFILERS}")
+        self.stage = stage
+        self.mode = mode
+        self.output = output
+        self.interval = interval
+        self.samples = Counter()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        if mode == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._owner = None
+
+    @contextmanager
+    def profile(self):
+        if self.mode == "sample":
+            tid = threading.get_ident()
+            with self._lock:
+                self._active.add(tid)
+                if self._sampler is None:
+                    self._sampler = threading.Thread(target=self._sample_loop, name="stage-sampler",
+                                                     daemon=True)
+                    self._sampler.start()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._active.discard(tid)
+            return
+
+        with self._lock:
+            owner = self._owner is None
+            if owner:
+                self._owner = threading.get_ident()
+        if not owner:
+            yield
+            return
+        self._profile.enable()
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            with self._lock:
+                self._owner = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                active = set(self._active)
+            if not active:
+                continue
+            for tid, frame in sys._current_frames().items():
+                if tid in active:
+                    self.samples[_collapse(frame)] += 1
+
+    def close(self) -> List[str]:
+        """Stop profiling, write the output file and return a short report."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self.mode == "cprofile":
+            import io
+            import pstats
+
+            if self.output:
+                self._profile.dump_stats(self.output)
+            stream = io.StringIO()
+            try:
+                pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(15)
+            except TypeError:   # nothing was recorded
+                return [f"cProfile ({self.stage}): no calls recorded"]
+            return stream.getvalue().strip().splitlines()
+
+        if self.output:
+            with open(self.output, "w") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values())
+        report = [f"Sampled {total} stacks in stage '{self.stage}', top functions:"]
+        for leaf, count in leaves.most_common(15):
+            report.append(f"{count / total:7.1%}  {leaf}")
+        return report
+
+def _collapse(frame) -> str:
+    """module:function;... stack of a frame, outermost first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class StageMetrics:
+    """
+    Seconds, calls and rows per pipeline stage, safe to record from the
+    pipeline's threads.
+
+    Every timed call is appended to `path` (if given) as one JSON line
+    ({"event": "stage", ...}); close() appends one "summary" line per stage
+    and one "run" line. Stages running in parallel threads overlap, so in
+    pipelined runs the stage times add up to more than the wall clock.
+    """
+
+    def __init__(self, path: Optional[str] = None, profiler: Optional[StageProfiler] = None,
+                 **run_info):
+        self.path = path
+        self.profiler = profiler
+        self.run_info = run_info
+        self.totals: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a")
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """Time the enclosed block as one call of stage `name`."""
+        timing = _Timing(rows)
+        profiled = self.profiler is not None and self.profiler.stage == name
+        start = time.perf_counter()
+        with self.profiler.profile() if profiled else nullcontext():
+            yield timing
+        self.record(name, time.perf_counter() - start, timing.rows)
+
+    def timed_iter(self, name: str, iterable: Iterable, rows=len):
+        """Iterate, timing each next() as stage `name`, with rows(item) rows."""
+        it = iter(iterable)
+        while True:
+            with self.stage(name) as timing:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                timing.rows = rows(item)
+            yield item
+
+    def record(self, name: str, seconds: float, rows: int = 0):
+        with self._lock:
+            total = self.totals.setdefault(name, {"calls": 0, "rows": 0, "seconds": 0.0})
+            total["calls"] += 1
+            total["rows"] += rows
+            total["seconds"] += seconds
+            if self._file is not None:
+                self._write({"event": "stage", "stage": name, "seconds": round(seconds, 6), "rows": rows,
+                             "thread": threading.current_thread().name,
+                             "elapsed": round(time.perf_counter() - self._start, 6)})
+
+    def summary(self) -> List[Dict]:
+        """One row per stage, in pipeline order: calls, rows, seconds, rows/s, share of wall time."""
+        wall = time.perf_counter() - self._start
+        rows = []
+        order = {s: i for i, s in enumerate(STAGES)}
+        for name in sorted(self.totals, key=lambda s: order.get(s, len(STAGES))):
+            t = self.totals[name]
+            rows.append({
+                "stage": name,
+                "calls": t["calls"],
+                "rows": t["rows"],
+                "seconds": round(t["seconds"], 3),
+                "rows_per_s": round(t["rows"] / t["seconds"], 1) if t["seconds"] and t["rows"] else None,
+                "wall_share": round(t["seconds"] / wall, 4) if wall else None,
+            })
+        return rows
+
+    def format_summary(self) -> str:
+        columns = ["stage", "calls", "rows", "seconds", "rows_per_s", "wall_share"]
+        lines = [" | ".join(f"{c:>10}" for c in columns)]
+        for r in self.summary():
+            cells = [r["stage"], r["calls"], r["rows"], f"{r['seconds']:.2f}",
+                     "-" if r["rows_per_s"] is None else f"{r['rows_per_s']:,.0f}",
+                     "-" if r["wall_share"] is None else f"{r['wall_share']:.1%}"]
+            lines.append(" | ".join(f"{c:>10}" for c in cells))
+        lines.append(f"Wall time: {time.perf_counter() - self._start:.2f}s")
+        return "\n".join(lines)
+
+    def close(self) -> List[str]:
+        """Write the summary lines, stop the profiler and return its report."""
+        report = self.profiler.close() if self.profiler is not None else []
+        if self._file is not None:
+            for row in self.summary():
+                self._write({"event": "summary", **row})
+            self._write({"event": "run", **self.run_info,
+                         "wall_seconds": round(time.perf_counter() - self._start, 3),
+                         "profile": self.profiler.output if self.profiler else None,
+                         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")})
+            self._file.close()
+            self._file = None
+        return report
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
@@ -1,10 +1,24 @@
-from pymilvus import (
-    connections, FieldSchema, CollectionSchema, DataType,
-    Collection, utility
-)
+import time
+from contextlib import nullcontext
 from . import config
 
+FLUSH_POLICIES = ("never", "rows", "seconds", "end")
+QUERY_LIMIT = 16384   # Most rows Milvus returns from one query (offset + limit)
+
+# Callables notified as fn(collection_name, num_rows) after every insert
+# made through this module (e.g. to invalidate search result caches)
+_insert_listeners = []
+
+def add_insert_listener(listener):
+    _insert_listeners.append(listener)
+
+def remove_insert_listener(listener):
+    if listener in _insert_listeners:
+        _insert_listeners.remove(listener)
+
 def connect():
+    from pymilvus import connections
+
     # Remove existing default connection if it exists
     if connections.has_connection("default"):
         connections.remove_connection("default")
@@ -12,7 +26,14 @@ def connect():
     # Now connect safely
     connections.connect(host=config.MILVUS_HOST, port=config.MILVUS_PORT)
 
-def create_collection(collection_name=config.COLLECTION_NAME, dim=config.VECTOR_DIM):
+def create_collection(collection_name=None, dim=config.VECTOR_DIM, with_cluster_id=False):
+    """
+    Create the collection (id, text, emb) unless it exists. with_cluster_id
+    adds an INT32 cluster_id field (see src/operations/cluster_assigner.py).
+    """
+    from pymilvus import FieldSchema, CollectionSchema, DataType, Collection, utility
+
+    collection_name = collection_name or config.COLLECTION_NAME
     if utility.has_collection(collection_name):
         print(f"Collection '{collection_name}' already exists.")
         return Collection(collection_name)
@@ -22,14 +43,39 @@ def create_collection(collection_name=config.COLLECTION_NAME, dim=config.VECTOR_
         FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
         FieldSchema(name="emb", dtype=DataType.FLOAT_VECTOR, dim=dim)
     ]
+    if with_cluster_id:
+        fields.append(FieldSchema(name="cluster_id", dtype=DataType.INT32))
     schema = CollectionSchema(fields=fields, description="Text embeddings collection")
     collection = Collection(name=collection_name, schema=schema, using='default')
     print(f"Created collection {collection_name}")
     return collection
 
-def create_index(collection, field_name='emb', index_type='IVF_FLAT',
-                 metric_type=config.METRIC_TYPE, params={"nlist": 1024}):
-    index_params = {"index_type": index_type, "metric_type": metric_type, "params": params}
+# Search-time parameter trading recall for speed, per index type, and its
+# value when neither the caller nor config.SEARCH_PARAM sets one
+SEARCH_PARAM_KEYS = {"FLAT": None, "IVF_FLAT": "nprobe", "IVF_SQ8": "nprobe", "IVF_PQ": "nprobe", "HNSW": "ef"}
+SEARCH_PARAM_DEFAULTS = {"FLAT": None, "IVF_FLAT": 10, "IVF_SQ8": 10, "IVF_PQ": 10, "HNSW": 64}
+
+def search_params(index_type: str, metric_type: str, value=None, top_k=None) -> dict:
+    """
+    collection.search() `param` for an index type, e.g. {"nprobe": 16} or
+    {"ef": 64}. `value` defaults to config.SEARCH_PARAM, then to
+    SEARCH_PARAM_DEFAULTS; HNSW's ef is raised to `top_k` if given, since
+    Milvus rejects ef < limit.
+    """
+    key = SEARCH_PARAM_KEYS[index_type]
+    if value is None:
+        value = config.SEARCH_PARAM if config.SEARCH_PARAM is not None else SEARCH_PARAM_DEFAULTS[index_type]
+    if key == "ef" and top_k and value is not None:
+        value = max(value, top_k)
+    params = {key: value} if key and value is not None else {}
+    return {"metric_type": metric_type, "params": params}
+
+def create_index(collection, field_name='emb', index_type=None,
+                 metric_type=config.METRIC_TYPE, params=None):
+    """Build the vector index (default: config.INDEX_TYPE with config.INDEX_PARAMS)."""
+    if index_type is None:
+        index_type, params = config.INDEX_TYPE, params or config.INDEX_PARAMS
+    index_params = {"index_type": index_type, "metric_type": metric_type, "params": params or {}}
     collection.create_index(field_name, index_params)
     print("Index created.")
     return collection
@@ -38,12 +84,211 @@ def load_collection(collection):
     collection.load()
     print("Collection loaded into memory.")
 
-def insert_batch(collection, ids, texts, embeddings):
+def insert_batch(collection, ids, texts, embeddings, flush=True):
+    """
+    Insert one batch of rows.
+
+    `ids` and `embeddings` may be lists or arrays; int64 ids and a
+    C-contiguous float32 (n, dim) embedding array are passed through
+    without copying.
+    """
     import numpy as np
 
-    ids = np.array(ids, dtype=np.int64)
-    embeddings = np.array(embeddings, dtype=np.float32)
+    ids = np.asarray(ids, dtype=np.int64)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
 
     # Insert as a list of columns in schema order: [id, text, emb]
     collection.insert([ids, texts, embeddings])
-    collection.flush()  # persist insert
+    if flush:
+        collection.flush()  # persist insert
+    for listener in list(_insert_listeners):
+        listener(getattr(collection, "name", None), len(ids))
+
+def iter_id_pages(collection, output_fields, page_rows: int = QUERY_LIMIT):
+    """
+    Every row of a loaded collection, in pages of at most `page_rows` sorted
+    by id. Each page queries "id > <last id seen>", so gaps of any size in
+    the id space are skipped (an id-range walk up to num_entities would
+    miss the rows past it).
+    """
+    fields = list(output_fields) if "id" in output_fields else ["id", *output_fields]
+    last_id = 0
+    while True:
+        rows = collection.query(expr=f"id > {last_id}", output_fields=fields, limit=page_rows)
+        if not rows:
+            return
+        rows.sort(key=lambda r: r["id"])
+        yield rows
+        last_id = rows[-1]["id"]
+        if len(rows) < page_rows:
+            return
+
+def get_max_id(collection) -> int:
+    """
+    Highest id in a loaded collection (0 if it is empty). Ids may have gaps
+    (e.g. rows deduplicated away, or a crashed parallel-file run), so
+    num_entities is only a lower bound: this binary-searches the id space
+    with one-row "id >= x" queries instead of reading every id.
+    """
+    def any_from(first_id):
+        return bool(collection.query(expr=f"id >= {first_id}", output_fields=["id"], limit=1))
+
+    lo, hi = 0, max(collection.num_entities, 1)
+    while any_from(hi):
+        lo, hi = hi, hi * 2
+    # Some id is >= lo (unless lo == 0), none is >= hi
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if any_from(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def get_segment_count(collection):
+    """
+    Number of segments of a loaded collection, or None if Milvus can't
+    report it (e.g. the collection is not loaded yet).
+    """
+    from pymilvus import utility
+
+    try:
+        return len(utility.get_query_segment_info(collection.name))
+    except Exception:
+        return None
+
+class FlushPolicy:
+    """
+    Decides when buffered inserts should be flushed to sealed segments.
+
+    Modes:
+        never:   never flush; Milvus seals segments on its own schedule.
+        rows:    flush after every `every_rows` inserted rows.
+        seconds: flush when `every_seconds` have passed since the last flush.
+        end:     flush once, when the inserter is closed.
+    """
+
+    def __init__(self, mode: str = config.FLUSH_POLICY,
+                 every_rows: int = config.FLUSH_EVERY_ROWS,
+                 every_seconds: float = config.FLUSH_EVERY_SECONDS):
+        if mode not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy '{mode}', expected one of {FLUSH_POLICIES}")
+        self.mode = mode
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.reset()
+
+    def reset(self):
+        self.rows_since_flush = 0
+        self.last_flush = time.monotonic()
+
+    def should_flush(self, new_rows: int) -> bool:
+        """Record `new_rows` inserted rows and tell whether to flush now."""
+        self.rows_since_flush += new_rows
+        if self.mode == "rows":
+            return self.rows_since_flush >= self.every_rows
+        if self.mode == "seconds":
+            return time.monotonic() - self.last_flush >= self.every_seconds
+        return False
+
+    def flush_on_close(self) -> bool:
+        return self.mode != "never"
+
+class BufferedInserter:
+    """
+    Accumulates rows and inserts them into Milvus in large column batches.
+
+    Rows are sent once the buffer reaches `buffer_bytes` (estimated from
+    ids, text length and vector size); flushing follows `flush_policy`.
+    Call close() after the last add() to insert the remainder.
+
+    Each add() may carry a `marker` (any object). After every successful
+    insert, `on_insert` is called with the markers of the rows it contained,
+    in order; Milvus has written those rows to its log at that point.
+
+    Inserts and flushes are timed as the "insert" and "flush" stages of
+    `metrics` (metrics.StageMetrics), if given.
+    """
+
+    def __init__(self, collection, flush_policy: FlushPolicy = None,
+                 buffer_bytes: int = config.INSERT_BUFFER_BYTES,
+                 on_insert=None, metrics=None):
+        self.collection = collection
+        self.flush_policy = flush_policy or FlushPolicy()
+        self.buffer_bytes = buffer_bytes
+        self.on_insert = on_insert
+        self.metrics = metrics
+
+        self.rows_inserted = 0
+        self.num_inserts = 0
+        self.num_flushes = 0
+        self._rows_flushed = 0
+        self._clear_buffer()
+
+    def _clear_buffer(self):
+        self._ids = []
+        self._texts = []
+        self._embeddings = []
+        self._markers = []
+        self._buffered_rows = 0
+        self._buffered_bytes = 0
+
+    def add(self, ids, texts, embeddings, marker=None):
+        import numpy as np
+
+        ids = np.asarray(ids, dtype=np.int64)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        self._ids.append(ids)
+        self._texts.extend(texts)
+        self._embeddings.append(embeddings)
+        if marker is not None:
+            self._markers.append(marker)
+        self._buffered_rows += len(ids)
+        self._buffered_bytes += ids.nbytes + embeddings.nbytes + sum(map(len, texts))
+
+        if self._buffered_bytes >= self.buffer_bytes:
+            inserted = self._insert_buffer()
+            if self.flush_policy.should_flush(inserted):
+                self.flush()
+
+    def _insert_buffer(self):
+        import numpy as np
+
+        if not self._buffered_rows:
+            return 0
+        if len(self._ids) == 1:
+            ids, embeddings = self._ids[0], self._embeddings[0]
+        else:
+            ids = np.concatenate(self._ids)
+            embeddings = np.concatenate(self._embeddings)
+        with self._timed("insert", len(ids)):
+            insert_batch(self.collection, ids, self._texts, embeddings, flush=False)
+        self.rows_inserted += len(ids)
+        self.num_inserts += 1
+        print(f"Inserted batch: {ids[0]} - {ids[-1]} ({len(ids)} rows)")
+        markers = self._markers
+        self._clear_buffer()
+        if self.on_insert is not None and markers:
+            self.on_insert(markers)
+        return len(ids)
+
+    def flush(self):
+        """Insert anything buffered and flush the collection."""
+        self._insert_buffer()
+        start = time.monotonic()
+        with self._timed("flush", self.rows_inserted - self._rows_flushed):
+            self.collection.flush()
+        self._rows_flushed = self.rows_inserted
+        self.num_flushes += 1
+        self.flush_policy.reset()
+        print(f"Flushed {self.rows_inserted} rows in total ({time.monotonic() - start:.2f}s)")
+
+    def _timed(self, stage, rows):
+        return self.metrics.stage(stage, rows) if self.metrics is not None else nullcontext()
+
+    def close(self):
+        if self.flush_policy.flush_on_close():
+            self.flush()
+        else:
+            self._insert_buffer()
@@ -0,0 +1,302 @@
+"""
+ONNX Runtime inference for SentenceTransformer models (Embedder
+backend="onnx").
+
+The model's transformer is exported to ONNX once per model into
+config.onnx_dir()/<model>/, next to its fast tokenizer (tokenizer.json),
+the pooling settings and the PyTorch vectors of PARITY_TEXTS. The int8
+variant is made from it with ONNX Runtime's dynamic quantization the first
+time it is asked for. Every artefact is checked against the PyTorch vectors
+before it is used: a cosine similarity below PARITY_MIN_COSINE on any
+parity text fails the export. Artefacts whose onnx.json names another
+model (directory names are sanitized, so two names can share one) or
+another opset are exported again.
+
+Inference needs onnxruntime and tokenizers only; exporting also needs
+torch, transformers, sentence-transformers and onnx.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.data_ingestion.onnx_backend --model all-MiniLM-L6-v2
+python3 -m src.data_ingestion.onnx_backend --model all-MiniLM-L6-v2 --quantize --force
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from . import config
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+METADATA_FILE = "onnx.json"
+REFERENCE_FILE = "reference.npy"   # PyTorch vectors of PARITY_TEXTS
+OPSET = 14
+PARITY_MIN_COSINE = {"fp32": 0.999, "int8": 0.97}
+PARITY_TEXTS = [
+    "hello world",
+    "What is the best way to learn Python?",
+    "I've been playing this game for 200 hours and still find new stuff lol",
+    "The Federal Reserve raised interest rates by 0.25 percentage points on Wednesday.",
+    "[deleted]",
+    "this",
+    "Does anyone know why my sourdough keeps collapsing after the second rise? "
+    "I've tried less water, a longer bulk ferment and a hotter oven, nothing helps.",
+    "TIL that octopuses have three hearts and blue blood.",
+    "edit: thanks for the gold, kind stranger!",
+    "https://www.reddit.com/r/science/comments/abc123",
+    "Le chat est sur la table.",
+    "ok " * 300,
+]
+_MODEL_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+def model_dir(model_name: str, root: Optional[str] = None) -> str:
+    """Artefact directory of a model."""
+    return os.path.join(root or config.onnx_dir(), re.sub(r"[^\w.-]", "_", model_name))
+
+def load_metadata(path: str) -> Dict:
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        return json.load(f)
+
+def _write_metadata(path: str, metadata: Dict):
+    tmp = os.path.join(path, METADATA_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(metadata, f, indent=4)
+    os.replace(tmp, os.path.join(path, METADATA_FILE))
+
+def pool(hidden: np.ndarray, mask: np.ndarray, mode: str) -> np.ndarray:
+    """Token embeddings (batch, sequence, dim) -> sentence embeddings, as sentence-transformers' Pooling."""
+    if mode == "cls":
+        return hidden[:, 0]
+    weights = mask[..., np.newaxis].astype(hidden.dtype)
+    if mode == "max":
+        return np.where(weights > 0, hidden, -1e9).max(axis=1)
+    return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+def cosine_parity(reference: np.ndarray, vectors: np.ndarray) -> Dict:
+    """Min and mean row-wise cosine similarity of two embedding arrays."""
+    a = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    b = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = np.sum(a * b, axis=1)
+    return {"min_cosine": round(float(similarity.min()), 6), "mean_cosine": round(float(similarity.mean()), 6)}
+
+class OnnxModel:
+    """
+    SentenceTransformer stand-in running an exported model on ONNX Runtime
+    (CPU): encode(), max_seq_length and get_sentence_embedding_dimension().
+
+    `tokenizer` is the raw tokenizers.Tokenizer, truncating at
+    max_seq_length and not padding: encode() pads each batch itself, to
+    its longest text.
+    """
+
+    def __init__(self, path: str, quantized: bool = False, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.path = path
+        self.quantized = quantized
+        self.metadata = load_metadata(path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(path, QUANTIZED_FILE if quantized else MODEL_FILE),
+                                            options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.no_padding()
+        self.max_seq_length = self.metadata["max_seq_length"]
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+    @max_seq_length.setter
+    def max_seq_length(self, value: int):
+        self._max_seq_length = value
+        self.tokenizer.enable_truncation(max_length=value)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.metadata["dim"]
+
+    def _forward(self, encodings) -> np.ndarray:
+        width = max(len(e.ids) for e in encodings)
+        feeds = {name: np.zeros((len(encodings), width), dtype=np.int64) for name in _MODEL_INPUTS}
+        for row, e in enumerate(encodings):
+            n = len(e.ids)
+            feeds["input_ids"][row, :n] = e.ids
+            feeds["attention_mask"][row, :n] = 1
+            feeds["token_type_ids"][row, :n] = e.type_ids
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        return pool(hidden, feeds["attention_mask"], self.metadata["pooling"])
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, show_progress_bar: bool = False,
+               batch_size: int = 32, **kwargs) -> np.ndarray:
+        vectors = np.empty((len(texts), self.metadata["dim"]), dtype=np.float32)
+        if not texts:
+            return vectors
+        encodings = self.tokenizer.encode_batch(texts)
+        # Longest first, batch_size texts per run, like SentenceTransformer.encode()
+        order = np.argsort([-len(e.ids) for e in encodings], kind="stable")
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            vectors[batch] = self._forward([encodings[i] for i in batch])
+        if self.metadata["normalize"]:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+def _pooling_mode(model) -> Dict:
+    """Pooling mode and normalization of a SentenceTransformer, which must be Transformer [+ Pooling] [+ Normalize]."""
+    settings = {"pooling": "cls", "normalize": False}
+    for module in list(model)[1:]:
+        kind = type(module).__name__
+        if kind == "Pooling":
+            settings["pooling"] = module.get_pooling_mode_str()
+            if settings["pooling"] not in ("mean", "cls", "max"):
+                raise ValueError(f"Pooling mode '{settings['pooling']}' is not supported by the ONNX backend")
+        elif kind == "Normalize":
+            settings["normalize"] = True
+        else:
+            raise ValueError(f"Module {kind} of {model} is not supported by the ONNX backend")
+    return settings
+
+def export_model(model_name: str, path: str, opset: int = OPSET) -> Dict:
+    """
+    Export a SentenceTransformer's transformer to `path`/model.onnx with
+    its fast tokenizer, pooling settings and reference vectors, then check
+    it against PyTorch.
+
+    Returns:
+        dict: The metadata written to `path`/onnx.json.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    tokenizer = st_model.tokenizer
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError(f"{model_name} has no fast tokenizer, which the ONNX backend needs")
+    settings = _pooling_mode(st_model)
+    input_names = [n for n in _MODEL_INPUTS if n in tokenizer.model_input_names]
+
+    class Encoder(torch.nn.Module):
+        """Positional inputs -> last hidden state, for torch.onnx.export."""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    sample = tokenizer(PARITY_TEXTS[:2], padding=True, return_tensors="pt")
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    start = time.time()
+    with torch.no_grad():
+        torch.onnx.export(Encoder(st_model[0].auto_model.eval()), tuple(sample[n] for n in input_names),
+                          os.path.join(tmp, MODEL_FILE), input_names=input_names,
+                          output_names=["last_hidden_state"], dynamic_axes=axes,
+                          opset_version=opset, do_constant_folding=True)
+    tokenizer.backend_tokenizer.save(os.path.join(tmp, TOKENIZER_FILE))
+    reference = st_model.encode(PARITY_TEXTS, convert_to_numpy=True, show_progress_bar=False)
+    np.save(os.path.join(tmp, REFERENCE_FILE), reference.astype(np.float32))
+
+    metadata = {
+        "model_name": model_name,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length or tokenizer.model_max_length,
+        **settings,
+        "inputs": input_names,
+        "opset": opset,
+        "export_seconds": round(time.time() - start, 2),
+        "exported": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "parity": {},
+    }
+    _write_metadata(tmp, metadata)
+    metadata["parity"]["fp32"] = check_parity(tmp, quantized=False)
+    _write_metadata(tmp, metadata)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return metadata
+
+def quantize_model(path: str) -> Dict:
+    """
+    Write `path`/model_int8.onnx: model.onnx with int8 weights (dynamic
+    quantization: activations are quantized on the fly at inference).
+
+    Returns:
+        dict: Its parity with the PyTorch vectors.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = os.path.join(path, "tmp_" + QUANTIZED_FILE)
+    quantize_dynamic(os.path.join(path, MODEL_FILE), tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, os.path.join(path, QUANTIZED_FILE))
+    try:
+        parity = check_parity(path, quantized=True)
+    except RuntimeError:
+        os.remove(os.path.join(path, QUANTIZED_FILE))
+        raise
+    metadata = load_metadata(path)
+    metadata["parity"]["int8"] = parity
+    _write_metadata(path, metadata)
+    return parity
+
+def check_parity(path: str, quantized: bool = False) -> Dict:
+    """
+    Cosine similarity of the artefact's vectors of PARITY_TEXTS to the
+    PyTorch ones; raises RuntimeError below PARITY_MIN_COSINE.
+    """
+    variant = "int8" if quantized else "fp32"
+    reference = np.load(os.path.join(path, REFERENCE_FILE))
+    parity = cosine_parity(reference, OnnxModel(path, quantized).encode(PARITY_TEXTS))
+    if parity["min_cosine"] < PARITY_MIN_COSINE[variant]:
+        raise RuntimeError(f"ONNX {variant} model in {path} does not match PyTorch: min cosine "
+                           f"{parity['min_cosine']} < {PARITY_MIN_COSINE[variant]}")
+    return parity
+
+def is_exported(path: str, model_name: str, opset: int = OPSET) -> bool:
+    """Whether `path` holds an export of model_name at this opset."""
+    if not os.path.exists(os.path.join(path, METADATA_FILE)):
+        return False
+    metadata = load_metadata(path)
+    return metadata.get("model_name") == model_name and metadata.get("opset") == opset
+
+def ensure_model(model_name: str, quantize: bool = False, root: Optional[str] = None,
+                 force: bool = False, opset: int = OPSET) -> str:
+    """
+    Export (and quantize) a model unless already done; returns its artefact
+    directory. An export of another model or opset found there is replaced.
+    """
+    path = model_dir(model_name, root)
+    if force or not is_exported(path, model_name, opset):
+        print(f"Exporting {model_name} to ONNX in {path}...")
+        metadata = export_model(model_name, path, opset)
+        print(f"Exported in {metadata['export_seconds']}s, parity: {metadata['parity']['fp32']}")
+    if quantize and (force or not os.path.exists(os.path.join(path, QUANTIZED_FILE))):
+        print(f"Quantizing {model_name} to int8...")
+        print(f"Quantized, parity: {quantize_model(path)}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an embedding model to ONNX for Embedder backend='onnx'")
+    parser.add_argument("--model", type=str, default=config.EMBED_MODEL_NAME)
+    parser.add_argument("--quantize", action="store_true", help="Also write the int8 quantized model")
+    parser.add_argument("--out", type=str, default=None,
+                        help="Artefact root directory (default: EMBED_ONNX_DIR, else EXPORT_DIR/onnx)")
+    parser.add_argument("--force", action="store_true", help="Export again even if already exported")
+    args = parser.parse_args()
+    path = ensure_model(args.model, args.quantize, args.out, args.force)
+    print(json.dumps(load_metadata(path), indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,718 @@
+import argparse
 import os
+import queue
+import threading
+import numpy as np
+from typing import List, NamedTuple, Optional
 from . import config
-from .loader import stream_texts
+from .loader import stream_text_batches, SourcePosition, LOADER_ENGINES
 from .preprocessor import normalize_texts
-from .embedder import Embedder
-from .milvus_client import connect, create_collection, create_index, load_collection, insert_batch
-from .utils import batch_iterator
+from .dedup import make_deduplicator, hash_texts, DEDUP_MODES
+from .checkpoint import IngestCheckpoint, checkpoint_path
+from .ingest_log import IngestLog, ingest_log_path, scan_collection
+from .metrics import StageMetrics, StageProfiler, STAGES, PROFILERS
+from .id_ranges import plan_id_ranges, iter_file_batches, write_id_ranges, id_ranges_path
+from .embedder import Embedder, BACKENDS, BATCHING_MODES
+from .milvus_client import (
+    connect, create_collection, create_index, load_collection,
+    get_segment_count, BufferedInserter, FlushPolicy, FLUSH_POLICIES
+)
+
+# Marks the end of the stream on a stage queue
+_DONE = object()
+
+
+class _Batch(NamedTuple):
+    ids: List[int]
+    texts: List[str]
+    position: Optional[SourcePosition]  # where reading resumes after this batch
+    hashes: Optional[np.ndarray]        # dedup hashes of the texts
 
-def run_ingestion():
-    os.makedirs(config.EXPORT_DIR, exist_ok=True)
-    connect()
-    collection = create_collection()
 
-    embedder = Embedder(config.EMBED_MODEL_NAME)
+def _read_batches(deduper=None, engine=config.LOADER_ENGINE,
+                  start: Optional[SourcePosition] = None, first_id: int = 1,
+                  metrics: Optional[StageMetrics] = None):
+    """
+    Yield batches of normalized text with sequential ids.
 
-    text_iter = stream_texts(config.CSV_FILES)
-    id_counter = 1
+    If a deduplicator is given, texts seen in earlier batches are dropped.
+    `start` and `first_id` continue an interrupted run (pyarrow engine only).
+    Reading, normalizing and deduplicating are timed as separate stages.
+    """
+    metrics = metrics or StageMetrics()
+    id_counter = first_id
 
-    for batch in batch_iterator(text_iter, config.BATCH_SIZE):
-        batch = normalize_texts(batch)
+    if engine == "pyarrow":
+        raw_batches = stream_text_batches(config.CSV_FILES, config.TEXT_COLUMN, config.BATCH_SIZE,
+                                          engine=engine, start=start, with_positions=True)
+    else:
+        raw_batches = ((texts, None) for texts in stream_text_batches(
+            config.CSV_FILES, config.TEXT_COLUMN, config.BATCH_SIZE, engine=engine))
+
+    for batch, position in metrics.timed_iter("read", raw_batches, rows=lambda item: len(item[0])):
+        with metrics.stage("normalize", len(batch)):
+            batch = normalize_texts(batch)
+        with metrics.stage("dedup", len(batch)):
+            if deduper is not None:
+                batch, hashes = deduper.filter_with_hashes(batch)
+            else:
+                hashes = hash_texts(batch)
+        if not batch:
+            continue
         ids = list(range(id_counter, id_counter + len(batch)))
         id_counter += len(batch)
+        yield _Batch(ids, batch, position, hashes)
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up once another stage has failed."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    """Blocking get that returns _DONE once another stage has failed."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _read_stage(batches, out_q, stop):
+    for item in batches:
+        if not _put(out_q, item, stop):
+            return
+    _put(out_q, _DONE, stop)
+
+
+def _embed(embedder, texts, metrics):
+    with metrics.stage("embed", len(texts)):
+        return embedder.embed_array(texts, normalize=True)
+
+
+def _embed_stage(embedder, in_q, out_q, stop, metrics):
+    while True:
+        item = _get(in_q, stop)
+        if item is _DONE:
+            break
+        embeds = _embed(embedder, item.texts, metrics)
+        if not _put(out_q, (item, embeds), stop):
+            return
+    _put(out_q, _DONE, stop)
+
+
+def _run_stage(name, target, errors, stop, *args):
+    """Thread body: run a stage and record its failure so the others stop."""
+    try:
+        target(*args)
+    except BaseException as e:
+        errors.append((name, e))
+        stop.set()
+
+
+class _VectorSpool:
+    """Append-only float32 file of the vectors embedded in this run."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "wb")
+
+    def write(self, embeds):
+        np.ascontiguousarray(embeds, dtype=np.float32).tofile(self._file)
+        self.rows += len(embeds)
+
+    def vectors(self, dim):
+        self._file.close()
+        if not self.rows:
+            return np.empty((0, dim), dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, dim))
+
+    def remove(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _insert(inserter, batch, embeds, spool=None):
+    if spool is not None:
+        spool.write(embeds)
+    # The batch itself is the marker handed to the checkpoint after insert
+    inserter.add(batch.ids, batch.texts, embeds, marker=batch)
+
+
+def _ingest_serial(batches, inserter, embedder, metrics, spool=None):
+    for batch in batches:
+        embeds = _embed(embedder, batch.texts, metrics)
+        _insert(inserter, batch, embeds, spool)
+
+
+def _ingest_pipelined(batches, inserter, embedder, metrics, read_queue_size, insert_queue_size,
+                      spool=None):
+    """
+    Overlap reading, embedding and inserting.
+
+    Reader and embedder run in background threads connected by bounded
+    queues; the calling thread does the inserts. A full queue blocks the
+    stage feeding it (backpressure), so at most
+    read_queue_size + insert_queue_size batches are held in memory.
+    """
+    read_q = queue.Queue(maxsize=read_queue_size)
+    insert_q = queue.Queue(maxsize=insert_queue_size)
+    stop = threading.Event()
+    errors = []
+
+    threads = [
+        threading.Thread(target=_run_stage, name="reader",
+                         args=("reader", _read_stage, errors, stop, batches, read_q, stop),
+                         daemon=True),
+        threading.Thread(target=_run_stage, name="embedder",
+                         args=("embedder", _embed_stage, errors, stop, embedder, read_q, insert_q, stop,
+                               metrics),
+                         daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = _get(insert_q, stop)
+            if item is _DONE:
+                break
+            _insert(inserter, *item, spool)
+    except BaseException as e:
+        errors.append(("inserter", e))
+        stop.set()
+    finally:
+        for t in threads:
+            t.join()
+
+    if errors:
+        name, err = errors[0]
+        raise RuntimeError(f"Ingestion failed in {name} stage") from err
+
+
+def _file_stage(embedder, ranges_q, out_q, stop, metrics):
+    """Read and embed whole files taken from ranges_q until it is empty."""
+    while not stop.is_set():
+        try:
+            id_range = ranges_q.get_nowait()
+        except queue.Empty:
+            break
+        batches = iter_file_batches(id_range, config.BATCH_SIZE)
+        for ids, texts in metrics.timed_iter("read", batches, rows=lambda item: len(item[0])):
+            embeds = _embed(embedder, texts, metrics)
+            if not _put(out_q, (_Batch(ids, texts, None, hash_texts(texts)), embeds), stop):
+                return
+    _put(out_q, _DONE, stop)
 
-        embeds = embedder.embed_batch(batch, normalize=True)
-        insert_batch(collection, ids, batch, embeds)
-        print(f"Inserted batch: {ids[0]} - {ids[-1]}")
 
-    create_index(collection)
-    load_collection(collection)
+def _ingest_parallel(id_ranges, inserter, embedder, metrics, file_workers, insert_queue_size,
+                     spool=None):
+    """
+    Read and embed several files concurrently.
+
+    Each of `file_workers` threads takes the next file not yet started,
+    reads it and embeds its batches (a shared Embedder; use embed_workers
+    for CPU parallelism in the encoding itself). The calling thread inserts
+    batches from all files as they arrive. Ids come from the precomputed
+    ranges, so the insert order does not matter.
+    """
+    ranges_q = queue.Queue()
+    for id_range in id_ranges:
+        ranges_q.put(id_range)
+    insert_q = queue.Queue(maxsize=insert_queue_size)
+    stop = threading.Event()
+    errors = []
+
+    threads = [
+        threading.Thread(target=_run_stage, name=f"file-worker-{n}",
+                         args=(f"file worker {n}", _file_stage, errors, stop,
+                               embedder, ranges_q, insert_q, stop, metrics),
+                         daemon=True)
+        for n in range(file_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    running = len(threads)
+    try:
+        while running:
+            item = _get(insert_q, stop)
+            if item is _DONE:
+                running -= 1
+                continue
+            _insert(inserter, *item, spool)
+    except BaseException as e:
+        errors.append(("inserter", e))
+        stop.set()
+    finally:
+        for t in threads:
+            t.join()
+
+    if errors:
+        name, err = errors[0]
+        raise RuntimeError(f"Ingestion failed in {name}") from err
+
+
+def _format_segments(count):
+    return "n/a" if count is None else str(count)
+
+
+def _segments_before(collection):
+    """
+    Segment count of a collection before ingestion. Milvus only reports
+    segments of loaded collections, and loading needs an index: an empty
+    collection has none, any other one is indexed by earlier runs, so it
+    is loaded first.
+    """
+    if collection.num_entities == 0:
+        return 0
+    if collection.has_index():
+        collection.load()
+    return get_segment_count(collection)
+
+
+def _on_insert(checkpoint, ingest_log):
+    """
+    BufferedInserter callback recording inserted batches in the ingest log
+    and, if there is one, the checkpoint.
+    """
+    def on_insert(batches):
+        hashes = np.concatenate([b.hashes for b in batches])
+        ingest_log.append(hashes, max(b.ids[-1] for b in batches))
+        if checkpoint is not None:
+            last = batches[-1]
+            checkpoint.update(last.position, last.ids[-1] + 1, hashes)
+    return on_insert
+
+
+def _open_ingest_log(collection, incremental, resume):
+    """
+    Load the collection's ingest log, rebuilding it from the collection's
+    texts if it was never kept.
+
+    A plain run (not incremental, not resuming) needs an empty collection:
+    it numbers rows from id 1, which would reuse the ids already there.
+    """
+    ingest_log = IngestLog(ingest_log_path(config.COLLECTION_NAME))
+    num_entities = collection.num_entities
+    if num_entities and not (incremental or resume):
+        raise RuntimeError(
+            f"Collection '{config.COLLECTION_NAME}' already holds {num_entities} rows and a new run "
+            f"would insert ids from 1 again. Use --incremental to add only new rows, or drop the "
+            f"collection (utils.py drop) to start over."
+        )
+    # An empty collection makes any old log stale, except when resuming
+    # (rows inserted before the interruption may not be flushed yet)
+    if ingest_log.exists() and (num_entities or resume):
+        ingest_log.load()
+        if ingest_log.state["collection"] == config.COLLECTION_NAME:
+            return ingest_log
+    if num_entities:
+        print(f"No ingest log for '{config.COLLECTION_NAME}', hashing its {num_entities} rows...")
+        hashes, max_id = scan_collection(collection)
+        ingest_log.create(config.COLLECTION_NAME, hashes, max_id)
+        print(f"Ingest log rebuilt: {len(hashes)} rows, max id {max_id}")
+    else:
+        ingest_log.create(config.COLLECTION_NAME)
+    return ingest_log
+
+
+def _open_checkpoint(resume, use_checkpoint, loader_engine, first_id=1):
+    """
+    Prepare the checkpoint for this run.
+
+    Returns (checkpoint, start position, first id, hashes of rows already
+    inserted); checkpoint is None when checkpointing is off.
+    """
+    if not use_checkpoint or loader_engine != "pyarrow":
+        if resume:
+            raise ValueError("Resuming needs checkpointing and the pyarrow loader engine")
+        if use_checkpoint:
+            print("Checkpointing disabled: it needs the pyarrow loader engine.")
+        return None, None, first_id, None
+
+    checkpoint = IngestCheckpoint(checkpoint_path(config.COLLECTION_NAME))
+    if not resume:
+        # A completed checkpoint has nothing left to resume: a new run replaces it
+        if checkpoint.exists() and not checkpoint.load()["complete"]:
+            raise RuntimeError(
+                f"A checkpoint for '{config.COLLECTION_NAME}' exists at {checkpoint.path}. "
+                f"Use --resume to continue that run, or drop the collection "
+                f"(utils.py drop) and delete the checkpoint to start over."
+            )
+        checkpoint.start(config.COLLECTION_NAME, config.CSV_FILES, first_id)
+        return checkpoint, None, first_id, None
+
+    if not checkpoint.exists():
+        raise FileNotFoundError(f"No checkpoint to resume from at {checkpoint.path}")
+    state = checkpoint.load()
+    if state["collection"] != config.COLLECTION_NAME or state["files"] != list(config.CSV_FILES):
+        raise ValueError(f"Checkpoint {checkpoint.path} was written for another collection or file list")
+    print(f"Resuming from {state['file']} at byte {state['offset']} "
+          f"(+{state['skip_rows']} rows), next id {state['next_id']}")
+    return checkpoint, checkpoint.position(), state["next_id"], checkpoint.load_hashes()
+
+
+def run_ingestion(pipelined: bool = False,
+                  read_queue_size: int = config.READ_QUEUE_SIZE,
+                  insert_queue_size: int = config.INSERT_QUEUE_SIZE,
+                  flush_policy: FlushPolicy = None,
+                  insert_buffer_bytes: int = config.INSERT_BUFFER_BYTES,
+                  embed_workers: int = config.EMBED_WORKERS,
+                  torch_threads: int = config.EMBED_TORCH_THREADS,
+                  embed_cache_dir: str = config.EMBED_CACHE_DIR,
+                  embed_batching: str = config.EMBED_BATCHING,
+                  token_budget: int = config.EMBED_TOKEN_BUDGET,
+                  embed_backend: str = config.EMBED_BACKEND,
+                  onnx_quantize: bool = config.EMBED_ONNX_QUANTIZE,
+                  dedup_mode: str = config.DEDUP_MODE,
+                  loader_engine: str = config.LOADER_ENGINE,
+                  resume: bool = False,
+                  use_checkpoint: bool = True,
+                  file_workers: int = config.FILE_WORKERS,
+                  incremental: bool = False,
+                  kmeans_model_dir: Optional[str] = None,
+                  metrics_path: Optional[str] = config.METRICS_FILE,
+                  profile_stage: Optional[str] = None,
+                  profiler: str = "cprofile",
+                  profile_output: Optional[str] = None):
+    """
+    Load CSVs, embed the texts and insert them into Milvus.
+
+    Args:
+        pipelined (bool): Run reading, embedding and inserting as overlapping
+            stages instead of one after another.
+        read_queue_size (int): Batches buffered between reader and embedder.
+        insert_queue_size (int): Batches buffered between embedder and inserter.
+        flush_policy (FlushPolicy): When to flush inserted rows (default: config).
+        insert_buffer_bytes (int): Approximate size of each Milvus insert.
+        embed_workers (int): Embedding worker processes (0 = in-process).
+        torch_threads (int): Torch threads per embedding worker.
+        embed_cache_dir (str): Persistent embedding cache directory (None = off).
+        embed_batching (str): "tokens" (length-sorted, token-budgeted forward
+            passes) or "fixed" (the model's own batching).
+        token_budget (int): Padded tokens per forward pass for "tokens".
+        embed_backend (str): "torch" or "onnx" (ONNX Runtime, exported on first use).
+        onnx_quantize (bool): Run the int8 quantized ONNX model.
+        dedup_mode (str): Cross-batch deduplication: "hashset", "bloom" or "none".
+        loader_engine (str): CSV reader, "pyarrow" or "pandas".
+        resume (bool): Continue an interrupted run from its checkpoint.
+        use_checkpoint (bool): Record progress after every insert so the run
+            can be resumed (pyarrow engine only).
+        file_workers (int): If > 0, ingest this many files concurrently with
+            deterministic per-file id ranges (pyarrow engine, no checkpoint).
+        incremental (bool): Add only rows whose text is not in the collection
+            yet (per its ingest log), with ids after its current max id.
+        kmeans_model_dir (str): If set, update the k-means model saved there
+            with partial_fit on the vectors embedded by this run.
+        metrics_path (str): Append per-stage timings to this JSON lines file
+            (a summary table is printed either way).
+        profile_stage (str): Profile only this stage (see metrics.STAGES).
+        profiler (str): "cprofile" or "sample" (see metrics.StageProfiler).
+        profile_output (str): Profile file (default: EXPORT_DIR/profile_<stage>
+            .prof for cProfile, .folded for sampled stacks).
+    """
+    if file_workers > 0:
+        if resume:
+            raise ValueError("Resuming is not supported with parallel file ingestion")
+        if loader_engine != "pyarrow":
+            raise ValueError("Parallel file ingestion needs the pyarrow loader engine")
+        if use_checkpoint:
+            print("Checkpointing disabled: not supported with parallel file ingestion.")
+            use_checkpoint = False
+
+    os.makedirs(config.EXPORT_DIR, exist_ok=True)
+    stage_profiler = None
+    if profile_stage:
+        suffix = ".prof" if profiler == "cprofile" else ".folded"
+        profile_output = profile_output or os.path.join(config.EXPORT_DIR, f"profile_{profile_stage}{suffix}")
+        stage_profiler = StageProfiler(profile_stage, profiler, profile_output)
+    mode = "parallel" if file_workers > 0 else "pipelined" if pipelined else "serial"
+    metrics = StageMetrics(metrics_path, stage_profiler, collection=config.COLLECTION_NAME, mode=mode,
+                           incremental=incremental, embed_workers=embed_workers, batch_size=config.BATCH_SIZE)
+
+    connect()
+    collection = create_collection(dim=config.VECTOR_DIM)
+    segments_before = _segments_before(collection)
+
+    ingest_log = _open_ingest_log(collection, incremental, resume)
+    first_id = ingest_log.next_id if incremental else 1
+    checkpoint, start, first_id, done_hashes = _open_checkpoint(resume, use_checkpoint, loader_engine,
+                                                                first_id)
+    if not resume:
+        ingest_log.begin_run(config.CSV_FILES, incremental)
+    inserter = BufferedInserter(collection, flush_policy, insert_buffer_bytes,
+                                _on_insert(checkpoint, ingest_log), metrics)
+    if incremental and dedup_mode == "none":
+        # Rows already in the collection are recognised through the deduplicator
+        print("Incremental ingestion deduplicates against the collection: using --dedup hashset.")
+        dedup_mode = "hashset"
+    deduper = make_deduplicator(dedup_mode, config.DEDUP_CAPACITY, config.DEDUP_FP_RATE)
+    if deduper is not None and done_hashes is not None:
+        deduper.add_hashes(done_hashes)
+    if deduper is not None and incremental:
+        known = ingest_log.load_hashes()
+        deduper.add_hashes(known)
+        print(f"Incremental: {len(known)} rows already ingested, new ids start at {first_id}")
+
+    if file_workers > 0:
+        with metrics.stage("plan") as timing:
+            id_ranges = plan_id_ranges(config.CSV_FILES, deduper, first_id=first_id,
+                                       batch_size=config.BATCH_SIZE)
+            timing.rows = sum(r.num_rows for r in id_ranges)
+        manifest = id_ranges_path(config.COLLECTION_NAME)
+        write_id_ranges(id_ranges, manifest)
+        for r in id_ranges:
+            print(f"{os.path.basename(r.path)}: ids {r.first_id} - {r.last_id} ({r.num_rows} rows)")
+        print(f"Id ranges saved to {manifest}")
+
+    spool = None
+    if kmeans_model_dir:
+        spool = _VectorSpool(os.path.join(config.EXPORT_DIR, f"new_vectors_{config.COLLECTION_NAME}.f32"))
+
+    if checkpoint is None or not checkpoint.state["complete"]:
+        batches = _read_batches(deduper, loader_engine, start, first_id, metrics) if not file_workers else None
+        with Embedder(config.EMBED_MODEL_NAME, embed_workers, torch_threads,
+                      cache_dir=embed_cache_dir,
+                      cache_capacity=config.EMBED_CACHE_CAPACITY,
+                      batching=embed_batching, token_budget=token_budget,
+                      backend=embed_backend, quantize=onnx_quantize) as embedder:
+            if file_workers > 0:
+                _ingest_parallel(id_ranges, inserter, embedder, metrics, file_workers, insert_queue_size,
+                                 spool)
+            elif pipelined:
+                _ingest_pipelined(batches, inserter, embedder, metrics, read_queue_size,
+                                  insert_queue_size, spool)
+            else:
+                _ingest_serial(batches, inserter, embedder, metrics, spool)
+            if embedder.cache is not None:
+                print(f"Embedding cache: {embedder.cache.stats()}")
+        inserter.close()
+        if checkpoint is not None:
+            checkpoint.mark_complete()
+    else:
+        print("Checkpoint says all rows were already inserted.")
+
+    if spool is not None:
+        from src.operations.minibatch_kmeans import update_model, array_batches
+
+        try:
+            update_model(array_batches(spool.vectors(config.VECTOR_DIM)), kmeans_model_dir,
+                         source=f"ingestion:{config.COLLECTION_NAME}")
+        finally:
+            spool.remove()
+
+    with metrics.stage("index", inserter.rows_inserted):
+        create_index(collection, index_type=config.INDEX_TYPE,
+                     metric_type=config.METRIC_TYPE, params=config.INDEX_PARAMS)
+    with metrics.stage("load"):
+        load_collection(collection)
+    print(f"Inserted {inserter.rows_inserted} rows in {inserter.num_inserts} inserts, "
+          f"{inserter.num_flushes} flushes.")
+    if deduper is not None:
+        print(f"Dedup ({dedup_mode}): dropped {deduper.dropped} duplicate rows, "
+              f"{deduper.memory_bytes() / 1024 ** 2:.1f} MiB used")
+    print(f"Segments before: {_format_segments(segments_before)} | "
+          f"after: {_format_segments(get_segment_count(collection))}")
+    print()
+    print(metrics.format_summary())
+    for line in metrics.close():
+        print(line)
+    if metrics_path:
+        print(f"Stage metrics appended to {metrics_path}")
+    if stage_profiler is not None:
+        print(f"Profile of stage '{profile_stage}' saved to {profile_output}")
     print("===================")
     print("Ingestion complete.")
     print("===================")
 
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Ingest CSV texts into Milvus", parents=[settings])
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Overlap CSV reading, embedding and Milvus inserts"
+    )
+    parser.add_argument(
+        "--read-queue",
+        type=int,
+        default=config.READ_QUEUE_SIZE,
+        help=f"Batches buffered between reader and embedder (default: {config.READ_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        "--insert-queue",
+        type=int,
+        default=config.INSERT_QUEUE_SIZE,
+        help=f"Batches buffered between embedder and inserter (default: {config.INSERT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        "--flush-policy",
+        choices=FLUSH_POLICIES,
+        default=config.FLUSH_POLICY,
+        help=f"When to flush inserts to sealed segments (default: {config.FLUSH_POLICY})"
+    )
+    parser.add_argument(
+        "--flush-every-rows",
+        type=int,
+        default=config.FLUSH_EVERY_ROWS,
+        help=f"Rows between flushes for --flush-policy rows (default: {config.FLUSH_EVERY_ROWS})"
+    )
+    parser.add_argument(
+        "--flush-every-seconds",
+        type=float,
+        default=config.FLUSH_EVERY_SECONDS,
+        help=f"Seconds between flushes for --flush-policy seconds (default: {config.FLUSH_EVERY_SECONDS})"
+    )
+    parser.add_argument(
+        "--insert-buffer-mb",
+        type=float,
+        default=config.INSERT_BUFFER_BYTES / (1024 * 1024),
+        help="Approximate size of each Milvus insert in MiB"
+    )
+    parser.add_argument(
+        "--embed-workers",
+        type=int,
+        default=config.EMBED_WORKERS,
+        help="Embedding worker processes, each with its own model copy (default: in-process)"
+    )
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=config.EMBED_TORCH_THREADS,
+        help="Torch threads per embedding worker (default: CPU cores / workers)"
+    )
+    parser.add_argument(
+        "--embed-cache",
+        type=str,
+        default=config.EMBED_CACHE_DIR,
+        help="Directory of the persistent embedding cache (default: disabled)"
+    )
+    parser.add_argument(
+        "--embed-batching",
+        choices=BATCHING_MODES,
+        default=config.EMBED_BATCHING,
+        help=f"Split embed calls by token budget or leave it to the model (default: {config.EMBED_BATCHING})"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=config.EMBED_TOKEN_BUDGET,
+        help=f"Padded tokens per forward pass with --embed-batching tokens (default: {config.EMBED_TOKEN_BUDGET})"
+    )
+    parser.add_argument(
+        "--embed-backend",
+        choices=BACKENDS,
+        default=config.EMBED_BACKEND,
+        help=f"Inference backend; onnx exports the model on first use (default: {config.EMBED_BACKEND})"
+    )
+    parser.add_argument(
+        "--onnx-quantize",
+        action="store_true",
+        default=config.EMBED_ONNX_QUANTIZE,
+        help="With --embed-backend onnx, run the int8 dynamically quantized model"
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=DEDUP_MODES,
+        default=config.DEDUP_MODE,
+        help=f"Deduplicate texts across batches and files (default: {config.DEDUP_MODE})"
+    )
+    parser.add_argument(
+        "--loader",
+        choices=LOADER_ENGINES,
+        default=config.LOADER_ENGINE,
+        help=f"CSV reader engine (default: {config.LOADER_ENGINE})"
+    )
+    parser.add_argument(
+        "--parallel-files",
+        type=int,
+        default=config.FILE_WORKERS,
+        help="Ingest this many CSV files concurrently, with fixed per-file id ranges (default: off)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint"
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="Don't record progress for --resume"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed and insert rows not already in the collection, with ids after its max id"
+    )
+    parser.add_argument(
+        "--update-kmeans",
+        nargs="?",
+        const="src/sklearn_models/minibatch_kmeans",
+        default=None,
+        metavar="MODEL_DIR",
+        help="Update the saved k-means model with partial_fit on the newly embedded vectors"
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=config.METRICS_FILE,
+        help="Append per-stage timings to this JSON lines file"
+    )
+    parser.add_argument(
+        "--profile-stage",
+        choices=STAGES,
+        default=None,
+        help="Profile one stage of the run"
+    )
+    parser.add_argument(
+        "--profiler",
+        choices=PROFILERS,
+        default="cprofile",
+        help="cprofile (deterministic, .prof) or sample (stack sampling, collapsed stacks)"
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        default=None,
+        help="Profile output file (default: exports/profile_<stage>.prof or .folded)"
+    )
+    args = parser.parse_args()
+
+    flush_policy = FlushPolicy(args.flush_policy, args.flush_every_rows, args.flush_every_seconds)
+    run_ingestion(pipelined=args.pipelined,
+                  read_queue_size=args.read_queue,
+                  insert_queue_size=args.insert_queue,
+                  flush_policy=flush_policy,
+                  insert_buffer_bytes=int(args.insert_buffer_mb * 1024 * 1024),
+                  embed_workers=args.embed_workers,
+                  torch_threads=args.torch_threads,
+                  embed_cache_dir=args.embed_cache,
+                  embed_batching=args.embed_batching,
+                  token_budget=args.token_budget,
+                  embed_backend=args.embed_backend,
+                  onnx_quantize=args.onnx_quantize,
+                  dedup_mode=args.dedup,
+                  loader_engine=args.loader,
+                  resume=args.resume,
+                  use_checkpoint=not args.no_checkpoint,
+                  file_workers=args.parallel_files,
+                  incremental=args.incremental,
+                  kmeans_model_dir=args.update_kmeans,
+                  metrics_path=args.metrics,
+                  profile_stage=args.profile_stage,
+                  profiler=args.profiler,
+                  profile_output=args.profile_out)
+
 if __name__ == '__main__':
-    run_ingestion()
+    main()
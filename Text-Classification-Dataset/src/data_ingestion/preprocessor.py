@@ -1,11 +1,15 @@
 from typing import Iterable, List
 
+def normalize_text(text: str) -> str:
+    """Normalize a single text: strip and lowercase."""
+    return text.strip().lower()
+
 def normalize_texts(texts: Iterable[str]) -> List[str]:
     """Basic normalization: strip, lowercase, deduplicate."""
     seen = set()
     cleaned = []
     for t in texts:
-        norm = t.strip().lower()
+        norm = normalize_text(t)
         if norm and norm not in seen:
             seen.add(norm)
             cleaned.append(norm)
@@ -1,5 +1,8 @@
+import hashlib
 import time
-from typing import Iterable, List
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
 
 def batch_iterator(iterable, batch_size: int):
     """Yield successive batches from iterable."""
@@ -12,6 +15,35 @@ def batch_iterator(iterable, batch_size: int):
     if batch:
         yield batch
 
+_EXHAUSTED = object()
+
+def prefetch(iterable, depth: int = 1):
+    """
+    Iterate over `iterable` on a background thread, keeping up to `depth`
+    items ready, so producing the next item (e.g. reading a batch) overlaps
+    with the caller's work on the current one. depth <= 0 iterates inline.
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+    it = iter(iterable)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = deque(executor.submit(next, it, _EXHAUSTED) for _ in range(depth))
+        while True:
+            item = pending.popleft().result()
+            if item is _EXHAUSTED:
+                break
+            pending.append(executor.submit(next, it, _EXHAUSTED))
+            yield item
+
+def text_hash64(text: str, salt: str = "") -> int:
+    """Stable 64-bit hash of a text (optionally salted, e.g. with a model name)."""
+    h = hashlib.blake2b(digest_size=8)
+    if salt:
+        h.update(salt.encode("utf-8") + b"\0")
+    h.update(text.encode("utf-8"))
+    return int.from_bytes(h.digest(), "little")
+
 def log_time(func):
     """Decorator to measure execution time of functions."""
     def wrapper(*args, **kwargs):
@@ -20,3 +52,56 @@ def log_time(func):
         print(f"⏱ {func.__name__} took {time.time() - start:.2f}s")
         return result
     return wrapper
+
+class LRUCache:
+    """
+    Bounded in-memory mapping that evicts the least recently used entry
+    and, if `ttl_seconds` is set, treats entries older than that as missing.
+    Counts hits, misses (including expired entries) and evictions.
+    """
+
+    def __init__(self, capacity: int, ttl_seconds: Optional[float] = None):
+        self.capacity = capacity
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] < time.monotonic()):
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+        }
@@ -1,22 +1,63 @@
 from pymilvus import connections, Collection
-from sentence_transformers import SentenceTransformer
+import hashlib
+import time
 import numpy as np
 from src.data_ingestion import config
+from src.data_ingestion import milvus_client
+from src.data_ingestion.embedder import Embedder
+from src.data_ingestion.preprocessor import normalize_text
+from src.data_ingestion.utils import LRUCache
 from typing import List, Optional
 
 class AdvancedKNNSearcher:
     def __init__(self,
                  milvus_host: str = config.MILVUS_HOST,
                  milvus_port: int = config.MILVUS_PORT,
-                 collection_name: str = config.COLLECTION_NAME,
+                 collection_name: Optional[str] = None,
                  embed_model_name: str = config.EMBED_MODEL_NAME,
                  vector_dim: int = config.VECTOR_DIM,
                  metric_type: str = config.METRIC_TYPE,
-                 nprobe: int = 10):
+                 nprobe: Optional[int] = None,
+                 embed_cache_dir: Optional[str] = config.EMBED_CACHE_DIR,
+                 query_cache_size: int = 10000,
+                 result_cache_size: int = 10000,
+                 result_ttl: Optional[float] = 300.0,
+                 entity_check_seconds: Optional[float] = 30.0,
+                 cluster_model_dir: Optional[str] = None,
+                 clusters: int = 0,
+                 cluster_layout: str = "filter",
+                 embed_backend: Optional[str] = None):
+        """
+        nprobe: Default search-time parameter of config.INDEX_TYPE (nprobe,
+            or ef for HNSW; None = config.SEARCH_PARAM or the index's
+            default, see milvus_client.search_params()).
+
+        Cluster-pruned search (src/operations/cluster_assigner.py):
+            cluster_model_dir: Saved scaler/PCA/k-means; enables pruning.
+            clusters: Default number of nearest clusters searched per
+                query (0 = whole collection).
+            cluster_layout: How the collection is split by cluster, as
+                written by `cluster_assigner label --target milvus`:
+                "filter" (a `cluster_id in [...]` expression) or
+                "partition" (one cluster_<id> partition per cluster).
+
+        embed_backend: Embedder inference backend, "torch" or "onnx"
+            (default: config.EMBED_BACKEND).
+
+        Cache parameters (0 / None disables):
+            query_cache_size: Normalized query text -> embedding entries.
+            result_cache_size: (embedding, top_k, metric, nprobe, filter) ->
+                hits entries.
+            result_ttl: Seconds a cached result stays valid.
+            entity_check_seconds: How often search_vectors() checks the
+                collection's entity count; cached results are dropped when
+                it changes (inserts from other processes). Inserts made in
+                this process through milvus_client drop them immediately.
+        """
         # Milvus connection
         self.milvus_host = milvus_host
         self.milvus_port = milvus_port
-        self.collection_name = collection_name
+        self.collection_name = collection_name or config.COLLECTION_NAME
         self.metric_type = metric_type
         self.nprobe = nprobe
         self.vector_dim = vector_dim
@@ -26,14 +67,85 @@ class AdvancedKNNSearcher:
         self.collection.load()
 
         # Load embedding model
-        self.model = SentenceTransformer(embed_model_name)
+        self.embedder = Embedder(embed_model_name, cache_dir=embed_cache_dir, backend=embed_backend)
+        self.model = self.embedder.model
+
+        self.query_cache = LRUCache(query_cache_size)
+        self.result_cache = LRUCache(result_cache_size, result_ttl)
+        self.invalidations = 0
+        self.entity_check_seconds = entity_check_seconds
+        self._num_entities = None
+        self._entities_checked = 0.0
+        milvus_client.add_insert_listener(self._on_insert)
+
+        if cluster_layout not in ("filter", "partition"):
+            raise ValueError(f"Unknown cluster layout '{cluster_layout}', expected 'filter' or 'partition'")
+        self.cluster_layout = cluster_layout
+        self.clusters = clusters
+        self.cluster_assigner = None
+        if cluster_model_dir:
+            from src.operations.cluster_assigner import ClusterAssigner
+            self.cluster_assigner = ClusterAssigner.load(cluster_model_dir)
+
+    def _on_insert(self, collection_name, num_rows):
+        if collection_name == self.collection_name:
+            self.invalidate_results()
+
+    def invalidate_results(self):
+        """Drop all cached search results (e.g. after new rows were inserted)."""
+        self.result_cache.clear()
+        self.invalidations += 1
+
+    def _check_entities(self):
+        """Invalidate cached results if the collection's entity count changed."""
+        if not self.entity_check_seconds:
+            return
+        now = time.monotonic()
+        if now - self._entities_checked < self.entity_check_seconds:
+            return
+        self._entities_checked = now
+        num_entities = self.collection.num_entities
+        if self._num_entities is not None and num_entities != self._num_entities:
+            self.invalidate_results()
+        self._num_entities = num_entities
+
+    def cache_stats(self) -> dict:
+        return {
+            "query_cache": self.query_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "result_invalidations": self.invalidations,
+        }
+
+    def close(self):
+        milvus_client.remove_insert_listener(self._on_insert)
+        self.embedder.close()
 
     def embed_text(self, texts: List[str], normalize: bool = True) -> np.ndarray:
-        vectors = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        if normalize:
-            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-            norms[norms == 0] = 1.0
-            vectors = vectors / norms
+        """
+        Embed texts into a C-contiguous float32 array.
+
+        Normalized embeddings are cached by normalized text (stripped,
+        lowercased, as at ingestion), so repeated queries skip the model.
+        """
+        if not normalize or self.query_cache.capacity <= 0:
+            return self.embedder.embed_array(texts, normalize=normalize)
+
+        keys = [normalize_text(t) for t in texts]
+        vectors = np.empty((len(texts), self.vector_dim), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.query_cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                vectors[i] = cached
+        if missing:
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            embedded = dict(zip(unique, self.embedder.embed_array(unique, normalize=True)))
+            for i in missing:
+                vectors[i] = embedded[keys[i]]
+            for key, vector in embedded.items():
+                self.query_cache.put(key, vector)
         return vectors
 
     def search(self,
@@ -41,7 +153,8 @@ class AdvancedKNNSearcher:
                top_k: int = 5,
                metric_type: Optional[str] = None,
                nprobe: Optional[int] = None,
-               filter_expr: Optional[str] = None):
+               filter_expr: Optional[str] = None,
+               clusters: Optional[int] = None):
         """
         Advanced KNN search.
 
@@ -49,22 +162,91 @@ class AdvancedKNNSearcher:
             query_texts: List of query strings
             top_k: Number of top similar results to return
             metric_type: Optional metric override ('IP', 'L2', 'COSINE')
-            nprobe: Optional override of nprobe
+            nprobe: Optional override of nprobe (ef for HNSW)
             filter_expr: Optional Milvus filter expression (e.g., "id > 1000")
+            clusters: Optional override of the nearest k-means clusters
+                searched (0 = unpruned; needs cluster_model_dir)
+        """
+        vectors = self.embed_text(query_texts)
+        return self.search_vectors(vectors, top_k=top_k, metric_type=metric_type,
+                                   nprobe=nprobe, filter_expr=filter_expr, clusters=clusters)
+
+    def search_vectors(self,
+                       vectors: np.ndarray,
+                       top_k: int = 5,
+                       metric_type: Optional[str] = None,
+                       nprobe: Optional[int] = None,
+                       filter_expr: Optional[str] = None,
+                       clusters: Optional[int] = None):
+        """
+        KNN search with precomputed query vectors.
+
+        Results are cached per query vector and search parameters; only
+        vectors without a cached result are sent to Milvus.
+
+        Parameters:
+            vectors: float32 array of shape (n_queries, dim)
+            top_k, metric_type, nprobe, filter_expr, clusters: as in search()
         """
         nprobe = nprobe or self.nprobe
         metric_type = metric_type or self.metric_type
+        clusters = self.clusters if clusters is None else clusters
+        if clusters and self.cluster_assigner is None:
+            raise ValueError("Cluster-pruned search needs cluster_model_dir")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
 
-        vectors = self.embed_text(query_texts)
-        results = self.collection.search(
-            data=vectors.tolist(),
+        if self.result_cache.capacity <= 0:
+            return self._search(vectors, top_k, metric_type, nprobe, filter_expr, clusters)
+
+        self._check_entities()
+        keys = [(hashlib.blake2b(v.tobytes(), digest_size=16).digest(),
+                 top_k, metric_type, nprobe, filter_expr, clusters) for v in vectors]
+        results = [self.result_cache.get(key) for key in keys]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        if missing:
+            found = self._search(vectors[missing], top_k, metric_type, nprobe, filter_expr, clusters)
+            for i, hits in zip(missing, found):
+                results[i] = hits
+                self.result_cache.put(keys[i], hits)
+        return results  # List of results per query
+
+    def _search(self, vectors, top_k, metric_type, nprobe, filter_expr, clusters):
+        """
+        Unpruned, or restricted to each query's `clusters` nearest k-means
+        clusters: queries probing the same clusters share one Milvus request.
+        """
+        if not clusters:
+            return self._milvus_search(vectors, top_k, metric_type, nprobe, filter_expr)
+        probes = np.sort(self.cluster_assigner.nearest(vectors, clusters), axis=1)
+        groups = {}
+        for i, probe in enumerate(map(tuple, probes.tolist())):
+            groups.setdefault(probe, []).append(i)
+
+        results = [None] * len(vectors)
+        for probe, queries in groups.items():
+            if self.cluster_layout == "partition":
+                from src.operations.cluster_assigner import cluster_partition
+                found = self._milvus_search(vectors[queries], top_k, metric_type, nprobe, filter_expr,
+                                            partition_names=[cluster_partition(c) for c in probe])
+            else:
+                expr = f"cluster_id in {list(probe)}"
+                if filter_expr:
+                    expr = f"({filter_expr}) and {expr}"
+                found = self._milvus_search(vectors[queries], top_k, metric_type, nprobe, expr)
+            for i, hits in zip(queries, found):
+                results[i] = hits
+        return results
+
+    def _milvus_search(self, vectors, top_k, metric_type, nprobe, filter_expr, partition_names=None):
+        return self.collection.search(
+            data=vectors,
             anns_field="emb",
-            param={"metric_type": metric_type, "params": {"nprobe": nprobe}},
+            param=milvus_client.search_params(config.INDEX_TYPE, metric_type, nprobe, top_k),
             limit=top_k,
             output_fields=["id", "text"],
-            expr=filter_expr
+            expr=filter_expr,
+            partition_names=partition_names
         )
-        return results  # List of results per query
 
 if __name__ == "__main__":
     searcher = AdvancedKNNSearcher()
@@ -74,7 +256,7 @@ if __name__ == "__main__":
     query_texts = [q.strip() for q in query_input.split(",") if q.strip()]
     top_k = int(input("Enter number of similar texts: "))
     metric_type = input("Enter metric type (IP / L2 / COSINE) [default IP]: ").strip() or None
-    nprobe_input = input("Enter nprobe (press Enter to use default 10): ").strip()
+    nprobe_input = input("Enter nprobe / ef (press Enter to use the default): ").strip()
     nprobe = int(nprobe_input) if nprobe_input else None
     filter_expr = input("Enter filter expression (optional, e.g., 'id > 1000'): ").strip() or None
 
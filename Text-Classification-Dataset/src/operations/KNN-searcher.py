@@ -1,21 +1,23 @@
 from pymilvus import connections, Collection
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from src.data_ingestion import config
+from src.data_ingestion.milvus_client import search_params
+from src.data_ingestion.embedder import Embedder
 
 class SimilarTextSearcher:
     def __init__(self,
                  milvus_host=config.MILVUS_HOST,
                  milvus_port=config.MILVUS_PORT,
-                 collection_name=config.COLLECTION_NAME,
+                 collection_name=None,
                  embed_model_name=config.EMBED_MODEL_NAME,
                  vector_dim=config.VECTOR_DIM,
                  metric_type=config.METRIC_TYPE,
-                 nprobe=10):
+                 nprobe=None,
+                 embed_backend=None):
         # Milvus connection
         self.milvus_host = milvus_host
         self.milvus_port = milvus_port
-        self.collection_name = collection_name
+        self.collection_name = collection_name or config.COLLECTION_NAME
         self.metric_type = metric_type
         self.nprobe = nprobe
         self.vector_dim = vector_dim
@@ -26,23 +28,25 @@ class SimilarTextSearcher:
         self.collection.load()
 
         # Load embedding model
-        self.model = SentenceTransformer(embed_model_name)
+        # nprobe: search-time parameter of config.INDEX_TYPE (nprobe, or ef
+        # for HNSW; None = config.SEARCH_PARAM or the index's default)
+        # embed_backend: "torch" or "onnx" (default: config.EMBED_BACKEND)
+        self.embedder = Embedder(embed_model_name, backend=embed_backend)
+        self.model = self.embedder.model
 
     def embed_text(self, texts, normalize=True):
-        vectors = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        if normalize:
-            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
-            norms[norms == 0] = 1.0
-            vectors = vectors / norms
-        return vectors
+        return self.embedder.embed_array(texts, normalize=normalize)
 
     def search(self, query_text, top_k=5, nprobe=None):
+        return self.search_vector(self.embed_text([query_text])[0], top_k=top_k, nprobe=nprobe)
+
+    def search_vector(self, query_vector, top_k=5, nprobe=None):
         nprobe = nprobe or self.nprobe
-        query_vector = self.embed_text([query_text])[0].tolist()
+        query_vector = np.ascontiguousarray(query_vector, dtype=np.float32)
         results = self.collection.search(
-            data=[query_vector],
+            data=query_vector[np.newaxis, :],
             anns_field="emb",
-            param={"metric_type": self.metric_type, "params": {"nprobe": nprobe}},
+            param=search_params(config.INDEX_TYPE, self.metric_type, nprobe, top_k),
             limit=top_k,
             output_fields=["id", "text"]
         )
@@ -53,7 +57,7 @@ if __name__ == "__main__":
 
     query_text = input("\nEnter text to get near-similar texts: ")
     top_k = int(input("Enter number of similar texts: "))
-    nprobe = input("Enter nprobe (press Enter to use default 10): ")
+    nprobe = input("Enter nprobe / ef (press Enter to use the default): ")
     nprobe = int(nprobe) if nprobe.strip() else None
 
     results = searcher.search(query_text, top_k=top_k, nprobe=nprobe)
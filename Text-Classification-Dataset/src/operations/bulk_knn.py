@@ -0,0 +1,239 @@
+"""
+bulk_knn.py
+Top-k neighbours of every row of the corpus, streamed to Parquet.
+
+Output columns: id (int64), neighbour_ids (list<int64>), scores (list<float32>),
+best neighbour first; a row is not its own neighbour unless --include-self.
+
+Sources:
+- parquet: the memory-mapped vector store (src/polars_ops/parquet_vectors.py),
+  built from --parquet first if missing. Searched in-process, exactly
+  ("flat") or over the k-means IVF ("ivf"), in query chunks sized to fit
+  --memory-mb, spread over --workers threads (numpy's matrix products
+  release the GIL).
+- milvus: the collection's vectors, paged by id and searched by Milvus
+  itself, --workers requests at a time.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.operations.bulk_knn --source parquet --top-k 10 --output exports/knn_top10.parquet
+python3 -m src.operations.bulk_knn --source parquet --index ivf --nprobe 3 --memory-mb 4096 --workers 4
+python3 -m src.operations.bulk_knn --source milvus --collection texts --top-k 10
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, NamedTuple, Optional
+from src.data_ingestion import config
+from src.data_ingestion.milvus_client import iter_id_pages, search_params
+from src.polars_ops.parquet_vectors import PARQUET_DIR, STORE_DIR
+
+OUTPUT_FILE = "exports/knn.parquet"
+TOP_K = 10
+MEMORY_MB = 2048
+QUERY_CHUNK = 2048      # Queries per chunk (parquet source)
+MILVUS_CHUNK = 2000     # Queries per Milvus search request
+
+class KNNChunk(NamedTuple):
+    ids: np.ndarray            # (n,) query ids
+    neighbour_ids: np.ndarray  # (n, k) int64, -1 where fewer neighbours exist
+    scores: np.ndarray         # (n, k) float32
+
+def plan_block_rows(memory_bytes: int, workers: int, query_chunk: int, dim: int) -> int:
+    """
+    Rows scored per matrix product so that every worker's score matrix,
+    its partition copy and the gathered row block fit the memory budget.
+    """
+    per_worker = memory_bytes // max(workers, 1)
+    return max(1024, int(per_worker // (4 * (2 * query_chunk + dim))))
+
+def _drop_self(query_ids, neighbour_ids, scores, k):
+    """Remove each query's own id from its neighbours, keeping k columns."""
+    is_self = neighbour_ids == query_ids[:, None]
+    # Without a self match the extra (k+1-th) neighbour is the one dropped
+    is_self[~is_self.any(axis=1), -1] = True
+    keep = ~is_self
+    n = len(query_ids)
+    return neighbour_ids[keep].reshape(n, k), scores[keep].reshape(n, k)
+
+def _ordered_map(fn, items: Iterable, workers: int) -> Iterator:
+    """Like executor.map, but with at most 2 * workers results pending in memory."""
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def local_knn_chunks(searcher, top_k: int = TOP_K, query_chunk: int = QUERY_CHUNK,
+                     workers: int = 1, nprobe=None, include_self: bool = False) -> Iterator[KNNChunk]:
+    """All-rows KNN over a LocalKNNSearcher's store, chunk by chunk in row order."""
+    store = searcher.store
+    k = top_k if include_self else top_k + 1
+    metric = searcher.metric_type
+
+    def run(start):
+        queries = np.asarray(store.vectors[start:start + query_chunk])
+        scores, rows = searcher.search_rows(queries, k, nprobe=nprobe)
+        query_ids = np.asarray(store.ids[start:start + len(queries)])
+        neighbour_ids = np.where(rows >= 0, np.asarray(store.ids)[np.maximum(rows, 0)], -1)
+        if metric == "L2":
+            scores = -scores
+        if not include_self:
+            neighbour_ids, scores = _drop_self(query_ids, neighbour_ids, scores, top_k)
+        return KNNChunk(query_ids, neighbour_ids, scores.astype(np.float32, copy=False))
+
+    yield from _ordered_map(run, range(0, len(store), query_chunk), workers)
+
+def milvus_knn_chunks(collection, top_k: int = TOP_K, query_chunk: int = MILVUS_CHUNK,
+                      workers: int = 1, metric_type: str = config.METRIC_TYPE, nprobe: Optional[int] = None,
+                      include_self: bool = False) -> Iterator[KNNChunk]:
+    """
+    All-rows KNN over a loaded Milvus collection, read page by page in id
+    order (milvus_client.iter_id_pages) and searched by Milvus. `nprobe` is
+    config.INDEX_TYPE's search parameter (ef for HNSW), see
+    milvus_client.search_params().
+    """
+    k = top_k if include_self else top_k + 1
+    num_entities = collection.num_entities
+
+    def fetch():
+        read = 0
+        for rows in iter_id_pages(collection, ["id", "emb"]):
+            ids = np.array([r["id"] for r in rows], dtype=np.int64)
+            vectors = np.array([r["emb"] for r in rows], dtype=np.float32)
+            read += len(ids)
+            for s in range(0, len(ids), query_chunk):
+                yield ids[s:s + query_chunk], vectors[s:s + query_chunk]
+        if read != num_entities:
+            print(f"Warning: read {read} rows, but the collection reports {num_entities} entities")
+
+    def run(item):
+        query_ids, vectors = item
+        results = collection.search(
+            data=vectors,
+            anns_field="emb",
+            param=search_params(config.INDEX_TYPE, metric_type, nprobe, k),
+            limit=k
+        )
+        neighbour_ids = np.full((len(query_ids), k), -1, dtype=np.int64)
+        scores = np.full((len(query_ids), k), np.nan, dtype=np.float32)
+        for i, hits in enumerate(results):
+            neighbour_ids[i, :len(hits.ids)] = hits.ids
+            scores[i, :len(hits.distances)] = hits.distances
+        if not include_self:
+            neighbour_ids, scores = _drop_self(query_ids, neighbour_ids, scores, top_k)
+        return KNNChunk(query_ids, neighbour_ids, scores)
+
+    yield from _ordered_map(run, fetch(), workers)
+
+def write_knn_parquet(chunks: Iterable[KNNChunk], output: str, total_rows: int,
+                      compression: str = "zstd") -> int:
+    """
+    Stream KNN chunks into one Parquet file (a row group per chunk),
+    printing progress and throughput. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("neighbour_ids", pa.list_(pa.int64())),
+        ("scores", pa.list_(pa.float32())),
+    ])
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = output + ".tmp"
+    start = time.time()
+    written = 0
+    with pq.ParquetWriter(tmp, schema, compression=compression) as writer:
+        for chunk in chunks:
+            valid = chunk.neighbour_ids >= 0
+            counts = valid.sum(axis=1)
+            offsets = pa.array(np.concatenate([[0], np.cumsum(counts)]).astype(np.int32))
+            table = pa.Table.from_arrays([
+                pa.array(chunk.ids, type=pa.int64()),
+                pa.ListArray.from_arrays(offsets, pa.array(chunk.neighbour_ids[valid])),
+                pa.ListArray.from_arrays(offsets, pa.array(chunk.scores[valid], type=pa.float32())),
+            ], schema=schema)
+            writer.write_table(table)
+
+            written += len(chunk.ids)
+            elapsed = time.time() - start
+            rate = written / elapsed if elapsed else 0.0
+            eta = (total_rows - written) / rate if rate else float("inf")
+            print(f"{written}/{total_rows} rows | {rate:,.0f} rows/s | ETA {eta / 60:.1f} min")
+    os.replace(tmp, output)
+
+    elapsed = time.time() - start
+    print(f"Wrote {written} rows to {output} in {elapsed:.1f}s "
+          f"({written / elapsed if elapsed else 0:,.0f} rows/s)")
+    return written
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Top-k neighbours of every row", parents=[settings])
+    parser.add_argument("--source", choices=("parquet", "milvus"), default="parquet")
+    parser.add_argument("--parquet", type=str, default=PARQUET_DIR,
+                        help="Parquet exports to build the store from if it is missing")
+    parser.add_argument("--store", type=str, default=STORE_DIR, help="Vector store directory")
+    parser.add_argument("--output", type=str, default=OUTPUT_FILE)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--metric", choices=("IP", "L2", "COSINE"), default=config.METRIC_TYPE)
+    parser.add_argument("--index", choices=("flat", "ivf"), default="flat",
+                        help="parquet source: exact or k-means IVF search")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="Clusters (ivf) or the Milvus search parameter (nprobe, ef for HNSW) per query")
+    parser.add_argument("--quantized", choices=("int8", "float16"), default=None,
+                        help="parquet source: coarse scan on quantized vectors, then float32 rerank")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB,
+                        help="Approximate memory budget for scoring (parquet source)")
+    parser.add_argument("--query-chunk", type=int, default=None,
+                        help=f"Queries per chunk (default: {QUERY_CHUNK} parquet, {MILVUS_CHUNK} milvus)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Chunks processed concurrently")
+    parser.add_argument("--include-self", action="store_true",
+                        help="Keep each row among its own neighbours")
+    parser.add_argument("--compression", type=str, default="zstd")
+    args = parser.parse_args()
+
+    if args.source == "parquet":
+        from src.polars_ops.parquet_vectors import build_vector_store
+        from src.operations.local_searcher import LocalKNNSearcher, DEFAULT_NPROBE
+
+        if not os.path.exists(os.path.join(args.store, "store.json")):
+            print(f"Building vector store {args.store} from {args.parquet}...")
+            build_vector_store(args.parquet, args.store)
+        query_chunk = args.query_chunk or QUERY_CHUNK
+        searcher = LocalKNNSearcher(args.store, metric_type=args.metric, index=args.index,
+                                    nprobe=args.nprobe or DEFAULT_NPROBE, quantized=args.quantized)
+        searcher.block_rows = plan_block_rows(args.memory_mb * 1024 ** 2, args.workers,
+                                              query_chunk, searcher.vector_dim)
+        total = len(searcher.store)
+        print(f"{total} rows, {query_chunk} queries x {searcher.block_rows} rows per block, "
+              f"{args.workers} worker(s)")
+        chunks = local_knn_chunks(searcher, args.top_k, query_chunk, args.workers,
+                                  include_self=args.include_self)
+    else:
+        from pymilvus import connections, Collection
+
+        connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+        collection = Collection(config.COLLECTION_NAME)
+        collection.load()
+        total = collection.num_entities
+        print(f"Collection '{config.COLLECTION_NAME}' has {total} vectors.")
+        chunks = milvus_knn_chunks(collection, args.top_k, args.query_chunk or MILVUS_CHUNK,
+                                   args.workers, args.metric, args.nprobe, args.include_self)
+
+    write_knn_parquet(chunks, args.output, total, args.compression)
+
+if __name__ == "__main__":
+    main()
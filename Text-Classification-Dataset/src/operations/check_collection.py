@@ -3,6 +3,7 @@ check_collection.py
 Inspect and query your Milvus text embeddings collection.
 """
 
+import argparse
 import sys
 import os
 sys.path.append(os.getcwd())
@@ -46,4 +47,5 @@ def main():
     show_sample_rows(n=5)
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__, parents=[config.settings_parser()]).parse_args()
     main()
@@ -0,0 +1,335 @@
+"""
+cluster_assigner.py
+Assign k-means cluster ids with the models trained by minibatch_kmeans.py.
+
+ClusterAssigner loads scaler.joblib, incremental_pca.joblib and
+minibatch_kmeans.joblib once and folds the scaler and PCA into a single
+affine map (x @ W + b), so assigning a batch is two matrix products:
+the projection and the distances to every centroid.
+
+The bulk job labels every row of the corpus:
+- --source parquet: the vector store built from the Parquet export
+  (src/polars_ops/parquet_vectors.py), or --source milvus: the collection,
+  paged by id (milvus_client.iter_id_pages).
+- --target parquet: id, cluster_id written to --output, or --target milvus:
+  rows copied with a cluster_id scalar field into --target-collection
+  (default: <collection>_clustered). Milvus cannot add a field to an
+  existing collection or update a scalar in place, so the labelled rows go
+  to a new collection that can replace the original and be filtered with
+  expressions such as "cluster_id == 3". It gets the original's index
+  type, metric and parameters (config's INDEX_TYPE, METRIC_TYPE and
+  INDEX_PARAMS if the original has no index). A target that already
+  holds rows is refused unless --overwrite drops it first. With
+  --partitions, each cluster's rows also go to their own partition
+  (cluster_<id>), so searches can be limited to a few partitions.
+- The job fails if it labelled a different number of rows than the
+  source holds.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.operations.cluster_assigner --text "cheap flights to rome"
+python3 -m src.operations.cluster_assigner label --source parquet --output exports/cluster_ids.parquet
+python3 -m src.operations.cluster_assigner label --source milvus --target milvus --collection texts
+python3 -m src.operations.cluster_assigner label --source parquet --target milvus --partitions --overwrite
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from src.data_ingestion import config, milvus_client
+
+MODEL_DIR = "src/sklearn_models/minibatch_kmeans"
+OUTPUT_FILE = "exports/cluster_ids.parquet"
+STORE_DIR = "exports/vector_store"
+BLOCK_ROWS = 65536       # Rows assigned per matrix product
+
+def cluster_partition(cluster: int) -> str:
+    """Milvus partition holding a cluster's rows (label --partitions)."""
+    return f"cluster_{cluster}"
+
+def load_cluster_model(model_dir: str = MODEL_DIR):
+    """Load the (scaler, pca or None, kmeans) trained by minibatch_kmeans.py."""
+    import joblib
+
+    with open(os.path.join(model_dir, "metadata.json")) as f:
+        metadata = json.load(f)
+    files = metadata["model_files"]
+
+    def load(key):
+        return joblib.load(os.path.join(model_dir, os.path.basename(files[key])))
+
+    pca = load("pca") if metadata.get("use_pca") and files.get("pca") else None
+    return load("scaler"), pca, load("kmeans")
+
+class ClusterAssigner:
+    """Nearest k-means centroid of vectors or texts, with scaler + PCA fused into one affine map."""
+
+    def __init__(self, scaler, pca, kmeans,
+                 embed_model_name: str = config.EMBED_MODEL_NAME,
+                 embed_cache_dir: Optional[str] = config.EMBED_CACHE_DIR):
+        """
+        Args:
+            scaler: Fitted StandardScaler.
+            pca: Fitted (Incremental)PCA, or None.
+            kmeans: Fitted (MiniBatch)KMeans.
+            embed_model_name (str): Model for assign_texts() (loaded on first use).
+        """
+        dim = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(dim)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(dim)
+        # (x - mean) / scale  ==  x @ diag(1 / scale) - mean / scale
+        weight = np.diag(1.0 / scale)
+        bias = -mean / scale
+        if pca is not None:
+            # ((x' - pca.mean_) @ components.T) [/ sqrt(explained_variance) if whitened]
+            weight = weight @ pca.components_.T
+            bias = (bias - pca.mean_) @ pca.components_.T
+            if getattr(pca, "whiten", False):
+                std = np.sqrt(pca.explained_variance_)
+                weight, bias = weight / std, bias / std
+
+        self.weight = np.ascontiguousarray(weight, dtype=np.float32)
+        self.bias = bias.astype(np.float32)
+        self.centers = np.ascontiguousarray(kmeans.cluster_centers_, dtype=np.float32)
+        self.center_sq_norms = np.einsum("ij,ij->i", self.centers, self.centers)
+        self.embed_model_name = embed_model_name
+        self.embed_cache_dir = embed_cache_dir
+        self._embedder = None
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR, **kwargs):
+        """Assigner for the models saved in model_dir."""
+        return cls(*load_cluster_model(model_dir), **kwargs)
+
+    @property
+    def num_clusters(self) -> int:
+        return len(self.centers)
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from src.data_ingestion.embedder import Embedder
+            self._embedder = Embedder(self.embed_model_name, cache_dir=self.embed_cache_dir)
+        return self._embedder
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Map vectors into the space the centroids live in (scaler, then PCA)."""
+        return np.asarray(vectors, dtype=np.float32) @ self.weight + self.bias
+
+    def distances(self, vectors: np.ndarray) -> np.ndarray:
+        """Squared distance of each vector to each centroid, shape (n, num_clusters)."""
+        x = self.transform(vectors)
+        dist = np.einsum("ij,ij->i", x, x)[:, None] - 2 * (x @ self.centers.T) + self.center_sq_norms
+        return np.maximum(dist, 0, out=dist)
+
+    def nearest(self, vectors: np.ndarray, n: int) -> np.ndarray:
+        """The n nearest clusters of each vector, nearest first, shape (len(vectors), n)."""
+        dist = self.distances(vectors)
+        n = min(n, self.num_clusters)
+        if n < self.num_clusters:
+            part = np.argpartition(dist, n - 1, axis=1)[:, :n]
+        else:
+            part = np.broadcast_to(np.arange(n), dist.shape).copy()
+        order = np.argsort(np.take_along_axis(dist, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
+
+    def assign(self, vectors: np.ndarray, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+        """Cluster id (int32) of every vector, block_rows at a time."""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block_rows):
+            block = vectors[start:start + block_rows]
+            labels[start:start + len(block)] = self.distances(block).argmin(axis=1)
+        return labels
+
+    def assign_texts(self, texts: List[str]) -> np.ndarray:
+        """Cluster ids of texts, embedded as at ingestion."""
+        return self.assign(self.embedder.embed_array(texts))
+
+class LabelChunk(NamedTuple):
+    ids: np.ndarray          # (n,) int64
+    vectors: np.ndarray      # (n, dim) float32
+    texts: Optional[list]    # Only read when the target needs them
+
+def store_chunks(store, block_rows: int = BLOCK_ROWS, with_texts: bool = False) -> Iterator[LabelChunk]:
+    """Blocks of a VectorStore, in row order."""
+    for start in range(0, len(store), block_rows):
+        end = min(start + block_rows, len(store))
+        texts = store.texts(range(start, end)) if with_texts else None
+        yield LabelChunk(np.asarray(store.ids[start:end]), np.asarray(store.vectors[start:end]), texts)
+
+def milvus_chunks(collection, page_rows: int = milvus_client.QUERY_LIMIT,
+                  with_texts: bool = False) -> Iterator[LabelChunk]:
+    """Rows of a loaded collection, paged by id in id order."""
+    fields = ["id", "emb", "text"] if with_texts else ["id", "emb"]
+    for rows in milvus_client.iter_id_pages(collection, fields, page_rows):
+        yield LabelChunk(np.array([r["id"] for r in rows], dtype=np.int64),
+                         np.array([r["emb"] for r in rows], dtype=np.float32),
+                         [r["text"] for r in rows] if with_texts else None)
+
+def write_labels_parquet(assigner: ClusterAssigner, chunks: Iterable[LabelChunk], output: str,
+                         total_rows: int, compression: str = "zstd") -> np.ndarray:
+    """
+    Assign and stream (id, cluster_id) to one Parquet file.
+
+    Returns:
+        np.ndarray: Rows per cluster.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("id", pa.int64()), ("cluster_id", pa.int32())])
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = output + ".tmp"
+    counts = np.zeros(assigner.num_clusters, dtype=np.int64)
+    written, start = 0, time.time()
+    with pq.ParquetWriter(tmp, schema, compression=compression) as writer:
+        for chunk in chunks:
+            labels = assigner.assign(chunk.vectors)
+            writer.write_table(pa.Table.from_arrays([pa.array(chunk.ids), pa.array(labels)], schema=schema))
+            counts += np.bincount(labels, minlength=assigner.num_clusters)
+            written += len(labels)
+            print(f"{written}/{total_rows} rows labelled | {written / (time.time() - start):,.0f} rows/s")
+    os.replace(tmp, output)
+    return counts
+
+def write_labels_milvus(assigner: ClusterAssigner, chunks: Iterable[LabelChunk], target,
+                        total_rows: int, partitions: bool = False,
+                        batch_size: int = config.BATCH_SIZE) -> np.ndarray:
+    """
+    Assign and insert (id, text, emb, cluster_id) rows into the target collection
+    (created with milvus_client.create_collection(..., with_cluster_id=True)),
+    optionally into one partition per cluster, at most batch_size rows per insert.
+
+    Returns:
+        np.ndarray: Rows per cluster.
+    """
+    if partitions:
+        for cluster in range(assigner.num_clusters):
+            if not target.has_partition(cluster_partition(cluster)):
+                target.create_partition(cluster_partition(cluster))
+
+    def insert(rows, labels, chunk, partition_name=None):
+        for s in range(0, len(rows), batch_size):
+            batch = rows[s:s + batch_size]
+            target.insert([chunk.ids[batch], [chunk.texts[r] for r in batch], chunk.vectors[batch],
+                           labels[batch]], partition_name=partition_name)
+
+    counts = np.zeros(assigner.num_clusters, dtype=np.int64)
+    written, start = 0, time.time()
+    for chunk in chunks:
+        labels = assigner.assign(chunk.vectors)
+        if partitions:
+            for cluster in np.unique(labels):
+                insert(np.flatnonzero(labels == cluster), labels, chunk, cluster_partition(cluster))
+        else:
+            insert(np.arange(len(labels)), labels, chunk)
+        counts += np.bincount(labels, minlength=assigner.num_clusters)
+        written += len(labels)
+        print(f"{written}/{total_rows} rows labelled | {written / (time.time() - start):,.0f} rows/s")
+    target.flush()
+    return counts
+
+def source_index(collection_name: str) -> dict:
+    """Index type, metric and params of the collection's vector index, or config's if it has none."""
+    from pymilvus import Collection, utility
+
+    if utility.has_collection(collection_name):
+        indexes = Collection(collection_name).indexes
+        if indexes:
+            params = dict(indexes[0].params)
+            return {"index_type": params["index_type"], "metric_type": params.get("metric_type", config.METRIC_TYPE),
+                    "params": params.get("params") or {}}
+    return {"index_type": config.INDEX_TYPE, "metric_type": config.METRIC_TYPE, "params": config.INDEX_PARAMS}
+
+def open_target(name: str, overwrite: bool = False):
+    """
+    The (empty) target collection for label --target milvus. A target that
+    already holds rows is dropped with overwrite, refused otherwise, since
+    inserting again would duplicate every id.
+    """
+    from pymilvus import Collection, utility
+
+    if utility.has_collection(name) and Collection(name).num_entities > 0:
+        if not overwrite:
+            raise RuntimeError(f"Collection '{name}' already holds rows. Use --overwrite to drop and "
+                               f"rewrite it, or pick another --target-collection.")
+        utility.drop_collection(name)
+        print(f"Dropped collection '{name}'")
+    return milvus_client.create_collection(name, dim=config.VECTOR_DIM, with_cluster_id=True)
+
+def label(args):
+    assigner = ClusterAssigner.load(args.model_dir)
+    with_texts = args.target == "milvus"
+    start = time.time()
+
+    if args.source == "parquet":
+        from src.polars_ops.parquet_vectors import VectorStore
+
+        store = VectorStore(args.store)
+        total = len(store)
+        chunks = store_chunks(store, args.block_rows, with_texts)
+    else:
+        from pymilvus import Collection
+
+        milvus_client.connect()
+        collection = Collection(config.COLLECTION_NAME)
+        collection.load()
+        total = collection.num_entities
+        chunks = milvus_chunks(collection, with_texts=with_texts)
+    print(f"Labelling {total} rows with {assigner.num_clusters} clusters...")
+
+    if args.target == "parquet":
+        counts = write_labels_parquet(assigner, chunks, args.output, total, args.compression)
+        print(f"Wrote cluster ids to {args.output}")
+    else:
+        if args.source == "parquet":
+            milvus_client.connect()
+        name = args.target_collection or f"{config.COLLECTION_NAME}_clustered"
+        target = open_target(name, args.overwrite)
+        counts = write_labels_milvus(assigner, chunks, target, total, args.partitions)
+
+    if counts.sum() != total:
+        raise RuntimeError(f"Labelled {counts.sum()} rows, but the source holds {total}")
+    if args.target == "milvus":
+        index = source_index(config.COLLECTION_NAME)
+        milvus_client.create_index(target, index_type=index["index_type"],
+                                   metric_type=index["metric_type"], params=index["params"])
+        print(f"Wrote labelled rows to collection '{name}'")
+
+    print(f"Done in {time.time() - start:.1f}s. Rows per cluster: {counts.tolist()}")
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Assign k-means cluster ids", parents=[settings])
+    parser.add_argument("--model-dir", type=str, default=MODEL_DIR)
+    parser.add_argument("--text", type=str, action="append", help="Text to assign (repeatable)")
+    sub = parser.add_subparsers(dest="command")
+    bulk = sub.add_parser("label", help="Label every row of the corpus")
+    bulk.add_argument("--source", choices=("parquet", "milvus"), default="parquet")
+    bulk.add_argument("--store", type=str, default=STORE_DIR, help="Vector store (--source parquet)")
+    bulk.add_argument("--target", choices=("parquet", "milvus"), default="parquet")
+    bulk.add_argument("--output", type=str, default=OUTPUT_FILE, help="Output file (--target parquet)")
+    bulk.add_argument("--target-collection", type=str, default=None,
+                      help="Collection to write (--target milvus; default: <collection>_clustered)")
+    bulk.add_argument("--partitions", action="store_true",
+                      help="--target milvus: one partition per cluster")
+    bulk.add_argument("--overwrite", action="store_true",
+                      help="--target milvus: drop the target collection if it already holds rows")
+    bulk.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    bulk.add_argument("--compression", type=str, default="zstd")
+    args = parser.parse_args()
+
+    if args.command == "label":
+        label(args)
+    elif args.text:
+        assigner = ClusterAssigner.load(args.model_dir)
+        for text, cluster in zip(args.text, assigner.assign_texts(args.text)):
+            print(f"{cluster}\t{text}")
+    else:
+        parser.error("pass --text or the 'label' command")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+knn_service.py
+Resident KNN search service on top of AdvancedKNNSearcher.
+
+Keeps the embedding model and the Milvus collection loaded, and coalesces
+queries arriving within a short window into one encode call plus one
+collection.search per (metric, nprobe, filter) group.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.operations.knn_service --collection texts --port 8765
+python3 -m src.operations.knn_service --unix-socket /tmp/knn.sock
+
+curl -s localhost:8765/search -d '{"query": "cheap flights", "top_k": 5}'
+curl -s localhost:8765/search -d '{"queries": ["a", "b"], "filter": "id > 1000"}'
+curl -s localhost:8765/metrics
+curl -s --unix-socket /tmp/knn.sock http://localhost/metrics
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+from src.data_ingestion import config
+
+WINDOW_MS = 5.0         # How long the first query of a batch waits for others
+MAX_BATCH = 256         # Queries per encode/search round
+METRICS_WINDOW = 10000  # Latest requests/batches kept for percentiles
+
+class _Query(NamedTuple):
+    text: str
+    top_k: int
+    metric_type: Optional[str]
+    nprobe: Optional[int]
+    filter_expr: Optional[str]
+    future: asyncio.Future
+
+def _hit_to_dict(hit) -> dict:
+    return {"id": hit.id, "score": float(hit.score), "text": hit.entity.get("text")}
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p99": None, "max": None}
+    arr = np.fromiter(values, dtype=np.float64, count=len(values))
+    p50, p99 = np.percentile(arr, [50, 99])
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3), "max": round(float(arr.max()), 3)}
+
+class ServiceMetrics:
+    """Request latency and batch size statistics over the latest requests."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.started = time.time()
+        self.requests = 0
+        self.queries = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies_ms = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.encode_ms = deque(maxlen=window)
+        self.search_ms = deque(maxlen=window)
+
+    def record_request(self, num_queries: int, latency_s: float):
+        self.requests += 1
+        self.queries += num_queries
+        self.latencies_ms.append(latency_s * 1000)
+
+    def record_batch(self, size: int, encode_s: float, search_s: float):
+        self.batches += 1
+        self.batch_sizes.append(size)
+        self.encode_ms.append(encode_s * 1000)
+        self.search_ms.append(search_s * 1000)
+
+    def snapshot(self) -> dict:
+        sizes = list(self.batch_sizes)
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "queries": self.queries,
+            "batches": self.batches,
+            "errors": self.errors,
+            "latency_ms": _percentiles(self.latencies_ms),
+            "encode_ms": _percentiles(self.encode_ms),
+            "search_ms": _percentiles(self.search_ms),
+            "batch_size": {
+                "mean": round(sum(sizes) / len(sizes), 2) if sizes else None,
+                **_percentiles(sizes),
+            },
+        }
+
+class QueryBatcher:
+    """
+    Coalesces concurrent queries into batched searches.
+
+    The first query to arrive opens a window of `window_ms`; every query
+    arriving meanwhile (up to `max_batch`) joins the batch. A batch is
+    embedded with one encode call (identical texts once), then searched
+    with one collection.search per (metric, nprobe, filter) group, using
+    the group's largest top_k. Batches run one at a time in a worker
+    thread, so queries arriving during a search form the next batch.
+    """
+
+    def __init__(self, searcher, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH,
+                 metrics: Optional[ServiceMetrics] = None):
+        self.searcher = searcher
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.metrics = metrics or ServiceMetrics()
+        self._pending: List[_Query] = []
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="knn-search")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown()
+
+    async def search(self, text: str, top_k: int = 5, metric_type: Optional[str] = None,
+                     nprobe: Optional[int] = None, filter_expr: Optional[str] = None) -> List[dict]:
+        """Queue one query and wait for its hits."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Query(text, top_k, metric_type, nprobe, filter_expr, future))
+        self._arrived.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+            if not self._pending:
+                self._arrived.clear()
+
+            try:
+                results = await loop.run_in_executor(self._executor, self._search_batch, batch)
+            except Exception as e:
+                self.metrics.errors += 1
+                for q in batch:
+                    if not q.future.done():
+                        q.future.set_exception(e)
+                continue
+            for q, hits in zip(batch, results):
+                if not q.future.done():
+                    q.future.set_result(hits)
+
+    def _search_batch(self, batch: List[_Query]) -> List[List[dict]]:
+        """Embed and search one batch (worker thread); hits per query, in order."""
+        start = time.perf_counter()
+        texts = list(dict.fromkeys(q.text for q in batch))
+        row_of = {t: i for i, t in enumerate(texts)}
+        vectors = self.searcher.embed_text(texts)
+        encoded = time.perf_counter()
+
+        groups = {}
+        for i, q in enumerate(batch):
+            groups.setdefault((q.metric_type, q.nprobe, q.filter_expr), []).append(i)
+
+        results = [None] * len(batch)
+        for (metric_type, nprobe, filter_expr), members in groups.items():
+            rows = [row_of[batch[i].text] for i in members]
+            hits = self.searcher.search_vectors(
+                vectors[rows],
+                top_k=max(batch[i].top_k for i in members),
+                metric_type=metric_type,
+                nprobe=nprobe,
+                filter_expr=filter_expr
+            )
+            for i, query_hits in zip(members, hits):
+                results[i] = [_hit_to_dict(h) for h in list(query_hits)[:batch[i].top_k]]
+
+        self.metrics.record_batch(len(batch), encoded - start, time.perf_counter() - encoded)
+        return results
+
+class KNNService:
+    """
+    Minimal HTTP/1.1 front end (TCP or Unix socket) for a QueryBatcher.
+
+    Endpoints:
+        POST /search   {"query": str} or {"queries": [str]}, plus optional
+                       "top_k", "metric_type", "nprobe", "filter"
+        GET  /metrics  latency/batch-size statistics (and searcher caches)
+        POST /invalidate  drop the searcher's cached results
+        GET  /health
+    """
+
+    MAX_BODY_BYTES = 1024 * 1024
+
+    def __init__(self, batcher: QueryBatcher):
+        self.batcher = batcher
+        self.searcher = batcher.searcher
+        self.metrics = batcher.metrics
+
+    async def handle_search(self, payload: dict) -> dict:
+        start = time.perf_counter()
+        queries = payload.get("queries")
+        if queries is None:
+            queries = [payload["query"]]
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            raise ValueError("'queries' must be a list of strings")
+        params = dict(
+            top_k=int(payload.get("top_k", 5)),
+            metric_type=payload.get("metric_type"),
+            nprobe=payload.get("nprobe"),
+            filter_expr=payload.get("filter")
+        )
+        results = await asyncio.gather(*(self.batcher.search(q, **params) for q in queries))
+        self.metrics.record_request(len(queries), time.perf_counter() - start)
+        return {"results": [{"query": q, "hits": hits} for q, hits in zip(queries, results)]}
+
+    async def _route(self, method: str, path: str, body: bytes):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            snapshot = self.metrics.snapshot()
+            if hasattr(self.searcher, "cache_stats"):
+                snapshot["caches"] = self.searcher.cache_stats()
+            return 200, snapshot
+        if method == "POST" and path == "/invalidate" and hasattr(self.searcher, "invalidate_results"):
+            self.searcher.invalidate_results()
+            return 200, {"status": "invalidated"}
+        if method == "POST" and path == "/search":
+            try:
+                payload = json.loads(body or b"{}")
+                return 200, await self.handle_search(payload)
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": f"bad request: {e}"}
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.MAX_BODY_BYTES:
+                    status, response = 413, {"error": "request body too large"}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, response = await self._route(method, path.split("?")[0], body)
+                    except Exception as e:
+                        status, response = 500, {"error": repr(e)}
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(response).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(searcher, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Optional[str] = None,
+                window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+    """Run the service until cancelled."""
+    batcher = QueryBatcher(searcher, window_ms, max_batch)
+    batcher.start()
+    service = KNNService(batcher)
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle_connection, path=unix_socket)
+        print(f"KNN service listening on unix socket {unix_socket}")
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        print(f"KNN service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.close()
+
+def load_searcher(**kwargs):
+    """Build an AdvancedKNNSearcher (the module name has a hyphen, so import it by name)."""
+    module = importlib.import_module("src.operations.KNN-searcher-adv")
+    return module.AdvancedKNNSearcher(**kwargs)
+
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Resident KNN search service", parents=[settings])
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", type=str, default=None,
+                        help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--window-ms", type=float, default=WINDOW_MS,
+                        help=f"Query coalescing window in ms (default: {WINDOW_MS})")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help=f"Max queries per batched search (default: {MAX_BATCH})")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="nprobe / ef (default: config.SEARCH_PARAM, then the per-index default)")
+    parser.add_argument("--embed-cache", type=str, default=config.EMBED_CACHE_DIR,
+                        help="Persistent embedding cache directory (default: disabled)")
+    args = parser.parse_args()
+
+    print("Loading model and collection...")
+    searcher = load_searcher(nprobe=args.nprobe, embed_cache_dir=args.embed_cache)
+    try:
+        asyncio.run(serve(searcher, args.host, args.port, args.unix_socket,
+                          args.window_ms, args.max_batch))
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""
+local_searcher.py
+KNN search over the exported Parquet vectors, in-process, without Milvus.
+
+Works on a memory-mapped vector store (src/polars_ops/parquet_vectors.py)
+with the same search()/search_vectors() interface as AdvancedKNNSearcher:
+
+- "flat": exact top-k, scoring blocks of rows with one matrix product each.
+- "ivf": approximate; rows are grouped by the MiniBatchKMeans cluster they
+  fall in (src/sklearn_models/minibatch_kmeans/), and a query only scans
+  the `nprobe` clusters whose centroids are closest to it.
+
+Either index can scan int8 / float16 copies of the vectors instead
+(quantized="int8", built by src/polars_ops/quantize.py if missing or
+made from other rows than the store's): the
+coarse scan keeps top_k * rerank candidates, which are then rescored on
+the float32 vectors, so only the candidates' float32 rows are read.
+
+Filters support conditions on id joined by "and":
+id > 10, id <= 500, id == 3, id != 3, id in [1, 2, 3], id not in [4, 5].
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.polars_ops.parquet_vectors --parquet exports/parquet
+python3 -m src.operations.local_searcher build-ivf
+python3 -m src.operations.local_searcher search --query "cheap flights" --top-k 5
+python3 -m src.operations.local_searcher search --query "cheap flights" --index ivf --nprobe 3 --filter "id > 1000"
+python3 -m src.operations.local_searcher search --query "cheap flights" --quantized int8 --rerank 4
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+from typing import List, NamedTuple, Optional
+from src.data_ingestion import config
+from src.polars_ops.parquet_vectors import VectorStore, STORE_DIR
+from src.polars_ops.quantize import (
+    load_quantizer, quantize_store, quantized_vectors_path, store_metadata_path,
+    store_quantization_is_current, DTYPES,
+)
+from src.operations.cluster_assigner import ClusterAssigner, MODEL_DIR
+
+IVF_FILE = "ivf.npz"
+BLOCK_ROWS = 65536   # Rows scored per matrix product
+DEFAULT_NPROBE = 3   # Clusters scanned per query by the IVF index
+RERANK_FACTOR = 4    # Quantized search: candidates rescored in float32 per result
+QUANTIZED_BLOCK_ROWS = 16384  # Smaller blocks keep the per-block float32 conversion in cache
+METRIC_TYPES = ("IP", "L2", "COSINE")
+
+class LocalHit(NamedTuple):
+    """One search hit, with the attributes of a Milvus hit used in this repo."""
+    id: int
+    score: float
+    text: str
+
+    @property
+    def entity(self) -> dict:
+        return {"id": self.id, "text": self.text}
+
+_CLAUSE = re.compile(r"^\s*id\s*(==|!=|>=|<=|>|<|not\s+in|in)\s*(.+?)\s*$", re.IGNORECASE)
+
+def parse_id_filter(expr: Optional[str], ids: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Evaluate a filter expression on id into a boolean mask over the rows
+    (None = no filter). Raises ValueError for anything else.
+    """
+    if not expr or not expr.strip():
+        return None
+    mask = np.ones(len(ids), dtype=bool)
+    for clause in re.split(r"\s+and\s+", expr.strip(), flags=re.IGNORECASE):
+        match = _CLAUSE.match(clause)
+        if not match:
+            raise ValueError(f"Unsupported filter clause '{clause}' (only conditions on id)")
+        op, value = re.sub(r"\s+", " ", match.group(1).lower()), match.group(2)
+        if op in ("in", "not in"):
+            values = json.loads(value)
+            if not isinstance(values, list):
+                raise ValueError(f"Expected a list after '{op}' in '{clause}'")
+            cond = np.isin(ids, np.asarray(values, dtype=np.int64))
+            mask &= cond if op == "in" else ~cond
+            continue
+        n = int(value)
+        if op == "==":
+            mask &= ids == n
+        elif op == "!=":
+            mask &= ids != n
+        elif op == ">":
+            mask &= ids > n
+        elif op == ">=":
+            mask &= ids >= n
+        elif op == "<":
+            mask &= ids < n
+        else:
+            mask &= ids <= n
+    return mask
+
+class TopK:
+    """Running top-k (largest scores) of each query over scored row blocks."""
+
+    def __init__(self, num_queries: int, k: int):
+        self.k = k
+        self.scores = np.full((num_queries, k), -np.inf, dtype=np.float32)
+        self.rows = np.full((num_queries, k), -1, dtype=np.int64)
+
+    def push(self, scores: np.ndarray, rows: np.ndarray, queries=slice(None)):
+        """
+        Merge a block of scores of shape (len(queries), len(rows)) into the
+        top-k of the given queries.
+        """
+        k = self.k
+        if scores.shape[1] > k:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, part, axis=1)
+            cand_rows = rows[part]
+        else:
+            cand_rows = np.broadcast_to(rows, scores.shape)
+        all_scores = np.concatenate([self.scores[queries], scores], axis=1)
+        all_rows = np.concatenate([self.rows[queries], cand_rows], axis=1)
+        part = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        self.scores[queries] = np.take_along_axis(all_scores, part, axis=1)
+        self.rows[queries] = np.take_along_axis(all_rows, part, axis=1)
+
+    def result(self):
+        """(scores, rows) sorted best first; rows are -1 where fewer than k were found."""
+        order = np.argsort(-self.scores, axis=1, kind="stable")
+        return np.take_along_axis(self.scores, order, axis=1), np.take_along_axis(self.rows, order, axis=1)
+
+def score_block(block: np.ndarray, queries: np.ndarray, metric_type: str,
+                block_sq_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Scores of shape (len(queries), len(block)), larger = closer: inner
+    product, cosine similarity, or the negated squared L2 distance.
+    """
+    dots = queries @ block.T
+    if metric_type == "IP":
+        return dots
+    if block_sq_norms is None:
+        block_sq_norms = np.einsum("ij,ij->i", block, block)
+    q_sq_norms = np.einsum("ij,ij->i", queries, queries)
+    return scores_from_dots(dots, metric_type, q_sq_norms[:, None], block_sq_norms[None, :])
+
+def scores_from_dots(dots: np.ndarray, metric_type: str, q_sq_norms=None, row_sq_norms=None) -> np.ndarray:
+    """score_block() from precomputed dot products; the norms must broadcast against dots."""
+    if metric_type == "IP":
+        return dots
+    if metric_type == "L2":
+        return 2 * dots - row_sq_norms - q_sq_norms
+    if metric_type == "COSINE":
+        return dots / np.maximum(np.sqrt(q_sq_norms) * np.sqrt(row_sq_norms), 1e-12)
+    raise ValueError(f"Unknown metric type '{metric_type}', expected one of {METRIC_TYPES}")
+
+class QuantizedVectors:
+    """int8 / float16 copy of a store's vectors (src/polars_ops/quantize.py), for coarse scoring."""
+
+    def __init__(self, store_dir: str, dtype: str):
+        self.dtype = dtype
+        self.quantizer = load_quantizer(store_metadata_path(store_dir, dtype))
+        self.codes = np.load(quantized_vectors_path(store_dir, dtype), mmap_mode="r")
+        self._sq_norms = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def sq_norms(self, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+        """Squared norms of the decoded vectors (computed once)."""
+        if self._sq_norms is None:
+            norms = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), block_rows):
+                block = self.quantizer.decode(self.codes[start:start + block_rows])
+                norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+            self._sq_norms = norms
+        return self._sq_norms
+
+    def dots(self, rows_or_slice, scaled: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Dot products of decoded rows with queries, from ScalarQuantizer.query_terms()."""
+        codes = self.codes[rows_or_slice].astype(np.float32)
+        return scaled @ codes.T + offsets[:, None]
+
+class IVFIndex:
+    """
+    Inverted file over a VectorStore: rows grouped by k-means cluster.
+
+    Saved as <store>/ivf.npz: `order` (row numbers sorted by cluster),
+    `offsets` (start of each cluster in `order`), `assignments` and the
+    store's fingerprint; load() rebuilds an index made for other rows.
+    """
+
+    def __init__(self, order, offsets, assignments, assigner: ClusterAssigner):
+        self.order = order
+        self.offsets = offsets
+        self.assignments = assignments
+        self.assigner = assigner
+
+    @property
+    def num_clusters(self) -> int:
+        return len(self.offsets) - 1
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Map vectors into the space the k-means centroids live in."""
+        return self.assigner.transform(vectors)
+
+    @classmethod
+    def build(cls, store: VectorStore, model_dir: str = MODEL_DIR, block_rows: int = BLOCK_ROWS):
+        assigner = ClusterAssigner.load(model_dir)
+        index = cls(None, None, None, assigner)
+        assignments = np.empty(len(store), dtype=np.int32)
+        for start in range(0, len(store), block_rows):
+            block = np.asarray(store.vectors[start:start + block_rows])
+            assignments[start:start + len(block)] = assigner.assign(block)
+        index.assignments = assignments
+        index.order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=assigner.num_clusters)
+        index.offsets = np.concatenate([[0], np.cumsum(counts)])
+        np.savez(os.path.join(store.store_dir, IVF_FILE),
+                 order=index.order, offsets=index.offsets, assignments=assignments,
+                 model_dir=np.array(model_dir), store=np.array(store.fingerprint))
+        return index
+
+    @classmethod
+    def load(cls, store: VectorStore, model_dir: Optional[str] = None, block_rows: int = BLOCK_ROWS):
+        data = np.load(os.path.join(store.store_dir, IVF_FILE))
+        model_dir = model_dir or str(data["model_dir"])
+        stale = (len(data["assignments"]) != len(store)
+                 or ("store" in data and str(data["store"]) != store.fingerprint))
+        if stale:
+            print(f"IVF index in {store.store_dir} was built for other rows, rebuilding...")
+            return cls.build(store, model_dir, block_rows)
+        return cls(data["order"], data["offsets"], data["assignments"], ClusterAssigner.load(model_dir))
+
+    def cluster_rows(self, cluster: int) -> np.ndarray:
+        return self.order[self.offsets[cluster]:self.offsets[cluster + 1]]
+
+    def probe(self, vectors: np.ndarray, nprobe: int) -> np.ndarray:
+        """The `nprobe` clusters nearest to each query, shape (n_queries, nprobe)."""
+        return self.assigner.nearest(vectors, nprobe)
+
+class LocalKNNSearcher:
+    def __init__(self,
+                 store_dir: str = STORE_DIR,
+                 embed_model_name: str = config.EMBED_MODEL_NAME,
+                 metric_type: str = config.METRIC_TYPE,
+                 nprobe: int = DEFAULT_NPROBE,
+                 index: str = "flat",
+                 model_dir: str = MODEL_DIR,
+                 block_rows: int = BLOCK_ROWS,
+                 embed_cache_dir: Optional[str] = config.EMBED_CACHE_DIR,
+                 quantized: Optional[str] = None,
+                 rerank: int = RERANK_FACTOR):
+        """
+        Args:
+            store_dir (str): Vector store built by parquet_vectors.py.
+            embed_model_name (str): Model for search() (loaded on first use).
+            metric_type (str): Default metric, "IP", "L2" or "COSINE".
+            nprobe (int): Default clusters scanned per query ("ivf" only).
+            index (str): "flat" (exact) or "ivf" (builds <store>/ivf.npz
+                from the k-means model in model_dir if missing).
+            block_rows (int): Rows scored per matrix product; the score
+                matrix takes block_rows * n_queries * 4 bytes.
+            quantized (str): None (scan float32), "int8" or "float16"
+                (scan quantized vectors, built if missing, then rerank).
+            rerank (int): Quantized scans keep top_k * rerank candidates
+                for the exact float32 rescoring.
+        """
+        self.store = VectorStore(store_dir)
+        self.embed_model_name = embed_model_name
+        self.embed_cache_dir = embed_cache_dir
+        self.metric_type = metric_type
+        self.nprobe = nprobe
+        self.block_rows = block_rows
+        self.vector_dim = self.store.dim
+        self._embedder = None
+
+        if index == "ivf":
+            if os.path.exists(os.path.join(store_dir, IVF_FILE)):
+                self.ivf = IVFIndex.load(self.store, model_dir, block_rows)
+            else:
+                print(f"Building IVF index from {model_dir}...")
+                self.ivf = IVFIndex.build(self.store, model_dir, block_rows)
+        elif index == "flat":
+            self.ivf = None
+        else:
+            raise ValueError(f"Unknown index '{index}', expected 'flat' or 'ivf'")
+
+        self.rerank = rerank
+        if quantized is None:
+            self.quantized = None
+        elif quantized in DTYPES:
+            if not store_quantization_is_current(self.store, quantized):
+                print(f"Quantizing {store_dir} to {quantized}...")
+                quantize_store(store_dir, quantized)
+            self.quantized = QuantizedVectors(store_dir, quantized)
+        else:
+            raise ValueError(f"Unknown quantization '{quantized}', expected one of {DTYPES}")
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from src.data_ingestion.embedder import Embedder
+            self._embedder = Embedder(self.embed_model_name, cache_dir=self.embed_cache_dir)
+        return self._embedder
+
+    def embed_text(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """Embed texts into a C-contiguous float32 array."""
+        return self.embedder.embed_array(texts, normalize=normalize)
+
+    def search(self,
+               query_texts: List[str],
+               top_k: int = 5,
+               metric_type: Optional[str] = None,
+               nprobe: Optional[int] = None,
+               filter_expr: Optional[str] = None) -> List[List[LocalHit]]:
+        """
+        KNN search, as AdvancedKNNSearcher.search().
+
+        Parameters:
+            query_texts: List of query strings
+            top_k: Number of top similar results to return
+            metric_type: Optional metric override ('IP', 'L2', 'COSINE')
+            nprobe: Optional override of the clusters scanned ("ivf" index)
+            filter_expr: Optional filter on id (e.g., "id > 1000")
+        """
+        vectors = self.embed_text(query_texts)
+        return self.search_vectors(vectors, top_k=top_k, metric_type=metric_type,
+                                   nprobe=nprobe, filter_expr=filter_expr)
+
+    def search_vectors(self,
+                       vectors: np.ndarray,
+                       top_k: int = 5,
+                       metric_type: Optional[str] = None,
+                       nprobe: Optional[int] = None,
+                       filter_expr: Optional[str] = None) -> List[List[LocalHit]]:
+        """
+        KNN search with precomputed query vectors.
+
+        Scores are inner products (IP), cosine similarities (COSINE) or
+        squared L2 distances (L2, smaller = closer), as Milvus reports them.
+        """
+        scores, rows = self.search_rows(vectors, top_k, metric_type, nprobe, filter_expr)
+        metric_type = metric_type or self.metric_type
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            found = query_rows >= 0
+            query_rows, query_scores = query_rows[found], query_scores[found]
+            if metric_type == "L2":
+                query_scores = -query_scores
+            ids = self.store.ids[query_rows]
+            results.append([LocalHit(int(i), float(s), self.store.text(r))
+                            for i, s, r in zip(ids, query_scores, query_rows)])
+        return results
+
+    def search_rows(self, vectors: np.ndarray, top_k: int = 5,
+                    metric_type: Optional[str] = None, nprobe: Optional[int] = None,
+                    filter_expr: Optional[str] = None):
+        """
+        Core search returning (scores, rows) arrays of shape (n_queries, top_k),
+        best first, scores larger = closer; rows are -1 where fewer matched.
+        """
+        metric_type = metric_type or self.metric_type
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        mask = parse_id_filter(filter_expr, np.asarray(self.store.ids))
+        coarse = self.quantized
+        if coarse is None:
+            sq_norms = self.store.sq_norms() if metric_type != "IP" else None
+            top = TopK(len(vectors), top_k)
+        else:
+            sq_norms = coarse.sq_norms() if metric_type != "IP" else None
+            scaled, offsets = coarse.quantizer.query_terms(vectors)
+            q_sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+            top = TopK(len(vectors), top_k * max(self.rerank, 1))
+        block_rows = self.block_rows if coarse is None else min(self.block_rows, QUANTIZED_BLOCK_ROWS)
+
+        def scan(rows_or_slice, queries=slice(None)):
+            if isinstance(rows_or_slice, slice):
+                rows = np.arange(rows_or_slice.start, rows_or_slice.stop)
+            else:
+                rows = rows_or_slice
+            if not len(rows):
+                return
+            block_norms = sq_norms[rows] if sq_norms is not None else None
+            if coarse is None:
+                block = self.store.vectors[rows_or_slice]
+                top.push(score_block(block, vectors[queries], metric_type, block_norms), rows, queries)
+                return
+            dots = coarse.dots(rows_or_slice, scaled[queries], offsets[queries])
+            norms = (q_sq_norms[queries][:, None], block_norms[None, :]) if sq_norms is not None else ()
+            top.push(scores_from_dots(dots, metric_type, *norms), rows, queries)
+
+        if self.ivf is None:
+            for start in range(0, len(self.store), block_rows):
+                block_slice = slice(start, min(start + block_rows, len(self.store)))
+                if mask is None:
+                    scan(block_slice)
+                else:
+                    scan(np.flatnonzero(mask[block_slice]) + start)
+        else:
+            probes = self.ivf.probe(vectors, nprobe or self.nprobe)
+            for cluster in np.unique(probes):
+                queries = np.flatnonzero((probes == cluster).any(axis=1))
+                cluster_rows = self.ivf.cluster_rows(cluster)
+                if mask is not None:
+                    cluster_rows = cluster_rows[mask[cluster_rows]]
+                for start in range(0, len(cluster_rows), block_rows):
+                    scan(cluster_rows[start:start + block_rows], queries)
+        if coarse is None:
+            return top.result()
+        return self._rerank(vectors, top.result()[1], top_k, metric_type)
+
+    def _rerank(self, vectors: np.ndarray, candidates: np.ndarray, top_k: int, metric_type: str):
+        """Rescore candidate rows (n_queries, n_candidates) on the float32 vectors; keep top_k."""
+        valid = candidates >= 0
+        unique_rows, inverse = np.unique(candidates[valid], return_inverse=True)
+        exact = np.asarray(self.store.vectors[unique_rows])[inverse]
+        queries = vectors[np.nonzero(valid)[0]]
+        dots = np.einsum("ij,ij->i", exact, queries)
+        scores = np.full(candidates.shape, -np.inf, dtype=np.float32)
+        if metric_type == "IP":
+            scores[valid] = dots
+        else:
+            scores[valid] = scores_from_dots(dots, metric_type, np.einsum("ij,ij->i", queries, queries),
+                                             np.einsum("ij,ij->i", exact, exact))
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.where(np.isfinite(scores), np.take_along_axis(candidates, order, axis=1), -1)
+        return scores, rows
+
+def main():
+    parser = argparse.ArgumentParser(description="KNN search over the exported Parquet vectors")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build-ivf", help="Group the store's rows by k-means cluster")
+    build.add_argument("--store", type=str, default=STORE_DIR)
+    build.add_argument("--model-dir", type=str, default=MODEL_DIR)
+
+    search = sub.add_parser("search", help="Search the store")
+    search.add_argument("--store", type=str, default=STORE_DIR)
+    search.add_argument("--query", type=str, action="append", required=True,
+                        help="Query text (repeat for several)")
+    search.add_argument("--top-k", type=int, default=5)
+    search.add_argument("--metric", choices=METRIC_TYPES, default=config.METRIC_TYPE)
+    search.add_argument("--index", choices=("flat", "ivf"), default="flat")
+    search.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    search.add_argument("--filter", type=str, default=None, help="e.g. 'id > 1000'")
+    search.add_argument("--quantized", choices=DTYPES, default=None,
+                        help="Coarse scan on quantized vectors, then float32 rerank")
+    search.add_argument("--rerank", type=int, default=RERANK_FACTOR,
+                        help="Candidates rescored per result (--quantized)")
+    args = parser.parse_args()
+
+    if args.command == "build-ivf":
+        store = VectorStore(args.store)
+        start = time.time()
+        index = IVFIndex.build(store, args.model_dir)
+        sizes = np.diff(index.offsets).tolist()
+        print(f"IVF index with {index.num_clusters} clusters built in {time.time() - start:.1f}s: {sizes}")
+        return
+
+    searcher = LocalKNNSearcher(args.store, metric_type=args.metric, nprobe=args.nprobe, index=args.index,
+                                quantized=args.quantized, rerank=args.rerank)
+    start = time.time()
+    results = searcher.search(args.query, top_k=args.top_k, filter_expr=args.filter)
+    print(f"Searched {len(searcher.store)} vectors in {time.time() - start:.3f}s")
+    for query, hits in zip(args.query, results):
+        print(f"\nQuery: {query}")
+        for hit in hits:
+            print(f"ID: {hit.id} | Score: {hit.score:.4f} | Text: {hit.text}")
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,40 @@
 Incremental MiniBatchKMeans clustering on Milvus vector data using scikit-learn.
 Supports batch loading from Milvus and optional batch PCA.
 Saves trained models and metadata to src/sklearn_models/minibatch_kmeans/
+
+Training makes two passes over the vectors (scaler + PCA, then k-means).
+Where the passes read from (--source):
+- milvus: page through Milvus by id on both passes.
+- cache:  page through Milvus once into a memory-mapped float32 .npy
+          (--cache, reused on later runs while the collection's entity
+          count is unchanged, unless --refresh-cache), then run both
+          passes from it.
+- store:  read the vector store built from the Parquet export
+          (src/polars_ops/parquet_vectors.py); no Milvus needed.
+With --prefetch N the next N batches are loaded on a background thread
+while the current one is fitted.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.operations.minibatch_kmeans --collection texts
+python3 -m src.operations.minibatch_kmeans --source cache --cache exports/kmeans_vectors.npy
+python3 -m src.operations.minibatch_kmeans --source store --store exports/vector_store --prefetch 2
 """
 
+import argparse
 import os
 import joblib
 import json
 import time
 import numpy as np
-from pymilvus import connections, Collection
 from src.data_ingestion import config
+from src.data_ingestion.milvus_client import iter_id_pages
+from src.data_ingestion.utils import prefetch
 from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import IncrementalPCA
 
-# Settings
-VECTOR_COLLECTION_NAME = config.COLLECTION_NAME
+# Settings (the collection comes from config.COLLECTION_NAME)
 MODEL_DIR = "src/sklearn_models/minibatch_kmeans"
 MODEL_FILE = os.path.join(MODEL_DIR, "minibatch_kmeans.joblib")
 PCA_FILE = os.path.join(MODEL_DIR, "incremental_pca.joblib")
@@ -29,6 +48,12 @@ USE_PCA = True            # Set False to skip PCA
 PCA_COMPONENTS = 128      # Dimensionality after PCA
 VERBOSE = True
 
+SOURCES = ("milvus", "cache", "store")
+VECTOR_CACHE = "exports/kmeans_vectors.npy"
+STORE_DIR = "exports/vector_store"
+PARQUET_DIR = "exports/parquet"
+PREFETCH = 1              # Batches loaded ahead on a background thread
+
 def log(msg):
     if VERBOSE:
         print(msg)
@@ -40,55 +65,226 @@ def ensure_model_dir():
     os.makedirs(MODEL_DIR, exist_ok=True)
     return True
 
-def load_vectors_batch(col, start_id, end_id):
-    """Load a batch of vectors from Milvus collection by id range."""
-    expr = f"id >= {start_id} and id <= {end_id}"
-    results = col.query(expr=expr, output_fields=["emb"])
-    batch_vectors = [r["emb"] for r in results]
-    return np.array(batch_vectors)
+def milvus_batches(col, batch_size=BATCH_SIZE):
+    """
+    Yield batches of batch_size vectors (the last one shorter) in id order,
+    paged from Milvus by id so that gaps in the id space lose no rows.
+    """
+    pages, buffered = [], 0
+    for rows in iter_id_pages(col, ["emb"]):
+        pages.append(np.asarray([r["emb"] for r in rows], dtype=np.float32))
+        buffered += len(rows)
+        if buffered >= batch_size:
+            vectors = np.concatenate(pages)
+            for start in range(0, len(vectors) - batch_size + 1, batch_size):
+                yield vectors[start:start + batch_size]
+            rest = vectors[len(vectors) - len(vectors) % batch_size:]
+            pages, buffered = [rest], len(rest)
+    if buffered:
+        yield np.concatenate(pages)
 
-def main():
-    if not ensure_model_dir():
-        return
+def array_batches(vectors, batch_size=BATCH_SIZE):
+    """Yield float32 batches of a (memory-mapped) (n, dim) array."""
+    for start in range(0, len(vectors), batch_size):
+        yield np.asarray(vectors[start:start + batch_size], dtype=np.float32)
 
-    log("Connecting to Milvus...")
-    connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-    col = Collection(VECTOR_COLLECTION_NAME)
-    col.load()
-    num_entities = col.num_entities
-    log(f"Collection '{VECTOR_COLLECTION_NAME}' has {num_entities} vectors.")
+def _cache_info_path(path):
+    return path + ".json"
 
-    scaler = StandardScaler()
-    pca = IncrementalPCA(n_components=PCA_COMPONENTS) if USE_PCA else None
-    kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=BATCH_SIZE, random_state=42, verbose=1)
+def load_cached_vectors(path, collection_name, num_entities):
+    """
+    The vector cache at `path`, memory-mapped, or None if it is missing or
+    was fetched from another collection or a different entity count.
+    """
+    info_path = _cache_info_path(path)
+    if not (os.path.exists(path) and os.path.exists(info_path)):
+        return None
+    with open(info_path) as f:
+        info = json.load(f)
+    if info.get("collection") != collection_name or info.get("num_entities") != num_entities:
+        return None
+    vectors = np.load(path, mmap_mode="r")
+    return vectors if len(vectors) == info.get("num_rows") else None
 
-    start_time = time.time()
+def cache_milvus_vectors(col, num_entities, path=VECTOR_CACHE, batch_size=BATCH_SIZE,
+                         dim=config.VECTOR_DIM, prefetch_depth=PREFETCH):
+    """
+    Query every vector from Milvus once into a float32 .npy at `path` and
+    return it memory-mapped. The file is written under a temporary name
+    and renamed when complete, so an interrupted run never leaves a
+    truncated cache behind. <path>.json records the collection and entity
+    count it was fetched at, for load_cached_vectors(); it is not written
+    if the rows read do not match num_entities (rows inserted or deleted
+    meanwhile), so such a cache is used once and fetched again next time.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    info_path = _cache_info_path(path)
+    if os.path.exists(info_path):
+        os.remove(info_path)
+    tmp = path + ".tmp"
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(num_entities, dim))
+    row = fetched = 0
+    for batch in prefetch(milvus_batches(col, batch_size), prefetch_depth):
+        fetched += len(batch)
+        batch = batch[:num_entities - row]
+        out[row:row + len(batch)] = batch
+        row += len(batch)
+        log(f"Cached {row}/{num_entities} vectors")
+    out.flush()
+    del out
+    if row < num_entities:
+        # Fewer rows than reported: keep only the rows actually fetched
+        trimmed = path + ".trim.tmp"
+        with open(trimmed, "wb") as f:
+            np.save(f, np.load(tmp, mmap_mode="r")[:row])
+        os.replace(trimmed, path)
+        os.remove(tmp)
+    else:
+        os.replace(tmp, path)
+    if fetched != num_entities:
+        log(f"Warning: read {fetched} vectors, but the collection reports {num_entities}; "
+            f"the cache will be fetched again on the next run")
+    else:
+        with open(info_path, "w") as f:
+            json.dump({"collection": getattr(col, "name", None), "num_entities": num_entities,
+                       "num_rows": row, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=4)
+    return np.load(path, mmap_mode="r")
+
+def train(batches, scaler, pca, kmeans) -> int:
+    """
+    Fit the scaler and optional PCA on one pass over the data, then k-means
+    on a second. `batches()` must return a fresh iterator of batches per pass.
+
+    Returns:
+        int: Number of vectors in one pass.
+    """
     total_processed = 0
 
     # First pass: scaling and optional PCA fitting
     log("\n--- Scaling and optional PCA fitting ---")
-    for start in range(0, num_entities, BATCH_SIZE):
-        end = min(start + BATCH_SIZE, num_entities)
-        batch_vectors = load_vectors_batch(col, start+1, end)
+    for i, batch_vectors in enumerate(batches(), start=1):
         total_processed += batch_vectors.shape[0]
-        log(f"Batch {start//BATCH_SIZE+1}: Loaded {batch_vectors.shape[0]} vectors")
+        log(f"Batch {i}: Loaded {batch_vectors.shape[0]} vectors")
 
         batch_vectors = scaler.partial_fit(batch_vectors).transform(batch_vectors)
-        if USE_PCA:
+        if pca is not None:
             pca.partial_fit(batch_vectors)
-        log(f"Batch {start//BATCH_SIZE+1}: Scaled{' and PCA-fitted' if USE_PCA else ''}")
+        log(f"Batch {i}: Scaled{' and PCA-fitted' if pca is not None else ''}")
 
     # Second pass: incremental MiniBatchKMeans
     log("\n--- Training MiniBatchKMeans ---")
-    for start in range(0, num_entities, BATCH_SIZE):
-        end = min(start + BATCH_SIZE, num_entities)
-        batch_vectors = load_vectors_batch(col, start+1, end)
+    for i, batch_vectors in enumerate(batches(), start=1):
         batch_vectors = scaler.transform(batch_vectors)
-        if USE_PCA:
+        if pca is not None:
             batch_vectors = pca.transform(batch_vectors)
 
         kmeans.partial_fit(batch_vectors)
-        log(f"Batch {start//BATCH_SIZE+1}: MiniBatchKMeans partial_fit done")
+        log(f"Batch {i}: MiniBatchKMeans partial_fit done")
+    return total_processed
+
+def update_model(batches, model_dir=MODEL_DIR, source=None) -> int:
+    """
+    Continue training a saved k-means model on new vectors only (e.g. the
+    rows added by an incremental ingestion), with kmeans.partial_fit.
+
+    The scaler and PCA are kept fixed so the cluster space does not move;
+    cluster labels and IVF indexes built from the old model should be
+    rebuilt afterwards.
+
+    Args:
+        batches: Iterable of float32 vector batches.
+        model_dir (str): Directory of a model saved by main().
+        source (str): Where the vectors came from, for the metadata.
+
+    Returns:
+        int: Number of vectors fitted.
+    """
+    from src.operations.cluster_assigner import load_cluster_model
+
+    scaler, pca, kmeans = load_cluster_model(model_dir)
+    model_path = os.path.join(model_dir, os.path.basename(MODEL_FILE))
+
+    start_time = time.time()
+    total = 0
+    for i, batch_vectors in enumerate(batches, start=1):
+        if not len(batch_vectors):
+            continue
+        batch_vectors = scaler.transform(batch_vectors)
+        if pca is not None:
+            batch_vectors = pca.transform(batch_vectors)
+        kmeans.partial_fit(batch_vectors)
+        total += len(batch_vectors)
+        log(f"Batch {i}: MiniBatchKMeans partial_fit on {len(batch_vectors)} new vectors")
+    if not total:
+        log("No new vectors; model unchanged.")
+        return 0
+    joblib.dump(kmeans, model_path)
+
+    metadata_path = os.path.join(model_dir, os.path.basename(METADATA_FILE))
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    metadata["num_vectors_processed"] = metadata.get("num_vectors_processed", 0) + total
+    metadata.setdefault("updates", []).append({
+        "source": source,
+        "num_vectors": total,
+        "update_time_seconds": round(time.time() - start_time, 2),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    })
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+    log(f"Updated '{model_path}' with {total} new vectors")
+    return total
+
+def open_source(args):
+    """(batches function, description) for the vector source chosen on the command line."""
+    depth = args.prefetch
+    if args.source == "store":
+        from src.polars_ops.parquet_vectors import VectorStore, build_vector_store
+
+        if not os.path.exists(os.path.join(args.store, "store.json")):
+            log(f"Building vector store {args.store} from {args.parquet}...")
+            build_vector_store(args.parquet, args.store)
+        vectors = VectorStore(args.store).vectors
+        log(f"Vector store '{args.store}' has {len(vectors)} vectors.")
+        return lambda: prefetch(array_batches(vectors), depth), f"store:{args.store}"
+
+    from pymilvus import connections, Collection
+
+    collection_name = config.COLLECTION_NAME
+    log("Connecting to Milvus...")
+    connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    col = Collection(collection_name)
+    col.load()
+    num_entities = col.num_entities
+    log(f"Collection '{collection_name}' has {num_entities} vectors.")
+
+    if args.source == "milvus":
+        return lambda: prefetch(milvus_batches(col), depth), f"milvus:{collection_name}"
+
+    vectors = None if args.refresh_cache else load_cached_vectors(args.cache, collection_name, num_entities)
+    if vectors is not None:
+        log(f"Reusing {len(vectors)} cached vectors from '{args.cache}'")
+    else:
+        if os.path.exists(args.cache) and not args.refresh_cache:
+            log(f"Cache '{args.cache}' is stale (or has no {_cache_info_path(args.cache)}), refetching")
+        start = time.time()
+        vectors = cache_milvus_vectors(col, num_entities, args.cache, prefetch_depth=depth)
+        log(f"Cached {len(vectors)} vectors to '{args.cache}' in {time.time() - start:.1f}s")
+    return lambda: prefetch(array_batches(vectors), depth), f"cache:{args.cache}"
+
+def main(args):
+    if not ensure_model_dir():
+        return
+
+    start_time = time.time()
+    batches, source = open_source(args)
+
+    scaler = StandardScaler()
+    pca = IncrementalPCA(n_components=PCA_COMPONENTS) if USE_PCA else None
+    kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=BATCH_SIZE, random_state=42, verbose=1)
+    total_processed = train(batches, scaler, pca, kmeans)
 
     # Save models
     joblib.dump(scaler, SCALER_FILE)
@@ -98,7 +294,8 @@ def main():
 
     # Save metadata
     metadata = {
-        "vector_collection_name": VECTOR_COLLECTION_NAME,
+        "vector_collection_name": config.COLLECTION_NAME if args.source != "store" else None,
+        "source": source,
         "num_vectors_processed": total_processed,
         "batch_size": BATCH_SIZE,
         "n_clusters": N_CLUSTERS,
@@ -120,4 +317,14 @@ def main():
     log(json.dumps(metadata, indent=4))
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__, parents=[config.settings_parser()],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=SOURCES, default="milvus")
+    parser.add_argument("--cache", type=str, default=VECTOR_CACHE, help="Vector cache (--source cache)")
+    parser.add_argument("--refresh-cache", action="store_true", help="Re-fetch the cache from Milvus")
+    parser.add_argument("--store", type=str, default=STORE_DIR, help="Vector store (--source store)")
+    parser.add_argument("--parquet", type=str, default=PARQUET_DIR,
+                        help="Parquet export to build the store from if it is missing")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH,
+                        help="Batches loaded ahead on a background thread (0 = off)")
+    main(parser.parse_args())
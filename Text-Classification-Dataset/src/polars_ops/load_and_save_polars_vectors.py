@@ -1,86 +1,198 @@
 """
-Milvus vectors to Polars Parquet with crash-resume support.
+Milvus vectors to Parquet with crash-resume support.
 
-- Saves each batch immediately.
-- Resumes from last saved row if interrupted.
-- Keeps raw text and embeddings (no cleaning).
+- The id space 1..<max id> is cut into fixed ranges of --batch-size ids;
+  each range is saved as its own file, vectors_<first>_<last>.parquet.
+  The max id is looked up rather than taken from num_entities, since ids
+  can have gaps; ranges holding no rows are skipped.
+- Ranges are fetched by --workers concurrent workers, each paging through
+  its range --query-rows ids per Milvus query.
+- Files are written under a temporary name and renamed when complete, so
+  an interrupted export resumes by skipping every range already on disk
+  (whatever order the workers finished in).
+- When the collection has grown, the last, partial range is exported again
+  in full and the file it supersedes (e.g. vectors_21_22 for vectors_21_25)
+  is deleted, so no id is in two files.
+- Keeps raw text and embeddings (no cleaning). `emb` is a fixed-size-list
+  column built from one flat float32 buffer per range.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.polars_ops.load_and_save_polars_vectors --collection texts
+python3 -m src.polars_ops.load_and_save_polars_vectors --workers 4 --compression lz4 --row-group-size 8192
 """
 
+import argparse
 import os
-import polars as pl
-from pymilvus import connections, Collection
+import re
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from src.data_ingestion import config
+from src.data_ingestion.milvus_client import get_max_id
 
 # -----------------------------
 # SETTINGS
 # -----------------------------
-VECTOR_COLLECTION_NAME = config.COLLECTION_NAME
 PARQUET_DIR = "exports/parquet"
-BATCH_SIZE = 50000
+BATCH_SIZE = 50000       # Ids per output file
+QUERY_ROWS = 10000       # Ids per Milvus query (keeps responses well under the gRPC size limit)
+WORKERS = 4              # Ranges fetched concurrently
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 16384
 VERBOSE = True
 
+_RANGE_FILE = re.compile(r"^vectors_(\d+)_(\d+)\.parquet$")
+
 def log(msg):
     if VERBOSE:
         print(msg)
 
-# -----------------------------
-# CONNECT TO MILVUS
-# -----------------------------
-log("Connecting to Milvus...")
-connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-col = Collection(VECTOR_COLLECTION_NAME)
-col.load()
-num_entities = col.num_entities
-log(f"Collection '{VECTOR_COLLECTION_NAME}' has {num_entities} vectors.")
+def saved_ranges(parquet_dir: str) -> List[Tuple[int, int]]:
+    """(first_id, last_id) of every complete range file in parquet_dir."""
+    if not os.path.isdir(parquet_dir):
+        return []
+    matches = (_RANGE_FILE.match(f) for f in os.listdir(parquet_dir))
+    return sorted((int(m.group(1)), int(m.group(2))) for m in matches if m)
 
-# -----------------------------
-# RESUME CHECK
-# -----------------------------
-os.makedirs(PARQUET_DIR, exist_ok=True)
-parquet_files = sorted([f for f in os.listdir(PARQUET_DIR) if f.endswith(".parquet")])
-
-if parquet_files:
-    # Find the last saved row ID
-    last_file = os.path.join(PARQUET_DIR, parquet_files[-1])
-    df_last = pl.read_parquet(last_file)
-    last_id = df_last["id"].max()
-    start_id = last_id + 1
-    log(f"Resuming from ID {start_id}")
-else:
-    start_id = 1
-    log("Starting from the beginning...")
-
-if start_id > num_entities:
-    log("All rows already saved! Nothing to do.")
-    exit(0)
+def plan_ranges(max_id: int, batch_size: int = BATCH_SIZE,
+                done: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, int]]:
+    """Id ranges still to export: the fixed batch grid up to max_id minus ranges covered by saved files."""
+    done = done or []
+    todo = []
+    for first in range(1, max_id + 1, batch_size):
+        last = min(first + batch_size - 1, max_id)
+        if not any(s <= first and last <= e for s, e in done):
+            todo.append((first, last))
+    return todo
 
-# -----------------------------
-# FETCH AND SAVE IN BATCHES
-# -----------------------------
-for batch_start in range(start_id, num_entities + 1, BATCH_SIZE):
-    batch_end = min(batch_start + BATCH_SIZE - 1, num_entities)
-    log(f"Fetching batch: {batch_start}-{batch_end} ...")
+def remove_superseded(parquet_dir: str, first_id: int, last_id: int) -> List[str]:
+    """Delete range files lying inside [first_id, last_id], other than that range's own file."""
+    removed = []
+    for s, e in saved_ranges(parquet_dir):
+        if first_id <= s and e <= last_id and (s, e) != (first_id, last_id):
+            path = os.path.join(parquet_dir, f"vectors_{s}_{e}.parquet")
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+def fetch_range(collection, first_id: int, last_id: int, query_rows: int = QUERY_ROWS):
+    """
+    Query the rows of an id range, page by page, into an Arrow table
+    (id, text, emb) sorted by id.
+
+    Returns:
+        pyarrow.Table, or None if the range holds no rows.
+    """
+    import pyarrow as pa
+
+    ids, texts, pages = [], [], []
+    for start in range(first_id, last_id + 1, query_rows):
+        end = min(start + query_rows - 1, last_id)
+        rows = collection.query(expr=f"id >= {start} and id <= {end}",
+                                output_fields=["id", "text", "emb"])
+        if not rows:
+            continue
+        rows.sort(key=lambda r: r["id"])
+        ids.extend(r["id"] for r in rows)
+        texts.extend(r["text"] for r in rows)
+        pages.append([r["emb"] for r in rows])
+    if not ids:
+        return None
+
+    dim = len(pages[0][0])
+    vectors = np.empty((len(ids), dim), dtype=np.float32)
+    row = 0
+    for page in pages:
+        vectors[row:row + len(page)] = page
+        row += len(page)
+    emb = pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dim)
+    return pa.Table.from_arrays([pa.array(ids, type=pa.int64()), pa.array(texts, type=pa.string()), emb],
+                                names=["id", "text", "emb"])
+
+def write_range(table, parquet_dir: str, first_id: int, last_id: int,
+                compression: str = COMPRESSION, row_group_size: int = ROW_GROUP_SIZE) -> str:
+    """Write one range file atomically (temporary name, then rename)."""
+    import pyarrow.parquet as pq
+
+    path = os.path.join(parquet_dir, f"vectors_{first_id}_{last_id}.parquet")
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression=compression, row_group_size=row_group_size)
+    os.replace(tmp, path)
+    return path
+
+def export_collection(collection, parquet_dir: str = PARQUET_DIR, batch_size: int = BATCH_SIZE,
+                      workers: int = WORKERS, query_rows: int = QUERY_ROWS,
+                      compression: str = COMPRESSION, row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """
+    Export a loaded collection to one Parquet file per id range, resuming
+    from any range files already in parquet_dir.
+
+    Args:
+        collection: Loaded pymilvus Collection with id, text and emb fields.
+        parquet_dir (str): Output directory.
+        batch_size (int): Ids per output file.
+        workers (int): Ranges fetched and written concurrently.
+        query_rows (int): Ids per Milvus query within a range.
+        compression (str): Parquet codec (zstd, lz4, snappy, gzip, none).
+        row_group_size (int): Rows per Parquet row group.
+
+    Returns:
+        int: Number of rows written by this run.
+    """
+    os.makedirs(parquet_dir, exist_ok=True)
+    # Left over if a previous run stopped between writing a range and cleaning up
+    for first_id, last_id in saved_ranges(parquet_dir):
+        if os.path.exists(os.path.join(parquet_dir, f"vectors_{first_id}_{last_id}.parquet")):
+            remove_superseded(parquet_dir, first_id, last_id)
+    todo = plan_ranges(get_max_id(collection), batch_size, saved_ranges(parquet_dir))
+    if not todo:
+        log("All rows already saved! Nothing to do.")
+        return 0
+    log(f"Exporting {len(todo)} range(s) from ID {todo[0][0]} with {workers} worker(s)...")
+
+    def run(id_range):
+        first_id, last_id = id_range
+        table = fetch_range(collection, first_id, last_id, query_rows)
+        if table is None:
+            log(f"No results in batch {first_id}-{last_id}, skipping.")
+            return 0
+        path = write_range(table, parquet_dir, first_id, last_id, compression, row_group_size)
+        log(f"Saved batch {first_id}-{last_id} ({table.num_rows} rows) to {path}")
+        for old in remove_superseded(parquet_dir, first_id, last_id):
+            log(f"Removed {old}, superseded by {path}")
+        return table.num_rows
 
-    expr = f"id >= {batch_start} and id <= {batch_end}"
-    results = col.query(expr=expr, output_fields=["id", "text", "emb"])
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        written = sum(executor.map(run, todo))
+    elapsed = time.time() - start
+    log(f"Exported {written} rows in {elapsed:.1f}s ({written / elapsed if elapsed else 0:,.0f} rows/s)")
+    return written
 
-    if not results:
-        log("No results in this batch, skipping.")
-        continue
+def main():
+    settings = config.settings_parser()
+    parser = argparse.ArgumentParser(description="Export Milvus vectors to Parquet", parents=[settings])
+    parser.add_argument("--out", type=str, default=PARQUET_DIR, help="Output directory")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Ids per output file")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent range workers")
+    parser.add_argument("--query-rows", type=int, default=QUERY_ROWS, help="Ids per Milvus query")
+    parser.add_argument("--compression", type=str, default=COMPRESSION)
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
 
-    ids = [r["id"] for r in results]
-    texts = [r["text"] for r in results]  # raw text
-    vectors = [r["emb"] for r in results]
+    from pymilvus import connections, Collection
 
-    df_batch = pl.DataFrame({
-        "id": ids,
-        "text": texts,
-        "emb": vectors
-    })
+    log("Connecting to Milvus...")
+    connections.connect('default', host=config.MILVUS_HOST, port=config.MILVUS_PORT)
+    col = Collection(config.COLLECTION_NAME)
+    col.load()
+    log(f"Collection '{config.COLLECTION_NAME}' has {col.num_entities} vectors.")
 
-    # Save immediately
-    parquet_file = os.path.join(PARQUET_DIR, f"vectors_{batch_start}_{batch_end}.parquet")
-    df_batch.write_parquet(parquet_file)
-    log(f"Saved batch to {parquet_file}")
+    export_collection(col, args.out, args.batch_size, args.workers, args.query_rows,
+                      args.compression, args.row_group_size)
+    log("All done! All data saved in Parquet format.")
 
-log("All done! All data saved in Parquet format.")
+if __name__ == "__main__":
+    main()
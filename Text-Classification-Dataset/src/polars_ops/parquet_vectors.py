@@ -0,0 +1,215 @@
+"""
+Build and open a memory-mapped vector store from the exported Parquet files.
+
+The Parquet exports (load_and_save_polars_vectors.py, sort_and_combine_data.py)
+hold id, text and emb columns. Searching them directly would decode the
+list-typed emb column on every query, so this converts them once into:
+
+    <store>/vectors.npy       float32 (N, dim), row-major
+    <store>/ids.npy           int64 (N,)
+    <store>/texts.bin         UTF-8 texts, concatenated
+    <store>/text_offsets.npy  int64 (N + 1,) byte offsets into texts.bin
+    <store>/store.json        row count, dim, source files, whether ids are sorted
+
+All arrays are opened with np.load(mmap_mode="r"), so opening is instant and
+only the pages a search touches are read.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.polars_ops.parquet_vectors --parquet exports/parquet --out exports/vector_store
+python3 -m src.polars_ops.parquet_vectors --parquet exports/parquet/full_data.parquet
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from typing import List
+
+PARQUET_DIR = "exports/parquet"
+STORE_DIR = "exports/vector_store"
+COMBINED_FILE = "full_data.parquet"
+READ_BATCH_ROWS = 50000
+# Files other modules derive from a store's rows (IVF index, quantized
+# vectors); a rebuild deletes them since they no longer match
+DERIVED_FILES = ("ivf.npz", "vectors_*.npy", "quantization_*.json")
+
+def list_parquet_files(path: str) -> List[str]:
+    """
+    Parquet files to read for `path`: the file itself, or the batch files of
+    a directory ordered by their smallest id. The combined file
+    (sort_and_combine_data.py) is skipped when batch files are present,
+    since it repeats their rows.
+    """
+    import pyarrow.parquet as pq
+
+    if os.path.isfile(path):
+        return [path]
+    files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet"))
+    batches = [f for f in files if os.path.basename(f) != COMBINED_FILE]
+    files = batches or files
+
+    def first_id(fp):
+        meta = pq.ParquetFile(fp).metadata
+        if meta.num_row_groups == 0:
+            return 0
+        column = meta.schema.names.index("id")
+        stats = meta.row_group(0).column(column).statistics
+        return stats.min if stats is not None and stats.has_min_max else 0
+
+    return sorted(files, key=first_id)
+
+def emb_to_array(column) -> np.ndarray:
+    """List or fixed-size-list arrow column of vectors -> float32 (n, dim) array."""
+    n = len(column)
+    flat = column.flatten().to_numpy(zero_copy_only=False)
+    return flat.astype(np.float32, copy=False).reshape(n, -1 if n else 0)
+
+def build_vector_store(parquet_path: str = PARQUET_DIR, store_dir: str = STORE_DIR,
+                       batch_rows: int = READ_BATCH_ROWS) -> dict:
+    """
+    Convert Parquet exports into a memory-mapped vector store.
+
+    Args:
+        parquet_path (str): A Parquet file or a directory of them.
+        store_dir (str): Output directory (overwritten).
+        batch_rows (int): Rows decoded at a time; bounds memory use.
+
+    Returns:
+        dict: The store metadata written to store.json.
+    """
+    import pyarrow.parquet as pq
+
+    files = list_parquet_files(parquet_path)
+    if not files:
+        raise FileNotFoundError(f"No Parquet files found at {parquet_path}")
+    num_rows = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    os.makedirs(store_dir, exist_ok=True)
+    for pattern in DERIVED_FILES:
+        for stale in glob.glob(os.path.join(store_dir, pattern)):
+            os.remove(stale)
+
+    start_time = time.time()
+    vectors = None
+    ids = np.lib.format.open_memmap(os.path.join(store_dir, "ids.npy"), mode="w+",
+                                    dtype=np.int64, shape=(num_rows,))
+    offsets = np.empty(num_rows + 1, dtype=np.int64)
+    offsets[0] = 0
+    row = 0
+    with open(os.path.join(store_dir, "texts.bin"), "wb") as texts_out:
+        for fp in files:
+            for batch in pq.ParquetFile(fp).iter_batches(batch_size=batch_rows,
+                                                        columns=["id", "text", "emb"]):
+                emb = emb_to_array(batch.column("emb"))
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(
+                        os.path.join(store_dir, "vectors.npy"), mode="w+",
+                        dtype=np.float32, shape=(num_rows, emb.shape[1]))
+                n = len(emb)
+                vectors[row:row + n] = emb
+                ids[row:row + n] = batch.column("id").to_numpy()
+
+                encoded = [(t or "").encode("utf-8") for t in batch.column("text").to_pylist()]
+                offsets[row + 1:row + n + 1] = offsets[row] + np.cumsum([len(b) for b in encoded])
+                texts_out.write(b"".join(encoded))
+                row += n
+            print(f"Read {fp} ({row}/{num_rows} rows)")
+
+    dim = vectors.shape[1] if vectors is not None else 0
+    if vectors is not None:
+        vectors.flush()
+    ids.flush()
+    np.save(os.path.join(store_dir, "text_offsets.npy"), offsets)
+
+    metadata = {
+        "num_rows": num_rows,
+        "dim": dim,
+        "ids_sorted": bool(np.all(ids[1:] > ids[:-1])) if num_rows else True,
+        "source_files": files,
+        "build_seconds": round(time.time() - start_time, 2),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(store_dir, "store.json"), "w") as f:
+        json.dump(metadata, f, indent=4)
+    return metadata
+
+class VectorStore:
+    """Read-only, memory-mapped view of a store built by build_vector_store()."""
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "store.json")) as f:
+            self.metadata = json.load(f)
+        self.ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(store_dir, "text_offsets.npy"), mmap_mode="r")
+        vectors_path = os.path.join(store_dir, "vectors.npy")
+        if os.path.exists(vectors_path):
+            self.vectors = np.load(vectors_path, mmap_mode="r")
+        else:
+            self.vectors = np.empty((0, self.metadata["dim"]), dtype=np.float32)
+        if self.text_offsets[-1] > 0:
+            self._texts = np.memmap(os.path.join(store_dir, "texts.bin"), dtype=np.uint8, mode="r")
+        else:
+            self._texts = np.empty(0, dtype=np.uint8)  # np.memmap can't map an empty file
+        self._sq_norms = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def ids_sorted(self) -> bool:
+        return self.metadata["ids_sorted"]
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the store is rebuilt; saved with derived files to detect stale ones."""
+        return hashlib.sha1(json.dumps(self.metadata, sort_keys=True).encode()).hexdigest()[:16]
+
+    def text(self, row: int) -> str:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def texts(self, rows) -> List[str]:
+        return [self.text(int(r)) for r in rows]
+
+    def rows_of_ids(self, ids) -> np.ndarray:
+        """Row numbers of the given ids (-1 where an id is not in the store)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self):
+            return np.full(len(ids), -1, dtype=np.int64)
+        order = None if self.ids_sorted else np.argsort(self.ids)
+        pos = np.minimum(np.searchsorted(self.ids, ids, sorter=order), len(self) - 1)
+        rows = pos if order is None else order[pos]
+        return np.where(self.ids[rows] == ids, rows, -1)
+
+    def sq_norms(self) -> np.ndarray:
+        """Squared L2 norm of every vector (computed once, block by block)."""
+        if self._sq_norms is None:
+            norms = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), READ_BATCH_ROWS):
+                block = self.vectors[start:start + READ_BATCH_ROWS]
+                norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+            self._sq_norms = norms
+        return self._sq_norms
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mapped vector store from Parquet exports")
+    parser.add_argument("--parquet", type=str, default=PARQUET_DIR,
+                        help=f"Parquet file or directory (default: {PARQUET_DIR})")
+    parser.add_argument("--out", type=str, default=STORE_DIR,
+                        help=f"Store directory (default: {STORE_DIR})")
+    parser.add_argument("--batch-rows", type=int, default=READ_BATCH_ROWS)
+    args = parser.parse_args()
+
+    metadata = build_vector_store(args.parquet, args.out, args.batch_rows)
+    print(json.dumps(metadata, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Scalar quantization of the exported vectors: int8 or float16.
+
+float32 embeddings take dim * 4 bytes per row (~3.2 GB for the corpus).
+This stores them at 1 byte (int8) or 2 bytes (float16) per dimension:
+
+- int8: per-dimension affine codes, x ~ lo + scale * (code + 128), with lo
+  and scale calibrated from each dimension's min / max over the data.
+- float16: a plain cast (no calibration needed).
+
+Calibration stats are saved as JSON next to the data, in the style of the
+models' metadata.json. Quantized vectors are meant for a coarse search
+whose top candidates are then rescored exactly on the float32 vectors
+(see LocalKNNSearcher(quantized=...)).
+
+Outputs:
+- vector store:  <store>/vectors_<dtype>.npy + <store>/quantization_<dtype>.json
+- Parquet:       <out>/<file> with emb as fixed_size_list<int8 | halffloat>,
+                 + <out>/quantization.json
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.polars_ops.quantize store --store exports/vector_store --dtype int8
+python3 -m src.polars_ops.quantize parquet --parquet exports/parquet --out exports/parquet_int8 --dtype int8
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from typing import Iterable, Optional
+from src.polars_ops.parquet_vectors import (
+    PARQUET_DIR, READ_BATCH_ROWS, STORE_DIR, VectorStore, emb_to_array, list_parquet_files,
+)
+
+DTYPES = ("int8", "float16")
+METADATA_FILE = "quantization.json"
+
+class ScalarQuantizer:
+    """Per-dimension int8 codes (or a float16 cast) of float32 vectors."""
+
+    def __init__(self, dtype: str, lo: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown quantization dtype '{dtype}', expected one of {DTYPES}")
+        self.dtype = dtype
+        self.lo = None if lo is None else np.asarray(lo, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, dtype: str, blocks: Iterable[np.ndarray]):
+        """Calibrate from blocks of float32 vectors (one pass; only min / max kept)."""
+        if dtype == "float16":
+            return cls(dtype)
+        lo = hi = None
+        for block in blocks:
+            if not len(block):
+                continue
+            block_lo, block_hi = block.min(axis=0), block.max(axis=0)
+            lo = block_lo if lo is None else np.minimum(lo, block_lo)
+            hi = block_hi if hi is None else np.maximum(hi, block_hi)
+        if lo is None:
+            raise ValueError("No vectors to calibrate on")
+        scale = (hi - lo) / 255.0
+        return cls(dtype, lo, np.where(scale > 0, scale, 1.0))
+
+    @property
+    def numpy_dtype(self):
+        return np.int8 if self.dtype == "int8" else np.float16
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dtype == "float16":
+            return vectors.astype(np.float16)
+        codes = np.rint((vectors - self.lo) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.dtype == "float16":
+            return codes.astype(np.float32)
+        return (codes.astype(np.float32) + 128) * self.scale + self.lo
+
+    def query_terms(self, queries: np.ndarray):
+        """
+        (scaled queries, offsets) such that for a code block c,
+        decode(c) @ q.T == c @ scaled.T + offsets, without decoding c.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.dtype == "float16":
+            return queries, np.zeros(len(queries), dtype=np.float32)
+        scaled = queries * self.scale
+        offsets = queries @ self.lo + 128 * scaled.sum(axis=1)
+        return scaled, offsets
+
+    def to_dict(self) -> dict:
+        return {
+            "dtype": self.dtype,
+            "lo": None if self.lo is None else self.lo.tolist(),
+            "scale": None if self.scale is None else self.scale.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["dtype"], data.get("lo"), data.get("scale"))
+
+def save_metadata(quantizer: ScalarQuantizer, path: str, **extra) -> dict:
+    metadata = {
+        **quantizer.to_dict(),
+        **extra,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(path, "w") as f:
+        json.dump(metadata, f, indent=4)
+    return metadata
+
+def load_quantizer(path: str) -> ScalarQuantizer:
+    """Quantizer saved by save_metadata() (a quantization*.json file)."""
+    with open(path) as f:
+        return ScalarQuantizer.from_dict(json.load(f))
+
+def quantized_vectors_path(store_dir: str, dtype: str) -> str:
+    return os.path.join(store_dir, f"vectors_{dtype}.npy")
+
+def store_metadata_path(store_dir: str, dtype: str) -> str:
+    return os.path.join(store_dir, f"quantization_{dtype}.json")
+
+def store_quantization_is_current(store, dtype: str) -> bool:
+    """
+    Whether <store>/quantization_<dtype>.json and its vectors were built from
+    the store's current rows (same row count and store fingerprint).
+    """
+    path = store_metadata_path(store.store_dir, dtype)
+    if not (os.path.exists(path) and os.path.exists(quantized_vectors_path(store.store_dir, dtype))):
+        return False
+    with open(path) as f:
+        metadata = json.load(f)
+    return metadata.get("num_rows") == len(store) and metadata.get("store") == store.fingerprint
+
+def quantize_store(store_dir: str = STORE_DIR, dtype: str = "int8",
+                   batch_rows: int = READ_BATCH_ROWS) -> dict:
+    """
+    Write <store>/vectors_<dtype>.npy from the store's float32 vectors and
+    save the calibration in <store>/quantization_<dtype>.json, with the
+    store's row count and fingerprint (see store_quantization_is_current()).
+
+    Returns:
+        dict: The metadata written.
+    """
+    store = VectorStore(store_dir)
+    vectors = store.vectors
+
+    def blocks():
+        for start in range(0, len(vectors), batch_rows):
+            yield np.asarray(vectors[start:start + batch_rows])
+
+    start_time = time.time()
+    quantizer = ScalarQuantizer.fit(dtype, blocks())
+    codes = np.lib.format.open_memmap(quantized_vectors_path(store_dir, dtype), mode="w+",
+                                      dtype=quantizer.numpy_dtype, shape=vectors.shape)
+    for start, block in zip(range(0, len(vectors), batch_rows), blocks()):
+        codes[start:start + len(block)] = quantizer.encode(block)
+    codes.flush()
+
+    return save_metadata(quantizer, store_metadata_path(store_dir, dtype),
+                         dim=store.dim,
+                         num_rows=len(store),
+                         store=store.fingerprint,
+                         float32_bytes=int(vectors.nbytes),
+                         quantized_bytes=int(codes.nbytes),
+                         build_seconds=round(time.time() - start_time, 2))
+
+def quantize_parquet(parquet_path: str = PARQUET_DIR, out_dir: str = PARQUET_DIR + "_int8",
+                     dtype: str = "int8", batch_rows: int = READ_BATCH_ROWS,
+                     compression: str = "zstd") -> dict:
+    """
+    Rewrite Parquet exports with a quantized emb column (two passes:
+    calibration, then encoding), saving the calibration in
+    <out_dir>/quantization.json.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    files = list_parquet_files(parquet_path)
+    if not files:
+        raise FileNotFoundError(f"No Parquet files found at {parquet_path}")
+
+    def blocks():
+        for fp in files:
+            for batch in pq.ParquetFile(fp).iter_batches(batch_size=batch_rows, columns=["emb"]):
+                yield emb_to_array(batch.column("emb"))
+
+    start_time = time.time()
+    quantizer = ScalarQuantizer.fit(dtype, blocks())
+    os.makedirs(out_dir, exist_ok=True)
+    num_rows, dim = 0, 0
+    for fp in files:
+        out_path = os.path.join(out_dir, os.path.basename(fp))
+        writer = None
+        for batch in pq.ParquetFile(fp).iter_batches(batch_size=batch_rows):
+            emb = emb_to_array(batch.column("emb"))
+            dim = emb.shape[1]
+            codes = quantizer.encode(emb)
+            column = pa.FixedSizeListArray.from_arrays(pa.array(codes.reshape(-1)), dim)
+            table = pa.Table.from_batches([batch]).drop(["emb"]).append_column("emb", column)
+            if writer is None:
+                writer = pq.ParquetWriter(out_path + ".tmp", table.schema, compression=compression)
+            writer.write_table(table)
+            num_rows += len(emb)
+        if writer is not None:
+            writer.close()
+            os.replace(out_path + ".tmp", out_path)
+        print(f"Quantized {fp} -> {out_path}")
+
+    return save_metadata(quantizer, os.path.join(out_dir, METADATA_FILE),
+                         dim=dim,
+                         num_rows=num_rows,
+                         source_files=files,
+                         build_seconds=round(time.time() - start_time, 2))
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 / float16 quantization of exported vectors")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    store = sub.add_parser("store", help="Add quantized vectors to a vector store")
+    store.add_argument("--store", type=str, default=STORE_DIR)
+    store.add_argument("--dtype", choices=DTYPES, default="int8")
+
+    parquet = sub.add_parser("parquet", help="Write Parquet exports with a quantized emb column")
+    parquet.add_argument("--parquet", type=str, default=PARQUET_DIR)
+    parquet.add_argument("--out", type=str, default=None, help="Default: <parquet>_<dtype>")
+    parquet.add_argument("--dtype", choices=DTYPES, default="int8")
+    parquet.add_argument("--compression", type=str, default="zstd")
+    args = parser.parse_args()
+
+    if args.command == "store":
+        metadata = quantize_store(args.store, args.dtype)
+    else:
+        out = args.out or f"{args.parquet.rstrip('/')}_{args.dtype}"
+        metadata = quantize_parquet(args.parquet, out, args.dtype, compression=args.compression)
+    print(json.dumps({k: v for k, v in metadata.items() if k not in ("lo", "scale")}, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,24 @@
 """
 Concatenate multiple Parquet files in exports/parquet into a single Parquet file,
 sorted by 'id'.
+
+Each batch file covers a disjoint id range, so no global sort is needed:
+files are ordered by their id range (Parquet statistics) and streamed into
+the output one row group at a time. Peak memory is one row group, except
+for a batch file whose rows are not already in id order, which is sorted
+on its own. The output file itself is never read back as an input.
+
+Usage (from Text-Classification-Dataset/):
+
+python3 -m src.polars_ops.sort_and_combine_data
+python3 -m src.polars_ops.sort_and_combine_data --parquet exports/parquet --output exports/parquet/full_data.parquet
 """
 
+import argparse
 import os
-import polars as pl
+import time
+from typing import List, Tuple
+from src.polars_ops.parquet_vectors import list_parquet_files
 
 # -------------------------------
 # Configuration
@@ -19,37 +33,95 @@ PARQUET_DIR = os.path.join(SCRIPT_DIR, "../../exports/parquet")
 # Output Parquet file
 OUTPUT_FILE = os.path.join(PARQUET_DIR, "full_data.parquet")
 
-# -------------------------------
-# Main script
-# -------------------------------
+COMPRESSION = "zstd"
 
-def main():
-    if not os.path.exists(PARQUET_DIR):
-        print(f"Error: Parquet directory does not exist: {PARQUET_DIR}")
-        return
+def id_range(path: str) -> Tuple[int, int]:
+    """(min id, max id) of a Parquet file, from its row group statistics."""
+    import pyarrow.parquet as pq
+
+    meta = pq.ParquetFile(path).metadata
+    column = meta.schema.names.index("id")
+    lows, highs = [], []
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            # No statistics written: read the id column instead
+            ids = pq.read_table(path, columns=["id"]).column("id").to_numpy()
+            return (int(ids.min()), int(ids.max())) if len(ids) else (0, -1)
+        lows.append(stats.min)
+        highs.append(stats.max)
+    return (min(lows), max(highs)) if lows else (0, -1)
 
-    # Find all Parquet files in the directory
-    parquet_files = [os.path.join(PARQUET_DIR, f) for f in os.listdir(PARQUET_DIR) if f.endswith(".parquet")]
+def order_by_id_range(files: List[str]) -> List[str]:
+    """Files ordered by id range; raises ValueError if two ranges overlap."""
+    ranged = sorted((id_range(f), f) for f in files)
+    for ((_, prev_high), prev), ((low, _), cur) in zip(ranged, ranged[1:]):
+        if low <= prev_high:
+            raise ValueError(f"Id ranges of {prev} and {cur} overlap; they cannot be merged by streaming")
+    return [f for _, f in ranged]
 
-    if not parquet_files:
-        print(f"No Parquet files found in {PARQUET_DIR}")
+def iter_sorted_tables(path: str):
+    """Row groups of a file in id order; the file is sorted whole only if it is not already."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    ids = pf.read(columns=["id"]).column("id").to_numpy()
+    if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+        print(f"{path} is not in id order, sorting it in memory...")
+        yield pq.read_table(path).sort_by("id")
         return
+    for i in range(pf.metadata.num_row_groups):
+        yield pf.read_row_group(i)
+
+def combine(parquet_dir: str = PARQUET_DIR, output_file: str = OUTPUT_FILE,
+            compression: str = COMPRESSION) -> int:
+    """
+    Stream the batch files of parquet_dir into output_file in id order.
 
-    print(f"Found {len(parquet_files)} Parquet files. Loading...")
+    Returns:
+        int: Rows written.
+    """
+    import pyarrow.parquet as pq
 
-    # Load all Parquet files into a single DataFrame
-    dfs = []
-    for f in parquet_files:
-        print(f"Loading {f}...")
-        df = pl.read_parquet(f)
-        dfs.append(df)
+    output = os.path.abspath(output_file)
+    files = [f for f in list_parquet_files(parquet_dir) if os.path.abspath(f) != output]
+    if not files:
+        print(f"No Parquet files found in {parquet_dir}")
+        return 0
+    files = order_by_id_range(files)
+    print(f"Found {len(files)} Parquet files with disjoint id ranges. Streaming...")
 
-    full_df = pl.concat(dfs).sort("id")
-    print(f"Concatenated DataFrame has {full_df.height} rows and {full_df.width} columns.")
+    schema = pq.read_schema(files[0])
+    tmp = output_file + ".tmp"
+    written = 0
+    start = time.time()
+    with pq.ParquetWriter(tmp, schema, compression=compression) as writer:
+        for f in files:
+            print(f"Loading {f}...")
+            for table in iter_sorted_tables(f):
+                writer.write_table(table.select(schema.names).cast(schema))
+                written += table.num_rows
+    os.replace(tmp, output_file)
+    print(f"Saved {written} rows to {output_file} in {time.time() - start:.1f}s")
+    return written
 
-    # Save to a single Parquet file
-    full_df.write_parquet(OUTPUT_FILE)
-    print(f"Saved concatenated DataFrame to {OUTPUT_FILE}")
+# -------------------------------
+# Main script
+# -------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine Parquet batch files into one file sorted by id")
+    parser.add_argument("--parquet", type=str, default=PARQUET_DIR, help="Directory of batch files")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Combined file (default: full_data.parquet in --parquet)")
+    parser.add_argument("--compression", type=str, default=COMPRESSION)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.parquet):
+        print(f"Error: Parquet directory does not exist: {args.parquet}")
+        return
+    output = args.output or os.path.join(args.parquet, "full_data.parquet")
+    combine(args.parquet, output, args.compression)
 
 if __name__ == "__main__":
     main()
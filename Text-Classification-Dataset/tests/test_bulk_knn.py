@@ -0,0 +1,83 @@
+import numpy as np
+import polars as pl
+import pytest
+from src.polars_ops.parquet_vectors import build_vector_store
+from src.operations import bulk_knn
+from src.operations.local_searcher import LocalKNNSearcher
+
+DIM = 8
+N = 300
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(1).standard_normal((N, DIM)).astype(np.float32)
+
+@pytest.fixture
+def store_dir(tmp_path, vectors):
+    fp = tmp_path / "vectors.parquet"
+    pl.DataFrame({
+        "id": list(range(1, N + 1)),
+        "text": [f"text {i}" for i in range(1, N + 1)],
+        "emb": vectors.tolist(),
+    }).write_parquet(fp)
+    out = str(tmp_path / "store")
+    build_vector_store(str(fp), out)
+    return out
+
+def expected_neighbours(vectors, k):
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k] + 1
+
+def test_local_all_pairs(tmp_path, store_dir, vectors):
+    searcher = LocalKNNSearcher(store_dir, metric_type="IP", block_rows=50)
+    chunks = bulk_knn.local_knn_chunks(searcher, top_k=5, query_chunk=64, workers=3)
+    out = str(tmp_path / "knn.parquet")
+    assert bulk_knn.write_knn_parquet(chunks, out, N) == N
+
+    df = pl.read_parquet(out)
+    assert df["id"].to_list() == list(range(1, N + 1))
+    assert np.array(df["neighbour_ids"].to_list()).tolist() == expected_neighbours(vectors, 5).tolist()
+    scores = np.array(df["scores"].to_list())
+    assert np.all(np.diff(scores, axis=1) <= 1e-6)  # best first
+
+class FakeHits:
+    def __init__(self, ids, distances):
+        self.ids = ids
+        self.distances = distances
+
+class FakeCollection:
+    def __init__(self, vectors, ids=None):
+        self.vectors = vectors
+        self.ids = np.arange(1, len(vectors) + 1) if ids is None else np.asarray(ids)
+        self.num_entities = len(vectors)
+
+    def query(self, expr, output_fields, limit):
+        last = int(expr.split(">")[1])
+        rows = np.flatnonzero(self.ids > last)[:limit]
+        return [{"id": int(self.ids[r]), "emb": self.vectors[r].tolist()} for r in rows[::-1]]
+
+    def search(self, data, anns_field, param, limit):
+        scores = np.asarray(data) @ self.vectors.T
+        order = np.argsort(-scores, axis=1)[:, :limit]
+        return [FakeHits(self.ids[row].tolist(), s[row].tolist()) for row, s in zip(order, scores)]
+
+def test_milvus_all_pairs(vectors):
+    chunks = list(bulk_knn.milvus_knn_chunks(FakeCollection(vectors), top_k=4, query_chunk=70, workers=2))
+    ids = np.concatenate([c.ids for c in chunks])
+    neighbours = np.concatenate([c.neighbour_ids for c in chunks])
+    assert ids.tolist() == list(range(1, N + 1))
+    assert neighbours.tolist() == expected_neighbours(vectors, 4).tolist()
+
+def test_milvus_all_pairs_reads_past_id_gaps(vectors):
+    # Ids far beyond num_entities still get their neighbours
+    ids = np.arange(1, N + 1) * 1000
+    chunks = list(bulk_knn.milvus_knn_chunks(FakeCollection(vectors, ids), top_k=4, query_chunk=70))
+    assert np.concatenate([c.ids for c in chunks]).tolist() == ids.tolist()
+    neighbours = np.concatenate([c.neighbour_ids for c in chunks])
+    assert neighbours.tolist() == (expected_neighbours(vectors, 4) * 1000).tolist()
+
+def test_plan_block_rows_respects_budget():
+    rows = bulk_knn.plan_block_rows(512 * 1024 ** 2, workers=4, query_chunk=2048, dim=384)
+    assert 4 * rows * (2 * 2048 + 384) * 4 <= 512 * 1024 ** 2
+    assert bulk_knn.plan_block_rows(1, 1, 2048, 384) == 1024
@@ -0,0 +1,45 @@
+import pytest
+import numpy as np
+from src.data_ingestion.checkpoint import IngestCheckpoint
+from src.data_ingestion.loader import SourcePosition
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = str(tmp_path / "ingest.checkpoint.json")
+    ckpt = IngestCheckpoint(path)
+    ckpt.start("test_collection", ["a.csv", "b.csv"])
+    ckpt.update(SourcePosition(0, 4096, 10), 101, np.arange(1, 101, dtype=np.uint64))
+    ckpt.update(SourcePosition(1, 0, 0), 151, np.arange(101, 151, dtype=np.uint64))
+
+    resumed = IngestCheckpoint(path)
+    state = resumed.load()
+    assert state["next_id"] == 151
+    assert state["file"] == "b.csv"
+    assert state["rows_inserted"] == 150
+    assert resumed.position() == SourcePosition(1, 0, 0)
+    assert np.array_equal(resumed.load_hashes(), np.arange(1, 151, dtype=np.uint64))
+
+def test_checkpoint_ignores_hashes_written_after_last_update(tmp_path):
+    path = str(tmp_path / "ingest.checkpoint.json")
+    ckpt = IngestCheckpoint(path)
+    ckpt.start("test_collection", ["a.csv"])
+    ckpt.update(SourcePosition(0, 100, 0), 11, np.arange(10, dtype=np.uint64))
+    # Simulate a crash after appending hashes but before the JSON write
+    with open(ckpt.hashes_path, "ab") as f:
+        np.arange(5, dtype=np.uint64).tofile(f)
+
+    resumed = IngestCheckpoint(path)
+    resumed.load()
+    assert len(resumed.load_hashes()) == 10
+
+def test_fresh_run_replaces_only_a_completed_checkpoint(tmp_path, monkeypatch):
+    import src.data_ingestion.config as config
+    from src.data_ingestion.pipeline import _open_checkpoint
+
+    monkeypatch.setattr(config, "CHECKPOINT_DIR", str(tmp_path))
+    monkeypatch.setitem(vars(config), "COLLECTION_NAME", "texts")
+    checkpoint, _, _, _ = _open_checkpoint(False, True, "pyarrow")
+    with pytest.raises(RuntimeError):
+        _open_checkpoint(False, True, "pyarrow")
+    checkpoint.mark_complete()
+    checkpoint, _, first_id, _ = _open_checkpoint(False, True, "pyarrow")
+    assert first_id == 1 and not checkpoint.state["complete"]
@@ -0,0 +1,115 @@
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+import src.operations.cluster_assigner as ca
+from src.operations.cluster_assigner import ClusterAssigner, LabelChunk, write_labels_milvus, write_labels_parquet
+
+@pytest.fixture(scope="module")
+def models():
+    vectors = np.random.default_rng(0).standard_normal((600, 16)).astype(np.float32)
+    scaler = StandardScaler().fit(vectors)
+    pca = IncrementalPCA(n_components=6).fit(scaler.transform(vectors))
+    kmeans = MiniBatchKMeans(n_clusters=7, random_state=0, n_init=3).fit(
+        pca.transform(scaler.transform(vectors)))
+    return vectors, scaler, pca, kmeans
+
+def test_fused_transform_matches_sklearn(models):
+    vectors, scaler, pca, kmeans = models
+    assigner = ClusterAssigner(scaler, pca, kmeans)
+    expected = pca.transform(scaler.transform(vectors))
+    assert np.allclose(assigner.transform(vectors), expected, atol=1e-4)
+
+    no_pca = ClusterAssigner(scaler, None, MiniBatchKMeans(n_clusters=3, n_init=1, random_state=0).fit(
+        scaler.transform(vectors)))
+    assert np.allclose(no_pca.transform(vectors), scaler.transform(vectors), atol=1e-5)
+
+def test_assign_matches_predict(models):
+    vectors, scaler, pca, kmeans = models
+    assigner = ClusterAssigner(scaler, pca, kmeans)
+    expected = kmeans.predict(pca.transform(scaler.transform(vectors)))
+    labels = assigner.assign(vectors, block_rows=100)
+    assert labels.dtype == np.int32
+    assert (labels == expected).mean() > 0.99
+
+    nearest = assigner.nearest(vectors[:20], 3)
+    assert nearest.shape == (20, 3)
+    assert (nearest[:, 0] == labels[:20]).all()
+    assert assigner.nearest(vectors[:2], 50).shape == (2, 7)
+
+def test_write_labels_parquet(tmp_path, models):
+    vectors, scaler, pca, kmeans = models
+    assigner = ClusterAssigner(scaler, pca, kmeans)
+    ids = np.arange(1, len(vectors) + 1)
+    chunks = [LabelChunk(ids[s:s + 250], vectors[s:s + 250], None) for s in range(0, len(vectors), 250)]
+    output = str(tmp_path / "cluster_ids.parquet")
+    counts = write_labels_parquet(assigner, chunks, output, len(vectors))
+
+    table = pq.read_table(output)
+    assert table.column("id").to_pylist() == ids.tolist()
+    assert table.column("cluster_id").to_pylist() == assigner.assign(vectors).tolist()
+    assert counts.sum() == len(vectors)
+
+class FakeTarget:
+    def __init__(self, num_entities=0):
+        self.num_entities = num_entities
+        self.inserts, self.partitions = [], set()
+
+    def has_partition(self, name):
+        return name in self.partitions
+
+    def create_partition(self, name):
+        self.partitions.add(name)
+
+    def insert(self, columns, partition_name=None):
+        self.inserts.append((len(columns[0]), partition_name))
+
+    def flush(self):
+        pass
+
+def test_write_labels_milvus_inserts_in_batches(models):
+    vectors, scaler, pca, kmeans = models
+    assigner = ClusterAssigner(scaler, pca, kmeans)
+    ids = np.arange(1, len(vectors) + 1)
+    chunks = [LabelChunk(ids, vectors, [str(i) for i in ids])]
+    target = FakeTarget()
+    counts = write_labels_milvus(assigner, chunks, target, len(vectors), batch_size=100)
+    assert [n for n, _ in target.inserts] == [100] * 6
+
+    target = FakeTarget()
+    write_labels_milvus(assigner, chunks, target, len(vectors), partitions=True, batch_size=40)
+    assert max(n for n, _ in target.inserts) <= 40
+    per_partition = {}
+    for n, name in target.inserts:
+        per_partition[name] = per_partition.get(name, 0) + n
+    assert per_partition == {ca.cluster_partition(c): int(n) for c, n in enumerate(counts) if n}
+
+def test_milvus_chunks_read_past_id_gaps(models):
+    vectors = models[0]
+    ids = np.concatenate([np.arange(1, 301), np.arange(100001, 100301)])
+
+    class Source:
+        def query(self, expr, output_fields, limit):
+            rows = np.flatnonzero(ids > int(expr.split(">")[1]))[:limit]
+            return [{"id": int(ids[r]), "emb": vectors[r], "text": str(ids[r])} for r in rows]
+
+    chunks = list(ca.milvus_chunks(Source(), page_rows=128, with_texts=True))
+    assert np.concatenate([c.ids for c in chunks]).tolist() == ids.tolist()
+    assert np.array_equal(np.concatenate([c.vectors for c in chunks]), vectors)
+    assert chunks[-1].texts[-1] == "100300"
+
+def test_open_target_refuses_a_filled_collection(monkeypatch):
+    import pymilvus
+
+    existing = {"texts_clustered": FakeTarget(num_entities=5)}
+    monkeypatch.setattr(pymilvus.utility, "has_collection", lambda name: name in existing)
+    monkeypatch.setattr(pymilvus.utility, "drop_collection", lambda name: existing.pop(name))
+    monkeypatch.setattr(pymilvus, "Collection", lambda name: existing[name])
+    monkeypatch.setattr(ca.milvus_client, "create_collection",
+                        lambda name, **kwargs: existing.setdefault(name, FakeTarget()))
+
+    with pytest.raises(RuntimeError, match="--overwrite"):
+        ca.open_target("texts_clustered")
+    assert ca.open_target("texts_clustered", overwrite=True).num_entities == 0
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+import src.data_ingestion.config as config
+
+# Importing the package (and the pipeline module) must stay cheap so that
+# worker processes and CLI tools start fast
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ("pandas", "pymilvus", "sentence_transformers", "torch", "sklearn")
+
+def run_python(code, **env):
+    """Run code in a fresh interpreter with no stdin and no COLLECTION_NAME."""
+    full_env = {k: v for k, v in os.environ.items()
+                if k != "COLLECTION_NAME" and not k.startswith(config.ENV_PREFIX)}
+    full_env.update(env)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, env=full_env, stdin=subprocess.DEVNULL,
+                         capture_output=True, text=True, timeout=60, check=True)
+    return out.stdout.strip()
+
+def test_import_is_cheap_and_non_interactive():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import src.data_ingestion, src.data_ingestion.pipeline\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    elapsed, loaded = run_python(code).split(" ", 1)
+    assert loaded == "[]"
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+
+def test_collection_name_resolved_lazily(tmp_path):
+    code = (
+        "from src.data_ingestion import config\n"
+        "try:\n"
+        "    config.COLLECTION_NAME\n"
+        "except RuntimeError:\n"
+        "    print('unset')\n"
+    )
+    assert run_python(code) == "unset"
+
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"collection_name": "from_file", "batch_size": 64}))
+    code = "from src.data_ingestion import config; print(config.COLLECTION_NAME, config.BATCH_SIZE)"
+    assert run_python(code, INGEST_CONFIG=str(settings)) == "from_file 64"
+    # Environment variables take precedence over the file
+    assert run_python(code, INGEST_CONFIG=str(settings), COLLECTION_NAME="from_env",
+                      INGEST_BATCH_SIZE="32") == "from_env 32"
+
+def test_parse_env():
+    assert config._parse_env("BATCH_SIZE", "128") == 128
+    assert config._parse_env("FLUSH_EVERY_SECONDS", "1.5") == 1.5
+    assert config._parse_env("CSV_FILES", os.pathsep.join(["a.csv", "b.csv"])) == ["a.csv", "b.csv"]
+    assert config._parse_env("EMBED_TORCH_THREADS", "4") == 4
+    assert config._parse_env("EMBED_CACHE_DIR", "none") is None
+    assert config._parse_env("INDEX_PARAMS", '{"M": 16, "efConstruction": 200}') == {"M": 16, "efConstruction": 200}
+
+def test_configure(monkeypatch):
+    monkeypatch.setattr(config, "BATCH_SIZE", config.BATCH_SIZE)
+    config.configure(batch_size=16)
+    assert config.BATCH_SIZE == 16
+    with pytest.raises(ValueError):
+        config.configure(batch_sise=16)
+
+def test_checkpoint_dir_follows_export_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "EXPORT_DIR", config.EXPORT_DIR)
+    monkeypatch.setattr(config, "CHECKPOINT_DIR", config.CHECKPOINT_DIR)
+    config.configure(export_dir=str(tmp_path))
+    assert config.checkpoint_dir() == str(tmp_path)
+    config.configure(checkpoint_dir=str(tmp_path / "ckpt"))
+    assert config.checkpoint_dir() == str(tmp_path / "ckpt")
@@ -0,0 +1,38 @@
+import pytest
+from src.data_ingestion import dedup
+
+def test_hashset_drops_duplicates_across_batches():
+    deduper = dedup.HashSetDeduplicator()
+    assert deduper.filter(["a", "b"]) == ["a", "b"]
+    assert deduper.filter(["b", "c"]) == ["c"]
+    assert deduper.dropped == 1
+    assert deduper.memory_bytes() > 0
+
+def test_bloom_drops_duplicates_across_batches():
+    deduper = dedup.BloomDeduplicator(capacity=1000, fp_rate=0.01)
+    first = [f"text {i}" for i in range(500)]
+    assert deduper.filter(first) == first
+    assert deduper.filter(first[:100]) == []
+    assert deduper.dropped == 100
+
+def test_bloom_false_positive_rate():
+    deduper = dedup.BloomDeduplicator(capacity=10000, fp_rate=0.01)
+    deduper.filter([f"seen {i}" for i in range(10000)])
+    unseen = [f"unseen {i}" for i in range(10000)]
+    false_positives = len(unseen) - len(deduper.filter(unseen))
+    assert false_positives < 300  # ~1% expected
+
+def test_make_deduplicator():
+    assert dedup.make_deduplicator("none") is None
+    with pytest.raises(ValueError):
+        dedup.make_deduplicator("exact")
+
+@pytest.mark.parametrize("mode", ["hashset", "bloom"])
+def test_add_hashes_restores_state(mode):
+    first = dedup.make_deduplicator(mode)
+    kept, hashes = first.filter_with_hashes(["a", "b", "c"])
+    assert kept == ["a", "b", "c"]
+
+    resumed = dedup.make_deduplicator(mode)
+    resumed.add_hashes(hashes)
+    assert resumed.filter(["b", "d"]) == ["d"]
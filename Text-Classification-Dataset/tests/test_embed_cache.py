@@ -0,0 +1,54 @@
+import pytest
+import numpy as np
+from src.data_ingestion.embed_cache import EmbeddingCache
+
+def make_vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+def test_cache_roundtrip_and_persistence(tmp_path):
+    texts = ["Hello world", "pytest check"]
+    vectors = make_vectors(2)
+
+    cache = EmbeddingCache(str(tmp_path), "test-model", dim=4, capacity=10)
+    _, keys, missing = cache.get_many(texts)
+    assert missing == [0, 1]
+    cache.put_many(keys, vectors)
+    cache.close()
+
+    # Reopen; lookups normalize the text the same way the preprocessor does
+    cache = EmbeddingCache(str(tmp_path), "test-model", dim=4, capacity=10)
+    cached, _, missing = cache.get_many(["  hello world ", "pytest check"])
+    assert missing == []
+    assert np.array_equal(cached, vectors)
+    assert cache.hit_rate == 1.0
+
+def test_cache_keys_depend_on_model(tmp_path):
+    a = EmbeddingCache(str(tmp_path), "model-a", dim=4, capacity=10)
+    b = EmbeddingCache(str(tmp_path), "model-b", dim=4, capacity=10)
+    assert a.key("same text") != b.key("same text")
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "test-model", dim=4, capacity=3)
+    _, keys, _ = cache.get_many(["a", "b", "c"])
+    cache.put_many(keys, make_vectors(3))
+    cache.get_many(["a"])  # "a" is now the most recently used
+
+    _, keys, _ = cache.get_many(["d"])
+    cache.put_many(keys, make_vectors(1, seed=1))
+
+    _, _, missing = cache.get_many(["a", "b", "c", "d"])
+    assert len(cache) == 3
+    assert missing == [1]  # "b" was evicted
+    assert cache.evictions == 1
+
+def test_cache_starts_over_when_dim_changes(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "test-model", dim=4, capacity=10)
+    _, keys, _ = cache.get_many(["a", "b"])
+    cache.put_many(keys, make_vectors(2))
+    cache.close()
+
+    # Same capacity, new dim: old keys must not hit the reset vectors
+    cache = EmbeddingCache(str(tmp_path), "test-model", dim=8, capacity=10)
+    _, _, missing = cache.get_many(["a", "b"])
+    assert len(cache) == 0
+    assert missing == [0, 1]
@@ -1,9 +1,69 @@
 import pytest
+import numpy as np
 import src.data_ingestion.embedder as embedder
 import src.data_ingestion.config as config
+from benchmarks.synthetic import STUB_MODEL_NAME, model_factory
+
+def stub_embedder(**kwargs):
+    return embedder.Embedder(STUB_MODEL_NAME, model_factory=model_factory(STUB_MODEL_NAME, config.VECTOR_DIM),
+                             **kwargs)
 
 def test_embedder_dim():
     model = embedder.Embedder(config.EMBED_MODEL_NAME)
     vectors = model.embed_batch(["hello world", "pytest check"], normalize=True)
     assert len(vectors) == 2
     assert len(vectors[0]) == config.VECTOR_DIM
+
+def test_embed_array_float32():
+    model = stub_embedder()
+    vectors = model.embed_array(["hello world", "pytest check"], normalize=True)
+    assert vectors.shape == (2, config.VECTOR_DIM)
+    assert vectors.dtype == np.float32
+    assert vectors.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+
+def test_normalize_rows_in_place():
+    vectors = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    out = embedder.normalize_rows(vectors)
+    assert out is vectors
+    assert np.allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_stub_model_is_deterministic_and_needs_no_torch():
+    model = stub_embedder()
+    a = model.embed_array(["the cat sat", "the cat sat down", "stock markets fell"])
+    b = stub_embedder().embed_array(["the cat sat"])
+    assert a.shape == (3, config.VECTOR_DIM)
+    assert np.array_equal(a[0], b[0])
+    assert a[0] @ a[1] > a[0] @ a[2]
+
+def test_plan_token_batches_respects_budget_and_covers_every_text():
+    lengths = np.array([5, 300, 12, 12, 40, 7, 256, 9, 3, 100])
+    batches = embedder.plan_token_batches(lengths, token_budget=64, max_batch=3)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) == 1 or len(batch) * lengths[batch].max() <= 64
+    assert [lengths[b].max() for b in batches] == sorted(lengths[b].max() for b in batches)
+
+def test_token_lengths_estimate_is_capped():
+    lengths = embedder.token_lengths(["", "one two three", "word " * 1000], max_seq_length=128)
+    assert lengths.tolist() == [2, 6, 128]
+
+def test_token_batching_keeps_input_order():
+    texts = ["short", "a much longer text " * 20, "", "mid length text here", "short"]
+    tokens = stub_embedder(batching="tokens", token_budget=40)
+    fixed = stub_embedder(batching="fixed")
+    assert np.allclose(tokens.embed_array(texts), fixed.embed_array(texts))
+    with pytest.raises(ValueError):
+        stub_embedder(batching="sorted")
+
+def test_token_lengths_with_tokenizers_tokenizer():
+    class Encoding:
+        def __init__(self, ids):
+            self.ids = ids
+
+    class Tokenizer:
+        def encode_batch(self, texts):
+            return [Encoding(list(range(len(t.split()) + 2))) for t in texts]
+
+    assert embedder.token_lengths(["a b c", "x " * 50], 16, Tokenizer()).tolist() == [5, 16]
@@ -0,0 +1,55 @@
+import json
+import numpy as np
+import src.data_ingestion.config as config
+from src.data_ingestion.loader import stream_text_batches
+from src.polars_ops.load_and_save_polars_vectors import export_collection
+from benchmarks import end_to_end
+from benchmarks.synthetic import MemoryCollection, generate
+
+def test_generate_is_deterministic_and_readable_by_both_engines(tmp_path):
+    first = generate(str(tmp_path / "a"), rows=3000, files=2, seed=1)
+    second = generate(str(tmp_path / "b"), rows=3000, files=2, seed=1)
+    for p, q in zip(first["paths"], second["paths"]):
+        assert open(p, "rb").read() == open(q, "rb").read()
+    # Reused as is when the parameters match
+    assert generate(str(tmp_path / "a"), rows=3000, files=2, seed=1)["timestamp"] == first["timestamp"]
+
+    counts = {engine: sum(len(b) for b in stream_text_batches(first["paths"], config.TEXT_COLUMN, 512,
+                                                              engine=engine))
+              for engine in ("pyarrow", "pandas")}
+    # Everything but the empty / "nan" rows is read, identically by both engines
+    assert counts["pyarrow"] == counts["pandas"]
+    assert 2900 < counts["pyarrow"] < 3000
+
+def test_memory_collection_serves_id_range_queries(tmp_path):
+    col = MemoryCollection()
+    vectors = np.arange(40, dtype=np.float32).reshape(10, 4)
+    col.insert([[6, 7, 8, 9, 10], [f"t{i}" for i in range(6, 11)], vectors[5:]])
+    col.insert([[1, 2, 3, 4, 5], [f"t{i}" for i in range(1, 6)], vectors[:5]])
+    assert col.num_entities == 0
+    col.flush()
+
+    rows = col.query("id >= 3 and id <= 7", ["id", "text", "emb"])
+    assert [r["id"] for r in rows] == [3, 4, 5, 6, 7]
+    assert rows[0]["text"] == "t3" and np.array_equal(rows[0]["emb"], vectors[2])
+    assert export_collection(col, str(tmp_path / "parquet"), batch_size=4, workers=2) == 10
+
+def test_run_appends_comparable_records(tmp_path):
+    results = str(tmp_path / "results.jsonl")
+    args = end_to_end.parser().parse_args([
+        "--rows", "2000", "--files", "2", "--dim", "16", "--engines", "pyarrow",
+        "--export-workers", "1", "--clusters", "3", "--work", str(tmp_path), "--results", results])
+    import src.operations.minibatch_kmeans as mk
+    settings = (config.VECTOR_DIM, config.CSV_FILES, config.BATCH_SIZE, mk.VERBOSE)
+    record = end_to_end.run(args)
+    # Settings and flags changed for the run are restored
+    assert (config.VECTOR_DIM, config.CSV_FILES, config.BATCH_SIZE, mk.VERBOSE) == settings
+    assert list(record["stages"])[:2] == ["read[pyarrow]", "read"]
+    assert record["stages"]["embed"]["rows"] == record["stages"]["export"]["rows"]
+    assert {"store", "kmeans"} <= set(record["stages"])
+
+    second = end_to_end.run(args)
+    history = [json.loads(line) for line in open(results)]
+    assert len(history) == 2
+    rows = end_to_end.compare(second, history[0])
+    assert all(r["previous_rows_per_s"] is not None for r in rows)
@@ -0,0 +1,56 @@
+import json
+import src.data_ingestion.config as config
+import src.data_ingestion.id_ranges as id_ranges
+from src.data_ingestion.dedup import make_deduplicator
+from src.data_ingestion.loader import stream_text_batches
+from src.data_ingestion.preprocessor import normalize_texts
+
+def write_csv(path, texts):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('"id"~"body_cleaned"\n')
+        for i, text in enumerate(texts):
+            f.write(f'"{i}"~"{text}"\n')
+
+def make_files(tmp_path):
+    files = []
+    for n in range(3):
+        # Repeats within and across files, plus blank rows
+        texts = [f"row {i % 40}" if i % 3 else f"file {n} row {i}" for i in range(120)]
+        texts[7] = "  "
+        fp = str(tmp_path / f"chunk_{n}.csv")
+        write_csv(fp, texts)
+        files.append(fp)
+    return files
+
+def sequential_rows(files, mode, batch_size):
+    deduper = make_deduplicator(mode)
+    rows = []
+    for batch in stream_text_batches(files, batch_size=batch_size):
+        batch = normalize_texts(batch)
+        rows.extend(deduper.filter(batch) if deduper else batch)
+    return {i + 1: t for i, t in enumerate(rows)}
+
+def test_ranges_match_sequential_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "READ_BLOCK_SIZE", 300)
+    files = make_files(tmp_path)
+    for mode in ("hashset", "none"):
+        ranges = id_ranges.plan_id_ranges(files, make_deduplicator(mode), batch_size=50)
+        assert [r.first_id for r in ranges[1:]] == [r.last_id + 1 for r in ranges[:-1]]
+
+        rows = {}
+        for r in reversed(ranges):  # any file order gives the same ids
+            for ids, texts in id_ranges.iter_file_batches(r, batch_size=16):
+                assert all(r.first_id <= i <= r.last_id for i in ids)
+                rows.update(zip(ids, texts))
+        assert rows == sequential_rows(files, mode, batch_size=50)
+
+def test_write_id_ranges(tmp_path):
+    files = make_files(tmp_path)
+    ranges = id_ranges.plan_id_ranges(files, make_deduplicator("hashset"))
+    path = str(tmp_path / "ranges.json")
+    id_ranges.write_id_ranges(ranges, path)
+    with open(path) as f:
+        manifest = json.load(f)
+    assert [(e["first_id"], e["last_id"]) for e in manifest["files"]] == \
+        [(r.first_id, r.last_id) for r in ranges]
+    assert manifest["files"][0]["rows_read"] == 120
@@ -0,0 +1,38 @@
+import numpy as np
+from benchmarks.index_sweep import expand_grid, exact_knn, recall_at_k, sample_rows, format_table
+
+def test_expand_grid():
+    configs = list(expand_grid(["IVF_FLAT", "HNSW"]))
+    assert ("IVF_FLAT", {"nlist": 1024}, [8, 16, 32, 64]) in configs
+    assert sum(1 for index_type, _, _ in configs if index_type == "HNSW") == 6
+
+    # Milvus rejects ef < top_k: those values are skipped, not silently raised
+    configs = list(expand_grid(["IVF_FLAT", "HNSW"], top_k=50))
+    assert ("IVF_FLAT", {"nlist": 1024}, [8, 16, 32, 64]) in configs
+    assert all(values == [64, 128] for index_type, _, values in configs if index_type == "HNSW")
+    assert next(expand_grid(["HNSW"], top_k=500))[2] == [500]
+
+def test_exact_knn_matches_brute_force():
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((500, 8)).astype(np.float32)
+    queries = rng.standard_normal((5, 8)).astype(np.float32)
+    truth = exact_knn(base, queries, 3, "L2", block_rows=64)
+    dists = ((queries[:, None, :] - base[None, :, :]) ** 2).sum(axis=2)
+    assert (truth == np.argsort(dists, axis=1)[:, :3]).all()
+
+def test_recall_at_k():
+    truth = np.array([[1, 2], [3, 4]])
+    found = np.array([[2, 9], [4, 3]])
+    assert recall_at_k(found, truth) == 0.75
+    assert recall_at_k(np.full((2, 2), -1), truth) == 0.0
+
+def test_sample_rows_are_disjoint():
+    base, queries = sample_rows(100, 90, 20)
+    assert len(base) == 80 and len(queries) == 20
+    assert not set(base) & set(queries)
+
+def test_format_table():
+    row = {"index_type": "HNSW", "build_params": {"M": 16}, "search_param": "ef=64", "build_s": 1.0,
+           "mem_mb": 10.0, "qps": 1000.0, "p50_ms": 1.0, "p99_ms": 2.0, "recall": 0.99}
+    lines = format_table([row]).splitlines()
+    assert len(lines) == 3 and "M=16" in lines[2]
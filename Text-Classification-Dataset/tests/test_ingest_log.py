@@ -0,0 +1,80 @@
+import re
+import pytest
+import numpy as np
+import src.data_ingestion.config as config
+from src.data_ingestion.dedup import hash_texts
+from src.data_ingestion.ingest_log import IngestLog, scan_collection
+from src.data_ingestion.pipeline import _open_ingest_log
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows  # id -> text
+
+    @property
+    def num_entities(self):
+        return len(self.rows)
+
+    def query(self, expr, output_fields, limit):
+        last = int(re.findall(r"\d+", expr)[0])
+        return [{"id": i, "text": t} for i, t in sorted(self.rows.items()) if i > last][:limit]
+
+def test_ingest_log_roundtrip(tmp_path):
+    path = str(tmp_path / "ingested_test.json")
+    log = IngestLog(path)
+    log.create("test")
+    log.begin_run(["a.csv"], incremental=False)
+    log.append(np.arange(1, 11, dtype=np.uint64), max_id=10)
+    # Simulate a crash after appending hashes but before the JSON write
+    with open(log.hashes_path, "ab") as f:
+        np.arange(5, dtype=np.uint64).tofile(f)
+
+    reopened = IngestLog(path)
+    reopened.load()
+    assert reopened.next_id == 11
+    assert reopened.state["runs"][0]["rows_inserted"] == 10
+    assert np.array_equal(reopened.load_hashes(), np.arange(1, 11, dtype=np.uint64))
+
+def test_scan_collection_skips_id_gaps():
+    # Gaps much wider than a page, and a last page that is exactly full
+    rows = {i: f"text {i}" for i in list(range(1, 6)) + list(range(30, 33)) + list(range(5000, 5004))}
+    hashes, max_id = scan_collection(FakeCollection(rows), query_rows=4)
+    assert max_id == 5003
+    assert np.array_equal(hashes, hash_texts(list(rows.values())))
+
+def test_open_ingest_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECKPOINT_DIR", str(tmp_path))
+    monkeypatch.setitem(vars(config), "COLLECTION_NAME", "test")
+    collection = FakeCollection({1: "one", 2: "two", 3: "three"})
+
+    # A plain run would reuse ids 1..3
+    with pytest.raises(RuntimeError, match="--incremental"):
+        _open_ingest_log(collection, incremental=False, resume=False)
+
+    # No log kept yet: rebuilt from the collection's texts
+    log = _open_ingest_log(collection, incremental=True, resume=False)
+    assert log.next_id == 4
+    assert np.array_equal(log.load_hashes(), hash_texts(["one", "two", "three"]))
+
+    # An emptied (dropped and recreated) collection starts a new log
+    log = _open_ingest_log(FakeCollection({}), incremental=False, resume=False)
+    assert log.next_id == 1 and log.state["num_hashes"] == 0
+
+def test_segments_before_loads_indexed_collections():
+    from src.data_ingestion import pipeline
+
+    class Collection:
+        name = "texts"
+
+        def __init__(self, rows, indexed):
+            self.num_entities, self.indexed, self.loaded = rows, indexed, False
+
+        def has_index(self):
+            return self.indexed
+
+        def load(self):
+            self.loaded = True
+
+    assert pipeline._segments_before(Collection(0, False)) == 0
+    col = Collection(10, True)
+    pipeline._segments_before(col)
+    assert col.loaded
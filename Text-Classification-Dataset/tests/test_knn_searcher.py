@@ -0,0 +1,127 @@
+import importlib
+import numpy as np
+import pytest
+import src.data_ingestion.milvus_client as milvus
+
+searcher_module = importlib.import_module("src.operations.KNN-searcher-adv")
+
+DIM = 8
+
+class FakeConnections:
+    @staticmethod
+    def connect(*args, **kwargs):
+        pass
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.num_entities = 100
+        self.searches = []
+        self.requests = []
+        self.params = []
+
+    def load(self):
+        pass
+
+    def insert(self, columns):
+        self.num_entities += len(columns[0])
+
+    def search(self, data, anns_field, param, limit, output_fields, expr, partition_names=None):
+        self.searches.append(len(data))
+        self.params.append(param)
+        self.requests.append((expr, partition_names))
+        return [[(int(abs(v).argmax()), limit)] for v in data]
+
+class FakeEmbedder:
+    def __init__(self, model_name, cache_dir=None, backend=None):
+        self.model = None
+        self.calls = []
+
+    def embed_array(self, texts, normalize=True):
+        self.calls.append(list(texts))
+        rng = np.random.default_rng([sum(map(ord, t)) for t in texts] or [0])
+        return rng.standard_normal((len(texts), DIM)).astype(np.float32)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def searcher(monkeypatch):
+    monkeypatch.setattr(searcher_module, "connections", FakeConnections)
+    monkeypatch.setattr(searcher_module, "Collection", FakeCollection)
+    monkeypatch.setattr(searcher_module, "Embedder", FakeEmbedder)
+    s = searcher_module.AdvancedKNNSearcher(collection_name="texts", vector_dim=DIM,
+                                            entity_check_seconds=None)
+    yield s
+    s.close()
+
+def test_repeated_queries_are_served_from_caches(searcher):
+    first = searcher.search(["Cheap flights", "hotel deals"], top_k=3)
+    again = searcher.search(["  cheap FLIGHTS ", "hotel deals"], top_k=3)
+    assert again == first
+    assert searcher.embedder.calls == [["cheap flights", "hotel deals"]]
+    assert searcher.collection.searches == [2]
+
+    # Different parameters are cached separately
+    searcher.search(["hotel deals"], top_k=5)
+    assert searcher.collection.searches == [2, 1]
+    stats = searcher.cache_stats()
+    assert stats["query_cache"]["hits"] == 3
+    assert stats["result_cache"]["hits"] == 2
+
+def test_inserts_invalidate_results(searcher):
+    searcher.search(["hotel deals"])
+    milvus.insert_batch(searcher.collection, [1], ["new"], np.zeros((1, DIM)), flush=False)
+    searcher.search(["hotel deals"])
+    assert searcher.collection.searches == [1, 1]
+    assert searcher.invalidations == 1
+
+    # Inserts into another collection leave the cache alone
+    milvus.insert_batch(FakeCollection("other"), [1], ["new"], np.zeros((1, DIM)), flush=False)
+    searcher.search(["hotel deals"])
+    assert searcher.collection.searches == [1, 1]
+
+def test_entity_count_change_invalidates_results(searcher):
+    searcher.entity_check_seconds = 1e-9
+    searcher.search(["hotel deals"])
+    searcher.collection.num_entities += 5  # insert from another process
+    searcher.search(["hotel deals"])
+    assert searcher.collection.searches == [1, 1]
+
+class FakeAssigner:
+    """Nearest clusters = the indices of the largest coordinates."""
+
+    def nearest(self, vectors, n):
+        return np.argsort(-vectors, axis=1)[:, :n]
+
+def test_cluster_pruned_search_groups_queries_by_probe(searcher):
+    searcher.cluster_assigner = FakeAssigner()
+    vectors = np.zeros((3, DIM), dtype=np.float32)
+    vectors[0, [1, 2]] = [2, 1]
+    vectors[1, [2, 1]] = [2, 1]  # same clusters as query 0, other order
+    vectors[2, [5, 6]] = [2, 1]
+
+    results = searcher.search_vectors(vectors, top_k=3, clusters=2, filter_expr="id > 10")
+    assert len(results) == 3
+    assert searcher.collection.searches == [2, 1]
+    assert searcher.collection.requests == [("(id > 10) and cluster_id in [1, 2]", None),
+                                            ("(id > 10) and cluster_id in [5, 6]", None)]
+
+    searcher.cluster_layout = "partition"
+    searcher.search_vectors(vectors[2:], top_k=3, clusters=1)
+    assert searcher.collection.requests[-1] == (None, ["cluster_5"])
+
+    # Unpruned search is unchanged, and pruning without a model is an error
+    searcher.search_vectors(vectors[:1], top_k=3, clusters=0)
+    assert searcher.collection.requests[-1] == (None, None)
+    searcher.cluster_assigner = None
+    with pytest.raises(ValueError):
+        searcher.search_vectors(vectors, clusters=2)
+
+def test_search_param_follows_index_type(searcher, monkeypatch):
+    import src.data_ingestion.config as config
+
+    monkeypatch.setattr(config, "INDEX_TYPE", "HNSW")
+    monkeypatch.setattr(config, "SEARCH_PARAM", None)
+    searcher.search(["hotel deals"], top_k=5)
+    assert searcher.collection.params[-1]["params"] == {"ef": 64}
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import numpy as np
+from src.operations import knn_service
+
+class FakeEntity(dict):
+    pass
+
+class FakeHit:
+    def __init__(self, id, score, text):
+        self.id = id
+        self.score = score
+        self.entity = FakeEntity(text=text)
+
+class FakeSearcher:
+    """Scores every stored text by dot product with the query vector."""
+
+    def __init__(self, dim=8):
+        self.texts = [f"doc {i}" for i in range(20)]
+        self.vectors = np.random.default_rng(0).standard_normal((20, dim)).astype(np.float32)
+        self.encode_calls = []
+        self.search_calls = []
+
+    def embed_text(self, texts):
+        self.encode_calls.append(list(texts))
+        return np.stack([self.vectors[hash(t) % 20] for t in texts])
+
+    def search_vectors(self, vectors, top_k=5, metric_type=None, nprobe=None, filter_expr=None):
+        self.search_calls.append((len(vectors), top_k, filter_expr))
+        results = []
+        for v in vectors:
+            scores = self.vectors @ v
+            order = np.argsort(-scores)[:top_k]
+            results.append([FakeHit(int(i), float(scores[i]), self.texts[i]) for i in order])
+        return results
+
+def test_concurrent_queries_are_coalesced():
+    searcher = FakeSearcher()
+
+    async def run():
+        batcher = knn_service.QueryBatcher(searcher, window_ms=50)
+        batcher.start()
+        queries = [(f"query {i % 10}", 3 + i % 3, "id > 5" if i % 2 else None) for i in range(40)]
+        results = await asyncio.gather(*(batcher.search(t, top_k=k, filter_expr=f) for t, k, f in queries))
+        await batcher.close()
+        return queries, results
+
+    queries, results = asyncio.run(run())
+    assert len(searcher.encode_calls) == 1
+    assert len(searcher.encode_calls[0]) == 10  # identical texts encoded once
+    assert sorted(c[2] or "" for c in searcher.search_calls) == ["", "id > 5"]
+    for (_, top_k, _), hits in zip(queries, results):
+        assert len(hits) == top_k
+    # Same text and filter give the same hits regardless of batching
+    assert results[0] == results[10][:len(results[0])]
+
+def test_http_search_and_metrics():
+    searcher = FakeSearcher()
+
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        status = (await reader.readline()).split()[1]
+        response = await reader.read()
+        writer.close()
+        return int(status), json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+    async def run():
+        batcher = knn_service.QueryBatcher(searcher, window_ms=20)
+        batcher.start()
+        service = knn_service.KNNService(batcher)
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        responses = await asyncio.gather(*(
+            request(port, "POST", "/search", {"queries": [f"q{i}", "shared"], "top_k": 2})
+            for i in range(5)
+        ))
+        bad = await request(port, "POST", "/search", {"top_k": 2})
+        metrics = await request(port, "GET", "/metrics")
+        server.close()
+        await batcher.close()
+        return responses, bad, metrics
+
+    responses, bad, (status, metrics) = asyncio.run(run())
+    assert all(s == 200 and len(r["results"]) == 2 for s, r in responses)
+    assert all(len(r["results"][0]["hits"]) == 2 for _, r in responses)
+    assert bad[0] == 400
+    assert status == 200
+    assert metrics["requests"] == 5 and metrics["queries"] == 10
+    assert metrics["batches"] < 5
+    assert metrics["latency_ms"]["p99"] is not None
@@ -7,3 +7,48 @@ def test_stream_texts():
     texts = [next(gen) for _ in range(5)]  # take 5 rows
     assert all(isinstance(t, str) for t in texts)
     assert len(texts) == 5
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('"id"~"body_cleaned"~"other"\n')
+        for row in rows:
+            f.write(row + "\n")
+
+def test_engines_yield_same_batches(tmp_path, monkeypatch):
+    rows = []
+    for i in range(300):
+        if i % 50 == 3:
+            rows.append(f'"{i}"~"extra field {i}"~"x"~"y"')  # too many fields
+        elif i % 70 == 5:
+            rows.append(f'"{i}"~"short row {i}"')  # too few fields
+        elif i % 90 == 7:
+            rows.append(f'"{i}"~"nan"~"x"')  # read as missing
+        else:
+            rows.append(f'"{i}"~"text ""{i}"" ~ tilde"~"x"')
+    fp = str(tmp_path / "chunk.csv")
+    write_csv(fp, rows)
+
+    expected = list(loader.stream_text_batches([fp], batch_size=64, engine="pandas"))
+    assert list(loader.stream_text_batches([fp], batch_size=64, engine="pyarrow")) == expected
+
+    # Small blocks exercise block boundaries and the pandas fallback
+    monkeypatch.setattr(config, "READ_BLOCK_SIZE", 256)
+    assert list(loader.stream_text_batches([fp], batch_size=64, engine="pyarrow")) == expected
+
+def test_resume_from_positions(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "READ_BLOCK_SIZE", 200)
+    files = []
+    for n in range(2):
+        fp = str(tmp_path / f"chunk_{n}.csv")
+        write_csv(fp, [f'"{i}"~"file {n} row {i}"~"x"' for i in range(100)])
+        files.append(fp)
+
+    batches = list(loader.stream_text_batches(files, batch_size=30, with_positions=True))
+    texts = [t for batch, _ in batches for t in batch]
+    assert len(texts) == 200
+
+    consumed = 0
+    for batch, position in batches:
+        consumed += len(batch)
+        rest = loader.stream_text_batches(files, batch_size=30, start=position)
+        assert [t for b in rest for t in b] == texts[consumed:]
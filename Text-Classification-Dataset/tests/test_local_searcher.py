@@ -0,0 +1,153 @@
+import json
+import os
+import joblib
+import numpy as np
+import polars as pl
+import pytest
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+from src.polars_ops.parquet_vectors import build_vector_store, VectorStore
+from src.operations import local_searcher
+
+DIM = 16
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((500, DIM)).astype(np.float32)
+
+@pytest.fixture
+def store_dir(tmp_path, vectors):
+    parquet_dir = tmp_path / "parquet"
+    parquet_dir.mkdir()
+    # Two batch files written out of order, ids starting at 1
+    for start, end in ((301, 500), (1, 300)):
+        pl.DataFrame({
+            "id": list(range(start, end + 1)),
+            "text": [f"text {i}" for i in range(start, end + 1)],
+            "emb": vectors[start - 1:end].tolist(),
+        }).write_parquet(parquet_dir / f"vectors_{start}_{end}.parquet")
+    out = str(tmp_path / "store")
+    build_vector_store(str(parquet_dir), out, batch_rows=128)
+    return out
+
+@pytest.fixture
+def model_dir(tmp_path, vectors):
+    out = tmp_path / "model"
+    out.mkdir()
+    scaler = StandardScaler().fit(vectors)
+    pca = IncrementalPCA(n_components=8).fit(scaler.transform(vectors))
+    kmeans = MiniBatchKMeans(n_clusters=5, random_state=0, n_init=3).fit(
+        pca.transform(scaler.transform(vectors)))
+    files = {"scaler": "scaler.joblib", "pca": "incremental_pca.joblib", "kmeans": "minibatch_kmeans.joblib"}
+    for key, model in (("scaler", scaler), ("pca", pca), ("kmeans", kmeans)):
+        joblib.dump(model, out / files[key])
+    (out / "metadata.json").write_text(json.dumps({"use_pca": True, "model_files": files}))
+    return str(out)
+
+def brute_force(vectors, queries, metric, k):
+    if metric == "IP":
+        scores = queries @ vectors.T
+    elif metric == "COSINE":
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ \
+                 (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).T
+    else:
+        scores = -((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(-1)
+    return np.argsort(-scores, axis=1)[:, :k] + 1  # ids are rows + 1
+
+def test_store_roundtrip(store_dir, vectors):
+    store = VectorStore(store_dir)
+    assert len(store) == 500 and store.dim == DIM and store.ids_sorted
+    np.testing.assert_array_equal(store.vectors, vectors)
+    assert store.text(41) == "text 42"
+    assert store.rows_of_ids([1, 500, 9999]).tolist() == [0, 499, -1]
+
+@pytest.mark.parametrize("metric", ["IP", "L2", "COSINE"])
+def test_flat_search_is_exact(store_dir, vectors, metric):
+    searcher = local_searcher.LocalKNNSearcher(store_dir, metric_type=metric, block_rows=64)
+    queries = vectors[:7] + 0.1
+    results = searcher.search_vectors(queries, top_k=10)
+    expected = brute_force(vectors, queries, metric, 10)
+    assert [[h.id for h in hits] for hits in results] == expected.tolist()
+    if metric == "L2":
+        assert results[0][0].score == pytest.approx(float(((queries[0] - vectors[0]) ** 2).sum()), rel=1e-4)
+
+def test_filter(store_dir, vectors):
+    searcher = local_searcher.LocalKNNSearcher(store_dir, block_rows=64)
+    results = searcher.search_vectors(vectors[:3], top_k=500, filter_expr="id > 100 and id not in [200, 201]")
+    ids = {h.id for h in results[0]}
+    assert len(ids) == 398 and min(ids) == 101 and 200 not in ids
+    assert searcher.search_vectors(vectors[:1], top_k=5, filter_expr="id in [3, 4]")[0][0].id in (3, 4)
+    with pytest.raises(ValueError):
+        searcher.search_vectors(vectors[:1], filter_expr="text == 'x'")
+
+def test_ivf_search(store_dir, model_dir, vectors):
+    flat = local_searcher.LocalKNNSearcher(store_dir)
+    ivf = local_searcher.LocalKNNSearcher(store_dir, index="ivf", model_dir=model_dir, nprobe=5)
+    assert os.path.exists(os.path.join(store_dir, local_searcher.IVF_FILE))
+    queries = vectors[:20]
+    exact = [[h.id for h in hits] for hits in flat.search_vectors(queries, top_k=5)]
+    # Probing every cluster is exact
+    assert [[h.id for h in hits] for hits in ivf.search_vectors(queries, top_k=5)] == exact
+    # A query vector from the store is always found in its own cluster
+    one = ivf.search_vectors(queries, top_k=1, nprobe=1, metric_type="L2")
+    assert [hits[0].id for hits in one] == list(range(1, 21))
+
+@pytest.mark.parametrize("metric", ["IP", "L2", "COSINE"])
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantized_search_reranks_exactly(store_dir, vectors, metric, dtype):
+    searcher = local_searcher.LocalKNNSearcher(store_dir, metric_type=metric, block_rows=64,
+                                               quantized=dtype, rerank=4)
+    assert searcher.quantized.nbytes == vectors.size * (1 if dtype == "int8" else 2)
+    queries = vectors[:7] + 0.1
+    results = searcher.search_vectors(queries, top_k=10)
+    expected = brute_force(vectors, queries, metric, 10)
+    # Candidates are rescored on the float32 vectors, so scores are exact
+    assert [[h.id for h in hits] for hits in results] == expected.tolist()
+    exact = local_searcher.LocalKNNSearcher(store_dir, metric_type=metric).search_vectors(queries, top_k=10)
+    assert [h.score for h in results[0]] == pytest.approx([h.score for h in exact[0]], rel=1e-5)
+
+    # Fewer rows than candidates: results are padded like the exact search
+    scores, rows = searcher.search_rows(queries[:1], top_k=5, filter_expr="id <= 3")
+    assert sorted(rows[0][:3]) == [0, 1, 2] and (rows[0][3:] == -1).all()
+
+def test_quantized_vectors_follow_store_rebuilds(tmp_path, store_dir, vectors):
+    local_searcher.LocalKNNSearcher(store_dir, quantized="int8")
+    codes_path = os.path.join(store_dir, "vectors_int8.npy")
+    metadata_path = os.path.join(store_dir, "quantization_int8.json")
+    stale = {path: open(path, "rb").read() for path in (codes_path, metadata_path)}
+
+    parquet_dir = tmp_path / "smaller"
+    parquet_dir.mkdir()
+    pl.DataFrame({"id": list(range(1, 101)), "text": [f"text {i}" for i in range(1, 101)],
+                  "emb": vectors[:100].tolist()}).write_parquet(parquet_dir / "vectors_1_100.parquet")
+    build_vector_store(str(parquet_dir), store_dir)
+
+    # Quantized vectors left over from the old rows are rebuilt rather than used
+    for path, data in stale.items():
+        with open(path, "wb") as f:
+            f.write(data)
+    searcher = local_searcher.LocalKNNSearcher(store_dir, quantized="int8")
+    assert len(searcher.quantized.codes) == 100
+    with open(metadata_path) as f:
+        assert json.load(f)["store"] == VectorStore(store_dir).fingerprint
+
+def test_ivf_index_follows_store_rebuilds(tmp_path, store_dir, model_dir, vectors):
+    local_searcher.LocalKNNSearcher(store_dir, index="ivf", model_dir=model_dir)
+    ivf_path = os.path.join(store_dir, local_searcher.IVF_FILE)
+    stale = open(ivf_path, "rb").read()
+
+    parquet_dir = tmp_path / "smaller"
+    parquet_dir.mkdir()
+    pl.DataFrame({"id": list(range(1, 101)), "text": [f"text {i}" for i in range(1, 101)],
+                  "emb": vectors[:100].tolist()}).write_parquet(parquet_dir / "vectors_1_100.parquet")
+    build_vector_store(str(parquet_dir), store_dir)
+    assert not os.path.exists(ivf_path)
+
+    # An index left over from the old rows is rebuilt rather than used
+    with open(ivf_path, "wb") as f:
+        f.write(stale)
+    searcher = local_searcher.LocalKNNSearcher(store_dir, index="ivf", model_dir=model_dir, nprobe=5)
+    assert len(searcher.ivf.assignments) == 100
+    hits = searcher.search_vectors(vectors[:3], top_k=1, metric_type="L2")
+    assert [h[0].id for h in hits] == [1, 2, 3]
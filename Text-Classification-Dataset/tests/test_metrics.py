@@ -0,0 +1,60 @@
+import json
+import pstats
+import time
+import pytest
+from src.data_ingestion.metrics import StageMetrics, StageProfiler
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_stage_metrics_jsonl_and_summary(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    metrics = StageMetrics(path, mode="serial")
+    for batch in metrics.timed_iter("read", [[1, 2, 3], [4, 5]]):
+        with metrics.stage("embed", len(batch)):
+            busy(0.001)
+    with metrics.stage("index") as timing:
+        timing.rows = 5
+
+    assert metrics.totals["read"]["rows"] == 5
+    assert metrics.totals["embed"] == {"calls": 2, "rows": 5, "seconds": pytest.approx(0.002, abs=0.01)}
+    assert [r["stage"] for r in metrics.summary()] == ["read", "embed", "index"]
+    assert "rows_per_s" in metrics.format_summary()
+    assert metrics.close() == []
+
+    records = [json.loads(line) for line in open(path)]
+    events = [r["event"] for r in records]
+    assert events.count("summary") == 3 and events[-1] == "run"
+    assert records[-1]["mode"] == "serial"
+    assert {r["stage"] for r in records if r["event"] == "stage"} == {"read", "embed", "index"}
+
+def test_profiler_rejects_unknown_stage():
+    with pytest.raises(ValueError):
+        StageProfiler("parse")
+
+def test_cprofile_covers_only_the_profiled_stage(tmp_path):
+    output = str(tmp_path / "embed.prof")
+    metrics = StageMetrics(profiler=StageProfiler("embed", "cprofile", output))
+    with metrics.stage("read"):
+        busy(0.001)
+    with metrics.stage("embed"):
+        busy(0.001)
+    metrics.close()
+
+    functions = {func for _, _, func in pstats.Stats(output).stats}
+    assert "busy" in functions
+    assert metrics.totals["read"]["calls"] == 1
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    output = str(tmp_path / "embed.folded")
+    metrics = StageMetrics(profiler=StageProfiler("embed", "sample", output, interval=0.001))
+    with metrics.stage("embed"):
+        busy(0.1)
+    report = metrics.close()
+
+    lines = open(output).read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_metrics.py:busy" in line for line in lines)
+    assert report[0].startswith("Sampled")
@@ -0,0 +1,110 @@
+import pytest
+import src.data_ingestion.milvus_client as milvus
+
+class FakeCollection:
+    def __init__(self):
+        self.inserts = []
+        self.flushes = 0
+
+    def insert(self, columns):
+        self.inserts.append(len(columns[0]))
+
+    def flush(self):
+        self.flushes += 1
+
+def add_rows(inserter, start, n, dim=4):
+    ids = list(range(start, start + n))
+    texts = [f"text {i}" for i in ids]
+    embeddings = [[0.1] * dim for _ in ids]
+    inserter.add(ids, texts, embeddings)
+
+def test_flush_policy_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        milvus.FlushPolicy("always")
+
+def test_buffered_inserter_flushes_only_at_end():
+    col = FakeCollection()
+    inserter = milvus.BufferedInserter(col, milvus.FlushPolicy("end"), buffer_bytes=1000)
+    for start in range(1, 101, 10):
+        add_rows(inserter, start, 10)
+    inserter.close()
+
+    assert sum(col.inserts) == 100
+    assert len(col.inserts) < 10  # batches were coalesced
+    assert col.flushes == 1
+
+def test_buffered_inserter_flushes_every_n_rows():
+    col = FakeCollection()
+    policy = milvus.FlushPolicy("rows", every_rows=20)
+    inserter = milvus.BufferedInserter(col, policy, buffer_bytes=1)
+    for start in range(1, 61, 10):
+        add_rows(inserter, start, 10)
+    inserter.close()
+
+    assert sum(col.inserts) == 60
+    assert col.flushes == 4  # after rows 20, 40, 60 and on close
+
+def test_buffered_inserter_never_flushes():
+    col = FakeCollection()
+    inserter = milvus.BufferedInserter(col, milvus.FlushPolicy("never"))
+    add_rows(inserter, 1, 10)
+    inserter.close()
+
+    assert col.inserts == [10]
+    assert col.flushes == 0
+
+def test_buffered_inserter_records_stage_metrics():
+    from src.data_ingestion.metrics import StageMetrics
+
+    metrics = StageMetrics()
+    inserter = milvus.BufferedInserter(FakeCollection(), milvus.FlushPolicy("rows", every_rows=20),
+                                       buffer_bytes=1, metrics=metrics)
+    for start in range(1, 51, 10):
+        add_rows(inserter, start, 10)
+    inserter.close()
+
+    assert metrics.totals["insert"]["calls"] == 5 and metrics.totals["insert"]["rows"] == 50
+    # Flushes after rows 20 and 40, and of the last 10 rows on close
+    assert metrics.totals["flush"]["calls"] == 3 and metrics.totals["flush"]["rows"] == 50
+
+def test_search_params_per_index_type():
+    assert milvus.search_params("IVF_SQ8", "IP", 16) == {"metric_type": "IP", "params": {"nprobe": 16}}
+    assert milvus.search_params("HNSW", "L2", 64) == {"metric_type": "L2", "params": {"ef": 64}}
+    assert milvus.search_params("FLAT", "IP", 16) == {"metric_type": "IP", "params": {}}
+
+def test_search_params_defaults(monkeypatch):
+    import src.data_ingestion.config as config
+
+    monkeypatch.setattr(config, "SEARCH_PARAM", None)
+    assert milvus.search_params("HNSW", "IP") == {"metric_type": "IP", "params": {"ef": 64}}
+    assert milvus.search_params("HNSW", "IP", 16, top_k=100)["params"] == {"ef": 100}
+    assert milvus.search_params("IVF_FLAT", "IP")["params"] == {"nprobe": 10}
+    monkeypatch.setattr(config, "SEARCH_PARAM", 32)
+    assert milvus.search_params("IVF_PQ", "IP")["params"] == {"nprobe": 32}
+    assert milvus.search_params("FLAT", "IP")["params"] == {}
+
+def test_get_max_id_finds_ids_past_num_entities():
+    class Collection:
+        def __init__(self, ids):
+            self.ids = ids
+            self.num_entities = len(ids)
+
+        def query(self, expr, output_fields, limit):
+            first = int(expr.split(">=")[1])
+            return [{"id": i} for i in self.ids if i >= first][:limit]
+
+    assert milvus.get_max_id(Collection([])) == 0
+    assert milvus.get_max_id(Collection([1])) == 1
+    assert milvus.get_max_id(Collection(list(range(1, 11)))) == 10
+    assert milvus.get_max_id(Collection([1, 2, 3, 5000, 123457])) == 123457
+
+def test_iter_id_pages_skips_id_gaps():
+    class Collection:
+        ids = [1, 2, 3, 4, 5, 30, 31, 32, 5000, 5001, 5002, 5003]
+
+        def query(self, expr, output_fields, limit):
+            last = int(expr.split(">")[1])
+            return [{"id": i, "emb": [i]} for i in reversed(self.ids) if i > last][-limit:]
+
+    pages = list(milvus.iter_id_pages(Collection(), ["emb"], page_rows=4))
+    assert [[r["id"] for r in page] for page in pages] == [[1, 2, 3, 4], [5, 30, 31, 32], [5000, 5001, 5002, 5003]]
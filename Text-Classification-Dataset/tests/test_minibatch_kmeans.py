@@ -0,0 +1,77 @@
+import json
+import re
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+import src.operations.minibatch_kmeans as mk
+
+class FakeCollection:
+    name = "fake"
+
+    def __init__(self, vectors, ids=None):
+        self.vectors = vectors
+        self.ids = list(range(1, len(vectors) + 1)) if ids is None else ids
+
+    def query(self, expr, output_fields, limit):
+        last = int(re.findall(r"\d+", expr)[0])
+        return [{"id": i, "emb": list(v)} for i, v in zip(self.ids, self.vectors) if i > last][:limit]
+
+def test_cache_milvus_vectors(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((100, 4)).astype(np.float32)
+    path = str(tmp_path / "cache.npy")
+    cached = mk.cache_milvus_vectors(FakeCollection(vectors), 100, path, batch_size=30, dim=4)
+    assert np.array_equal(cached, vectors)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache.npy", "cache.npy.json"]
+
+    # Ids far past num_entities are still read
+    ids = list(range(1, 51)) + list(range(100001, 100051))
+    cached = mk.cache_milvus_vectors(FakeCollection(vectors, ids), 100, path, batch_size=30, dim=4)
+    assert np.array_equal(cached, vectors)
+
+    # Fewer rows than reported: trimmed to the rows fetched, and not recorded as fresh
+    cached = mk.cache_milvus_vectors(FakeCollection(vectors[:70]), 100, path, batch_size=30, dim=4)
+    assert cached.shape == (70, 4)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache.npy"]
+    assert mk.load_cached_vectors(path, "fake", 100) is None
+
+def test_cached_vectors_are_stale_once_the_collection_changes(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((100, 4)).astype(np.float32)
+    path = str(tmp_path / "cache.npy")
+    assert mk.load_cached_vectors(path, "fake", 100) is None
+    mk.cache_milvus_vectors(FakeCollection(vectors), 100, path, batch_size=30, dim=4)
+    assert mk.load_cached_vectors(path, "fake", 100).shape == (100, 4)
+    assert mk.load_cached_vectors(path, "fake", 120) is None
+    assert mk.load_cached_vectors(path, "other", 100) is None
+
+def test_train_from_local_array_matches_two_fetches():
+    vectors = np.random.default_rng(1).standard_normal((300, 4)).astype(np.float32)
+    col = FakeCollection(vectors)
+
+    def fit(batches):
+        kmeans = MiniBatchKMeans(n_clusters=3, batch_size=100, random_state=0, n_init=1)
+        total = mk.train(batches, StandardScaler(), None, kmeans)
+        return total, kmeans.cluster_centers_
+
+    total_m, centers_m = fit(lambda: mk.milvus_batches(col, batch_size=100))
+    total_a, centers_a = fit(lambda: mk.prefetch(mk.array_batches(vectors, batch_size=100)))
+    assert total_m == total_a == 300
+    assert np.allclose(centers_m, centers_a)
+
+def test_update_model_fits_only_new_vectors(tmp_path, monkeypatch):
+    import joblib
+    rng = np.random.default_rng(2)
+    old, new = rng.standard_normal((300, 4)).astype(np.float32), rng.standard_normal((50, 4)).astype(np.float32)
+    scaler = StandardScaler().fit(old)
+    kmeans = MiniBatchKMeans(n_clusters=3, batch_size=100, random_state=0, n_init=1).fit(scaler.transform(old))
+    joblib.dump(scaler, tmp_path / "scaler.joblib")
+    joblib.dump(kmeans, tmp_path / "minibatch_kmeans.joblib")
+    (tmp_path / "metadata.json").write_text(json.dumps({
+        "num_vectors_processed": 300, "use_pca": False,
+        "model_files": {"scaler": mk.SCALER_FILE, "pca": None, "kmeans": mk.MODEL_FILE}}))
+
+    assert mk.update_model(mk.array_batches(new, batch_size=20), str(tmp_path), source="test") == 50
+    updated = joblib.load(tmp_path / "minibatch_kmeans.joblib")
+    assert not np.allclose(updated.cluster_centers_, kmeans.cluster_centers_)
+    metadata = json.loads((tmp_path / "metadata.json").read_text())
+    assert metadata["num_vectors_processed"] == 350
+    assert metadata["updates"][0]["num_vectors"] == 50
@@ -0,0 +1,68 @@
+import os
+import pytest
+import numpy as np
+import src.data_ingestion.embedder as embedder
+import src.data_ingestion.onnx_backend as onnx_backend
+import src.data_ingestion.config as config
+from benchmarks.synthetic import STUB_MODEL_NAME, model_factory
+
+def test_pooling_ignores_padding():
+    hidden = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(onnx_backend.pool(hidden, mask, "mean"), [[2.0, 3.0]])
+    assert np.allclose(onnx_backend.pool(hidden, mask, "max"), [[3.0, 4.0]])
+    assert np.allclose(onnx_backend.pool(hidden, mask, "cls"), [[1.0, 2.0]])
+
+def test_cosine_parity_and_model_dir(tmp_path):
+    a = np.array([[1.0, 0.0], [0.0, 2.0]])
+    parity = onnx_backend.cosine_parity(a, np.array([[2.0, 0.0], [1.0, 1.0]]))
+    assert parity["min_cosine"] == pytest.approx(np.sqrt(0.5), abs=1e-6)
+    assert parity["mean_cosine"] == pytest.approx((1 + np.sqrt(0.5)) / 2, abs=1e-6)
+    path = onnx_backend.model_dir("sentence-transformers/all-MiniLM-L6-v2", str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.basename(path) == "sentence-transformers_all-MiniLM-L6-v2"
+
+def test_embedder_backend_option():
+    with pytest.raises(ValueError):
+        embedder.Embedder(STUB_MODEL_NAME, backend="tensorrt")
+    # A model from a factory has nothing to export
+    model = embedder.Embedder(STUB_MODEL_NAME, backend="onnx",
+                              model_factory=model_factory(STUB_MODEL_NAME, config.VECTOR_DIM))
+    assert model.embed_array(["hello world"]).shape == (1, config.VECTOR_DIM)
+
+def test_ensure_model_replaces_another_models_export(tmp_path, monkeypatch):
+    exports = []
+
+    def export_model(model_name, path, opset):
+        exports.append((model_name, opset))
+        os.makedirs(path, exist_ok=True)
+        onnx_backend._write_metadata(path, {"model_name": model_name, "opset": opset,
+                                            "export_seconds": 0, "parity": {"fp32": {}}})
+        return onnx_backend.load_metadata(path)
+
+    monkeypatch.setattr(onnx_backend, "export_model", export_model)
+    root = str(tmp_path)
+    # "org/model" and "org_model" share a directory
+    first = onnx_backend.ensure_model("org/model", root=root)
+    assert onnx_backend.ensure_model("org/model", root=root) == first
+    assert onnx_backend.ensure_model("org_model", root=root) == first
+    onnx_backend.ensure_model("org_model", root=root, opset=17)
+    assert exports == [("org/model", onnx_backend.OPSET), ("org_model", onnx_backend.OPSET), ("org_model", 17)]
+
+def test_onnx_dir_follows_export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "EXPORT_DIR", str(tmp_path))
+    assert onnx_backend.model_dir("m") == os.path.join(str(tmp_path), "onnx", "m")
+    monkeypatch.setattr(config, "EMBED_ONNX_DIR", str(tmp_path / "models"))
+    assert onnx_backend.model_dir("m") == os.path.join(str(tmp_path), "models", "m")
+
+def test_onnx_export_matches_torch(tmp_path, monkeypatch):
+    for module in ("onnxruntime", "tokenizers", "transformers", "torch", "onnx", "sentence_transformers"):
+        pytest.importorskip(module)
+    monkeypatch.setattr(config, "EMBED_ONNX_DIR", str(tmp_path))
+    texts = ["hello world", "a somewhat longer sentence about stock markets", "ok"]
+    torch_vectors = embedder.Embedder(config.EMBED_MODEL_NAME, backend="torch").embed_array(texts)
+    for quantize, min_cosine in ((False, 0.999), (True, 0.97)):
+        onnx = embedder.Embedder(config.EMBED_MODEL_NAME, backend="onnx", quantize=quantize)
+        assert onnx_backend.cosine_parity(torch_vectors, onnx.embed_array(texts))["min_cosine"] >= min_cosine
+    metadata = onnx_backend.load_metadata(onnx_backend.model_dir(config.EMBED_MODEL_NAME))
+    assert set(metadata["parity"]) == {"fp32", "int8"}
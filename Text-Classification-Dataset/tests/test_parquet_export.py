@@ -0,0 +1,65 @@
+import re
+import numpy as np
+import pyarrow.parquet as pq
+import src.polars_ops.load_and_save_polars_vectors as export
+
+class FakeCollection:
+    def __init__(self, n, dim=4, ids=None):
+        ids = list(ids or range(1, n + 1))
+        self.num_entities = len(ids)
+        self.rows = {i: {"id": i, "text": f"text {i}", "emb": [float(i)] * dim} for i in ids}
+        self.queries = []
+
+    def query(self, expr, output_fields, limit=None):
+        if limit is not None:
+            # get_max_id's "id >= x" probes
+            first = int(re.findall(r"\d+", expr)[0])
+            return [{"id": i} for i in sorted(self.rows) if i >= first][:limit]
+        start, end = map(int, re.findall(r"\d+", expr))
+        self.queries.append((start, end))
+        return [dict(self.rows[i]) for i in reversed(range(start, end + 1)) if i in self.rows]
+
+def test_plan_ranges_skips_saved_files():
+    assert export.plan_ranges(25, 10) == [(1, 10), (11, 20), (21, 25)]
+    assert export.plan_ranges(25, 10, done=[(11, 20)]) == [(1, 10), (21, 25)]
+    # A file saved when the collection was smaller does not cover the grown range
+    assert export.plan_ranges(25, 10, done=[(21, 22)]) == [(1, 10), (11, 20), (21, 25)]
+
+def test_export_writes_sorted_fixed_size_ranges(tmp_path):
+    col = FakeCollection(25)
+    written = export.export_collection(col, str(tmp_path), batch_size=10, workers=3, query_rows=4)
+    assert written == 25
+    assert export.saved_ranges(str(tmp_path)) == [(1, 10), (11, 20), (21, 25)]
+    assert all(end - start < 4 for start, end in col.queries)
+
+    table = pq.read_table(tmp_path / "vectors_11_20.parquet")
+    assert table.column("id").to_pylist() == list(range(11, 21))
+    assert table.schema.field("emb").type.list_size == 4
+    emb = np.asarray(table.column("emb").combine_chunks().flatten()).reshape(-1, 4)
+    assert (emb[:, 0] == np.arange(11, 21)).all()
+
+def test_export_resumes(tmp_path):
+    col = FakeCollection(25)
+    export.export_collection(col, str(tmp_path), batch_size=10, workers=1)
+    (tmp_path / "vectors_11_20.parquet").unlink()
+    col.queries.clear()
+    assert export.export_collection(col, str(tmp_path), batch_size=10, workers=2) == 10
+    assert col.queries == [(11, 20)]
+    assert export.export_collection(col, str(tmp_path), batch_size=10) == 0
+
+def test_export_covers_ids_past_num_entities(tmp_path):
+    # 15 rows, the last five far beyond num_entities
+    col = FakeCollection(0, ids=list(range(1, 11)) + list(range(91, 96)))
+    assert export.export_collection(col, str(tmp_path), batch_size=10, workers=2) == 15
+    assert export.saved_ranges(str(tmp_path)) == [(1, 10), (91, 95)]
+
+def test_grown_collection_replaces_the_partial_range(tmp_path):
+    export.export_collection(FakeCollection(22), str(tmp_path), batch_size=10)
+    assert export.saved_ranges(str(tmp_path))[-1] == (21, 22)
+    assert export.export_collection(FakeCollection(25), str(tmp_path), batch_size=10) == 5
+    assert export.saved_ranges(str(tmp_path)) == [(1, 10), (11, 20), (21, 25)]
+
+    # A superseded file left behind by an interrupted run is cleaned up on the next one
+    export.write_range(pq.read_table(tmp_path / "vectors_21_25.parquet").slice(0, 2), str(tmp_path), 21, 22)
+    assert export.export_collection(FakeCollection(25), str(tmp_path), batch_size=10) == 0
+    assert export.saved_ranges(str(tmp_path)) == [(1, 10), (11, 20), (21, 25)]
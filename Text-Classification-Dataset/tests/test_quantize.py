@@ -0,0 +1,58 @@
+import json
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from src.polars_ops import quantize
+from src.polars_ops.parquet_vectors import build_vector_store
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((300, 8)).astype(np.float32)
+
+def test_int8_roundtrip_and_query_terms(vectors):
+    quantizer = quantize.ScalarQuantizer.fit("int8", [vectors[:100], vectors[100:]])
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+    decoded = quantizer.decode(codes)
+    assert np.abs(decoded - vectors).max() <= quantizer.scale.max() / 2 + 1e-5
+
+    queries = vectors[:3]
+    scaled, offsets = quantizer.query_terms(queries)
+    direct = queries @ decoded.T
+    assert np.allclose(scaled @ codes.astype(np.float32).T + offsets[:, None], direct, atol=1e-3)
+
+    restored = quantize.ScalarQuantizer.from_dict(json.loads(json.dumps(quantizer.to_dict())))
+    assert np.array_equal(restored.encode(vectors), codes)
+
+def test_float16_needs_no_calibration(vectors):
+    quantizer = quantize.ScalarQuantizer.fit("float16", [vectors])
+    assert quantizer.encode(vectors).dtype == np.float16
+    with pytest.raises(ValueError):
+        quantize.ScalarQuantizer("int4")
+
+def test_quantize_store_and_parquet(tmp_path, vectors):
+    parquet_dir = tmp_path / "parquet"
+    parquet_dir.mkdir()
+    pl.DataFrame({
+        "id": list(range(1, 301)),
+        "text": [f"text {i}" for i in range(1, 301)],
+        "emb": vectors.tolist(),
+    }).write_parquet(parquet_dir / "vectors_1_300.parquet")
+    store_dir = str(tmp_path / "store")
+    build_vector_store(str(parquet_dir), store_dir)
+
+    metadata = quantize.quantize_store(store_dir, "int8")
+    assert metadata["quantized_bytes"] * 4 == metadata["float32_bytes"]
+    codes = np.load(quantize.quantized_vectors_path(store_dir, "int8"))
+    quantizer = quantize.load_quantizer(quantize.store_metadata_path(store_dir, "int8"))
+    assert np.array_equal(codes, quantizer.encode(vectors))
+
+    out = tmp_path / "parquet_int8"
+    quantize.quantize_parquet(str(parquet_dir), str(out), "int8")
+    table = pq.read_table(out / "vectors_1_300.parquet")
+    assert table.column_names == ["id", "text", "emb"]
+    assert table.schema.field("emb").type.list_size == 8
+    emb = np.asarray(table.column("emb").combine_chunks().flatten()).reshape(-1, 8)
+    assert np.array_equal(emb, codes)
+    assert (out / quantize.METADATA_FILE).exists()
@@ -0,0 +1,31 @@
+import pytest
+import polars as pl
+import pyarrow.parquet as pq
+from src.polars_ops.sort_and_combine_data import combine, order_by_id_range
+
+def write_batch(path, ids, dim=3):
+    pl.DataFrame({
+        "id": ids,
+        "text": [f"text {i}" for i in ids],
+        "emb": [[float(i)] * dim for i in ids],
+    }).write_parquet(path, row_group_size=2)
+
+def test_combine_streams_files_in_id_order(tmp_path):
+    write_batch(tmp_path / "vectors_11_15.parquet", [11, 12, 13, 14, 15])
+    write_batch(tmp_path / "vectors_1_5.parquet", [3, 1, 2, 5, 4])  # unsorted within the file
+    write_batch(tmp_path / "vectors_6_10.parquet", [6, 7, 8, 9, 10])
+    output = tmp_path / "full_data.parquet"
+
+    assert combine(str(tmp_path), str(output)) == 15
+    table = pq.read_table(output)
+    assert table.column("id").to_pylist() == list(range(1, 16))
+    assert table.column("emb").to_pylist()[4] == [5.0] * 3
+
+    # Re-running skips the combined file instead of reading it back in
+    assert combine(str(tmp_path), str(output)) == 15
+
+def test_overlapping_ranges_rejected(tmp_path):
+    write_batch(tmp_path / "a.parquet", [1, 2, 3])
+    write_batch(tmp_path / "b.parquet", [3, 4])
+    with pytest.raises(ValueError):
+        order_by_id_range([str(tmp_path / "a.parquet"), str(tmp_path / "b.parquet")])
@@ -0,0 +1,41 @@
+import time
+import pytest
+from src.data_ingestion.utils import LRUCache, prefetch, text_hash64
+
+def test_text_hash64_is_stable_and_salted():
+    assert text_hash64("hello") == text_hash64("hello")
+    assert text_hash64("hello") != text_hash64("hello", salt="model")
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_lru_cache_ttl():
+    cache = LRUCache(capacity=10, ttl_seconds=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_lru_cache_disabled():
+    cache = LRUCache(capacity=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+def test_prefetch_preserves_order_and_errors():
+    assert list(prefetch(range(10), depth=3)) == list(range(10))
+    assert list(prefetch(range(3), depth=0)) == [0, 1, 2]
+
+    def failing():
+        yield 1
+        raise RuntimeError("read failed")
+    with pytest.raises(RuntimeError):
+        list(prefetch(failing()))